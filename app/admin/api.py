@@ -10,6 +10,15 @@ from app.core.admin.actions import (
     approve_female,
     mark_withdrawal_paid,
 )
+from app.services.outbox import outbox
+from app.services.update_queue import update_queue
+from app.services.update_dedupe import metrics as update_dedupe_metrics
+from app.services.flood import metrics as flood_metrics
+from app.services.matchmaking import female_wait_stats
+from app.services.presence import online_counts
+from app.services.wallet_meter import WALLET_METERING, journal_backlog
+from app.services.stars_ingest import backlog as stars_backlog, dead_letters
+from app.core.sessions.reconcile import reconcile, last_report
 
 router = APIRouter(
     tags=["Admin"],
@@ -47,3 +56,69 @@ async def mark_paid_api(withdrawal_id: int):
 @router.get("/stats")
 async def admin_stats():
     return await get_admin_stats()
+
+
+# -------------------------
+# OUTBOUND DELIVERY
+# -------------------------
+@router.get("/outbox/metrics")
+async def outbox_metrics():
+    return outbox.metrics()
+
+
+@router.get("/ingest/metrics")
+async def ingest_metrics():
+    return {
+        **update_queue.metrics(),
+        "dedupe": update_dedupe_metrics(),
+        "flood": flood_metrics(),
+    }
+
+
+# -------------------------
+# MATCHMAKING FAIRNESS
+# -------------------------
+@router.get("/matchmaking/fairness")
+async def matchmaking_fairness():
+    return await female_wait_stats()
+
+
+# -------------------------
+# PRESENCE
+# -------------------------
+@router.get("/presence")
+async def presence_counts():
+    return await online_counts()
+
+
+# -------------------------
+# REDIS ↔ POSTGRES RECONCILIATION
+# -------------------------
+@router.get("/reconcile")
+async def reconcile_report():
+    return await last_report() or {"status": "never_run"}
+
+
+@router.post("/reconcile/run")
+async def reconcile_run():
+    report = await reconcile()
+    return report or {"status": "busy"}
+
+
+# -------------------------
+# WALLET METERING
+# -------------------------
+@router.get("/wallet/metering")
+async def wallet_metering():
+    return {
+        "mode": WALLET_METERING,
+        "journal_backlog": await journal_backlog(),
+    }
+
+
+@router.get("/stars/ingest")
+async def stars_ingest():
+    return {
+        "backlog": await stars_backlog(),
+        "dead_letters": await dead_letters(),
+    }
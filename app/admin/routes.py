@@ -3,6 +3,7 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy import text
 from app.database import AsyncSessionLocal
+from app.services.ledger import audit_balances
 
 # =================================================
 # Router
@@ -210,15 +211,22 @@ async def wallets_page(request: Request, _=Depends(admin_required)):
 @router.get("/wallets/data")
 async def wallets_data(_=Depends(admin_required)):
     async with AsyncSessionLocal() as db:
+        # Earnings come from the running snapshot (no ledger scan);
+        # paid withdrawals are pre-aggregated so nothing fans out.
         result = await db.execute(text("""
             SELECT
               u.id AS user_id,
-              COALESCE(SUM(CASE WHEN l.type = 'earn' THEN l.amount ELSE 0 END), 0) AS total_earned,
-              COALESCE(SUM(CASE WHEN w.status = 'paid' THEN w.amount ELSE 0 END), 0) AS total_withdrawn
+              COALESCE(b.credited, 0) AS total_earned,
+              COALESCE(w.paid, 0) AS total_withdrawn
             FROM users u
-            LEFT JOIN ledger l ON l.user_id = u.id
-            LEFT JOIN withdrawals w ON w.user_id = u.id
-            GROUP BY u.id
+            LEFT JOIN ledger_balances b
+              ON b.user_id = u.id AND b.asset = 'earnings'
+            LEFT JOIN (
+              SELECT user_id, SUM(amount) AS paid
+              FROM withdrawals
+              WHERE status = 'paid'
+              GROUP BY user_id
+            ) w ON w.user_id = u.id
             ORDER BY u.id
         """))
 
@@ -261,6 +269,16 @@ async def ledger_data(
         result = await db.execute(text(query), params)
         return result.mappings().all()
 
+@router.get("/ledger/audit")
+async def ledger_audit(
+    user_id: int | None = None,
+    _=Depends(admin_required)
+):
+    # Full-history recomputation; snapshots that disagree are returned
+    async with AsyncSessionLocal() as db:
+        mismatches = await audit_balances(db, user_id)
+    return {"ok": not mismatches, "mismatches": mismatches}
+
 # =================================================
 # SESSIONS (READ-ONLY)
 # =================================================
@@ -3,7 +3,8 @@ from app.database import AsyncSessionLocal
 from app.models.user import User
 from app.models.session import ChatSession
 from app.models.withdrawal import Withdrawal
-from app.redis_client import redis_client
+from app.services.chat_session import active_session_count
+from app.services.presence import online_counts
 
 
 async def get_admin_stats():
@@ -48,7 +49,8 @@ async def get_admin_stats():
             .where(Withdrawal.status == "pending")
         )
 
-    active_chats = await redis_client.hlen("active_chat")
+    active_chats = await active_session_count()
+    presence = await online_counts()
 
     return {
         "users": {
@@ -57,6 +59,7 @@ async def get_admin_stats():
             "verified_females": verified_females,
             "pending_females": pending_females,
         },
+        "presence": presence,
         "chats": {
             "total": total_chats,
             "active": active_chats,
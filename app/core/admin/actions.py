@@ -4,6 +4,8 @@ from sqlalchemy.sql import func
 from app.database import AsyncSessionLocal
 from app.models.user import User
 from app.models.withdrawal import Withdrawal
+from app.services.identity import invalidate
+from app.services.user_flags import set_verified
 
 
 class AdminError(Exception):
@@ -31,6 +33,9 @@ async def approve_female(telegram_id: int):
         user.is_verified = True
         await db.commit()
 
+    await invalidate(user.id, telegram_id)
+    await set_verified(user.id, True)
+
 
 # -------------------------
 # WITHDRAWAL PAID
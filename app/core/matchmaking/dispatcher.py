@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from app.services.identity import resolve_many_ids
+from app.services.matchmaking import (
+    expire_waiting_males,
+    wait_for_dispatch,
+)
+from app.services.outbox import outbox
+from app.core.matchmaking.flow import dispatch_waiting
+
+logger = logging.getLogger("trueme.matchmaking.dispatcher")
+
+# A male who waits longer than this is dropped from the queue
+MALE_WAIT_TIMEOUT_SECONDS = int(os.getenv("TRUEME_MALE_WAIT_TIMEOUT_SECONDS", "300"))
+
+# Fallback pass interval; picks up females added by other workers
+DISPATCH_INTERVAL_SECONDS = 5.0
+
+_task: Optional[asyncio.Task] = None
+
+
+async def _expire_waiting():
+    expired = await expire_waiting_males(MALE_WAIT_TIMEOUT_SECONDS)
+    if not expired:
+        return
+
+    idents = await resolve_many_ids(expired)
+    for ident in idents.values():
+        outbox.enqueue(
+            ident.telegram_id,
+            "⌛ No match found in time.\nUse /find to search again.",
+        )
+
+    logger.info(f"[DISPATCH] Wait timed out for {len(expired)} males")
+
+
+async def _run():
+    logger.info("[DISPATCH] Dispatcher started")
+
+    while True:
+        woken = await wait_for_dispatch(DISPATCH_INTERVAL_SECONDS)
+        try:
+            await _expire_waiting()
+            matched = await dispatch_waiting()
+            if matched:
+                logger.info(
+                    f"[DISPATCH] Paired {len(matched)} (woken={woken})"
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"[DISPATCH] Pass failed: {e}")
+            await asyncio.sleep(DISPATCH_INTERVAL_SECONDS)
+
+
+def start_dispatcher():
+    """
+    Safe to start on every worker: claims are atomic in Redis.
+    Notifications go through the outbox, which must be started first.
+    """
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_run())
+
+
+async def stop_dispatcher():
+    global _task
+    if _task is None:
+        return
+
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
@@ -1,73 +1,259 @@
 import logging
-from sqlalchemy import select
+import os
+from typing import Optional
 
 from app.database import AsyncSessionLocal
-from app.models.user import User
-from app.redis_client import redis_client
-from app.services.matchmaking import add_user_to_pool, match_users
-from app.services.billing import start_paid_session, can_start_session
-from app.core.sessions.lifecycle import start_session
+from app.services.identity import resolve, resolve_many_ids
+from app.services.matchmaking import (
+    add_user_to_pool,
+    match_users,
+    claim_direct,
+    waiting_buckets,
+    is_user_in_session,
+    extend_claim,
+    confirm_claim,
+    release_claim,
+    Claim,
+)
+from app.services.billing import (
+    start_paid_session,
+    can_start_session,
+    void_paid_session,
+    abort_paid_session,
+)
+from app.services.outbox import outbox
+from app.services.single_flight import single_flight
+from app.services.user_flags import is_suspended
+from app.core.sessions.lifecycle import start_session, stop_session
 
 logger = logging.getLogger("trueme.matchmaking.flow")
 
+# Max pairs opened per dispatch pass
+DISPATCH_BATCH_SIZE = int(os.getenv("TRUEME_DISPATCH_BATCH_SIZE", "50"))
+
+# Repeated /find taps join the search in flight for this long
+FIND_SINGLE_FLIGHT_SECONDS = 15
+
 
 class MatchError(Exception):
     pass
 
 
-async def find_match(telegram_id: int) -> tuple[int, int]:
-    logger.info(f"[MATCHMAKING] /find called by {telegram_id}")
+# -------------------------
+# OPEN A RESERVED PAIR
+# -------------------------
+async def open_session(claim: Claim) -> Optional[tuple[int, int]]:
+    """
+    Bills and starts the session for a reserved pair.
+    Returns None (claim released) if billing or confirmation fails.
+    """
+    male_id, female_id = claim.male_id, claim.female_id
 
     async with AsyncSessionLocal() as db:
-        user = await db.scalar(
-            select(User).where(User.telegram_id == telegram_id)
+        # 1️⃣ BILLING (reservation is released if this fails)
+        session, committed = None, False
+        try:
+            session = await start_paid_session(
+                db=db,
+                male_id=male_id,
+                female_id=female_id
+            )
+
+            if not await extend_claim(claim):
+                raise MatchError("RESERVATION_LOST")
+
+            # ✅ CRITICAL FIX — COMMIT BEFORE REDIS SESSION
+            # Nothing may follow the commit in this block: the except
+            # path only undoes an uncommitted charge. id and started_at
+            # are already set (flush / client-side, no expire on commit).
+            await db.commit()
+            committed = True
+        except Exception as e:
+            logger.error(f"[MATCHMAKING] Billing failed, releasing claim: {e}")
+            if session is not None and not committed:
+                await abort_paid_session(session)
+            await release_claim(
+                claim,
+                requeue_male=str(e) != "INSUFFICIENT_MINUTES",
+            )
+            return None
+
+        # 2️⃣ Confirm; a lapse between commit and here is compensated
+        if not await confirm_claim(claim):
+            logger.error(
+                f"[MATCHMAKING] Reservation lost after commit, voiding session id={session.id}"
+            )
+            await void_paid_session(db, session.id)
+            await db.commit()
+            await release_claim(claim)
+            return None
+
+        logger.info(
+            f"[MATCHMAKING] DB session committed id={session.id}"
         )
 
-        if not user or not user.role:
-            raise MatchError("PROFILE_INCOMPLETE")
+    pair = await resolve_many_ids([male_id, female_id])
+
+    # 🔥 NOW start Redis session
+    await start_session(
+        male_id,
+        female_id,
+        session_id=session.id,
+        started_at=session.started_at,
+        telegram_ids=tuple(
+            pair[uid].telegram_id if uid in pair else None
+            for uid in (male_id, female_id)
+        ),
+    )
+
+    logger.info(
+        f"[MATCHMAKING] Session started male={male_id} female={female_id}"
+    )
+
+    return male_id, female_id
+
+
+async def announce_match(male_id: int, female_id: int) -> bool:
+    """
+    Notifies both sides. Rolls the session back if either
+    side can't be reached (flood limits are retried, not rolled back).
+    """
+    pair = await resolve_many_ids([male_id, female_id])
+    male, female = pair.get(male_id), pair.get(female_id)
+
+    if not male or not female:
+        logger.error("[MATCHMAKING] User record missing during notify → rollback")
+        await stop_session(male_id)
+        return False
+
+    queued = outbox.enqueue(
+        male.telegram_id,
+        "💬 Connected!\n⏱ Chat started (30 minutes)."
+    ) and outbox.enqueue(
+        female.telegram_id,
+        "💬 You are now connected.\n⏱ Chat started."
+    )
+
+    if not queued:
+        logger.error("[MATCHMAKING] Notify could not be queued → rollback")
+        await stop_session(male_id)
+        return False
+
+    return True
 
-        if user.role != "male":
-            raise MatchError("ONLY_MALE_CAN_FIND")
 
-        if not await can_start_session(db=db, male_id=user.id):
+# -------------------------
+# DISPATCH (push matching)
+# -------------------------
+async def dispatch_waiting(
+    bucket: Optional[str] = None,
+    limit: int = DISPATCH_BATCH_SIZE,
+) -> list[tuple[int, int]]:
+    """
+    Pairs queue heads until either side runs dry, per bucket.
+    /find passes its own bucket, so it only touches that shard;
+    the dispatcher passes None: every bucket with a waiting male.
+    """
+    matched = []
+
+    for shard in [bucket] if bucket else await waiting_buckets():
+        for _ in range(limit):
+            claim = await match_users(shard)
+            if not claim:
+                break
+
+            pair = await open_session(claim)
+            if not pair:
+                # The released pair is back at both queue heads and
+                # would be claimed again; leave it to the next pass
+                break
+            if await announce_match(*pair):
+                matched.append(pair)
+
+    return matched
+
+
+# -------------------------
+# /find
+# -------------------------
+async def find_match(telegram_id: int) -> tuple[int, int]:
+    """
+    Queues the caller and runs a dispatch pass. Raises NO_MATCH
+    if he is still waiting: the dispatcher connects him later.
+    Concurrent calls for one user (any worker) share a single run.
+    """
+    logger.info(f"[MATCHMAKING] /find called by {telegram_id}")
+
+    male_id, female_id = await single_flight(
+        f"find:{telegram_id}",
+        lambda: _find_match(telegram_id),
+        error_type=MatchError,
+        lock_seconds=FIND_SINGLE_FLIGHT_SECONDS,
+    )
+    return male_id, female_id
+
+
+async def _find_match(telegram_id: int) -> tuple[int, int]:
+    user = await resolve(telegram_id)
+
+    if not user or not user.role:
+        raise MatchError("PROFILE_INCOMPLETE")
+
+    if user.role != "male":
+        raise MatchError("ONLY_MALE_CAN_FIND")
+
+    if await is_suspended(user.user_id):
+        raise MatchError("SUSPENDED")
+
+    async with AsyncSessionLocal() as db:
+        if not await can_start_session(db=db, male_id=user.user_id):
             logger.info(
-                f"[MATCHMAKING] Reject /find: insufficient stars for {user.id}"
+                f"[MATCHMAKING] Reject /find: insufficient stars for {user.user_id}"
             )
             raise MatchError("INSUFFICIENT_STARS")
 
-        await redis_client.set(f"user:{user.id}:role", user.role)
+    if await is_user_in_session(user.user_id):
+        raise MatchError("ALREADY_IN_SESSION")
 
-        if await redis_client.get(f"user:{user.id}:in_session") == "1":
-            raise MatchError("ALREADY_IN_SESSION")
+    await add_user_to_pool(user.user_id, "male", bucket=user.bucket)
 
-        await add_user_to_pool(user.id)
+    for male_id, female_id in await dispatch_waiting(user.bucket):
+        if male_id == user.user_id:
+            return male_id, female_id
 
-        match = await match_users()
-        if not match:
-            raise MatchError("NO_MATCH")
+    raise MatchError("NO_MATCH")
 
-        male_id, female_id = match
 
-        # 🔒 BILLING
-        session = await start_paid_session(
-            db=db,
-            male_id=male_id,
-            female_id=female_id
-        )
+# -------------------------
+# CHAT AGAIN (favorites)
+# -------------------------
+async def reconnect_favorite(telegram_id: int, female_id: int) -> tuple[int, int]:
+    """
+    Connects the caller straight to one favorite female if she is
+    online and idle: a single claim on her, no pool scan. Raises
+    PARTNER_BUSY / PARTNER_OFFLINE otherwise; /find still works.
+    """
+    user = await resolve(telegram_id)
 
-        # ✅ CRITICAL FIX — COMMIT BEFORE REDIS SESSION
-        await db.commit()
-        await db.refresh(session)
+    if not user or user.role != "male":
+        raise MatchError("ONLY_MALE_CAN_FIND")
 
-        logger.info(
-            f"[MATCHMAKING] DB session committed id={session.id}"
-        )
+    if await is_suspended(user.user_id):
+        raise MatchError("SUSPENDED")
 
-        # 🔥 NOW start Redis session
-        await start_session(male_id, female_id)
+    async with AsyncSessionLocal() as db:
+        if not await can_start_session(db=db, male_id=user.user_id):
+            raise MatchError("INSUFFICIENT_STARS")
 
+    claim, reason = await claim_direct(user.user_id, female_id)
+    if not claim:
         logger.info(
-            f"[MATCHMAKING] Session started male={male_id} female={female_id}"
+            f"[MATCHMAKING] Reconnect {user.user_id} → {female_id} refused: {reason}"
         )
+        raise MatchError(reason)
+
+    pair = await open_session(claim)
+    if not pair or not await announce_match(*pair):
+        raise MatchError("RECONNECT_FAILED")
 
-        return male_id, female_id
+    return pair
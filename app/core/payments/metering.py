@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import os
+import socket
+from typing import Optional
+
+from app.database import AsyncSessionLocal
+from app.services import ledger
+from app.services.wallet_meter import (
+    metering_enabled,
+    ensure_group,
+    read_journal,
+    apply_journal,
+    ack_journal,
+)
+
+logger = logging.getLogger("trueme.wallet.flusher")
+
+WALLET_FLUSH_BATCH_SIZE = int(os.getenv("TRUEME_WALLET_FLUSH_BATCH_SIZE", "500"))
+WALLET_FLUSH_INTERVAL_SECONDS = float(os.getenv("TRUEME_WALLET_FLUSH_INTERVAL", "1"))
+
+_task: Optional[asyncio.Task] = None
+
+
+async def flush_once(consumer: str) -> int:
+    """
+    Writes one journal batch behind to wallets + ledger in a single
+    transaction, then acks it. Returns the number of entries read.
+    """
+    entries = await read_journal(consumer, WALLET_FLUSH_BATCH_SIZE)
+    if not entries:
+        return 0
+
+    async with AsyncSessionLocal() as db:
+        applied = await apply_journal(db, entries)
+        await ledger.record(db, [
+            ledger.Entry(user_id, ledger.MINUTES, type, delta, ref)
+            for user_id, delta, type, ref in applied
+        ])
+        await db.commit()
+
+    await ack_journal([eid for eid, _ in entries])
+
+    logger.info(
+        f"[WALLET] Flushed {len(applied)} of {len(entries)} journal entries"
+    )
+    return len(entries)
+
+
+async def _run():
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    logger.info(f"[WALLET] Flusher started as {consumer}")
+
+    await ensure_group()
+
+    while True:
+        try:
+            if await flush_once(consumer) == WALLET_FLUSH_BATCH_SIZE:
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"[WALLET] Flush failed: {e}")
+
+        await asyncio.sleep(WALLET_FLUSH_INTERVAL_SECONDS)
+
+
+def start_wallet_flusher():
+    """
+    No-op unless TRUEME_WALLET_METERING=redis. Safe on every
+    worker: the journal is a consumer group.
+    """
+    global _task
+    if not metering_enabled():
+        return
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_run())
+
+
+async def stop_wallet_flusher():
+    global _task
+    if _task is None:
+        return
+
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
+
+    # Drain what is already journaled so a clean shutdown leaves
+    # Postgres current
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    try:
+        while await flush_once(consumer) == WALLET_FLUSH_BATCH_SIZE:
+            pass
+    except Exception as e:
+        logger.error(f"[WALLET] Final flush failed: {e}")
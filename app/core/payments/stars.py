@@ -0,0 +1,255 @@
+import asyncio
+import logging
+import os
+import socket
+
+from sqlalchemy import text
+
+from app.database import AsyncSessionLocal
+from app.services import ledger, wallet_meter
+from app.services.identity import resolve_many
+from app.services.stars_ingest import (
+    ensure_group,
+    read_payments,
+    ack_payments,
+    delivery_counts,
+    dead_letter,
+    STARS_MAX_DELIVERIES,
+)
+
+logger = logging.getLogger("trueme.stars.worker")
+
+# TEST MODE: 1 star = 30 minutes
+TEST_MINUTES_PER_STAR = 30
+
+# PROD MODE (later): 49 stars = 30 minutes
+# We’ll switch later cleanly
+
+STARS_BATCH_SIZE = int(os.getenv("TRUEME_STARS_BATCH_SIZE", "200"))
+STARS_WORKERS = int(os.getenv("TRUEME_STARS_WORKERS", "2"))
+STARS_POLL_SECONDS = 1.0
+
+_tasks: list[asyncio.Task] = []
+
+
+def _credited_key(event_id: str) -> str:
+    return f"stars:credited:{event_id}"
+
+
+# -------------------------
+# BATCH APPLY
+# -------------------------
+async def _ensure_wallets(db, user_ids: list[int]):
+    await db.execute(
+        text("""
+            INSERT INTO wallets (
+                user_id, free_minutes, referral_minutes, paid_minutes,
+                lifetime_earnings, pending_balance, withdrawable_balance
+            )
+            SELECT u, 15, 0, 0, 0, 0, 0
+            FROM UNNEST(CAST(:ids AS integer[])) AS u
+            ON CONFLICT (user_id) DO NOTHING
+        """),
+        {"ids": user_ids},
+    )
+
+
+async def _record_payments(db, payments: list[tuple], credited: bool) -> list[tuple]:
+    """
+    Inserts into telegram_stars_ledger; the unique event id makes
+    a repeat a no-op. Returns only the newly recorded payments.
+    credited=False leaves credited_at NULL until _mark_credited.
+    """
+    rows = (await db.execute(
+        text("""
+            INSERT INTO telegram_stars_ledger
+                (telegram_event_id, telegram_user_id, stars, credited_at)
+            SELECT v.*, CASE WHEN CAST(:credited AS boolean) THEN NOW() END
+            FROM UNNEST(
+                CAST(:eids AS varchar[]),
+                CAST(:tgs AS bigint[]),
+                CAST(:stars AS integer[])
+            ) AS v
+            ON CONFLICT (telegram_event_id) DO NOTHING
+            RETURNING telegram_event_id
+        """),
+        {
+            "eids": [p[0] for p in payments],
+            "tgs": [p[1] for p in payments],
+            "stars": [p[2] for p in payments],
+            "credited": credited,
+        },
+    )).scalars().all()
+
+    new = set(rows)
+    return [p for p in payments if p[0] in new]
+
+
+async def _uncredited(db, payments: list[tuple]) -> list[tuple]:
+    """Recorded payments whose counter credit has not been confirmed."""
+    rows = (await db.execute(
+        text("""
+            SELECT telegram_event_id FROM telegram_stars_ledger
+            WHERE telegram_event_id = ANY(CAST(:eids AS varchar[]))
+              AND credited_at IS NULL
+        """),
+        {"eids": [p[0] for p in payments]},
+    )).scalars().all()
+
+    pending = set(rows)
+    return [p for p in payments if p[0] in pending]
+
+
+async def _mark_credited(db, payments: list[tuple]):
+    await db.execute(
+        text("""
+            UPDATE telegram_stars_ledger SET credited_at = NOW()
+            WHERE telegram_event_id = ANY(CAST(:eids AS varchar[]))
+        """),
+        {"eids": [p[0] for p in payments]},
+    )
+
+
+async def apply_payments(entries: list[tuple[str, dict]]) -> tuple[int, set[str]]:
+    """
+    Credits one batch of verified payments. Returns how many were
+    credited (repeats are skipped) and the stream entry ids whose
+    telegram user could not be resolved: those must stay un-acked
+    so they are retried, e.g. when the payment raced the user row.
+    """
+    payments = {}
+    for _, f in entries:
+        payments.setdefault(f["eid"], (f["eid"], int(f["tg"]), int(f["stars"])))
+
+    idents = await resolve_many(p[1] for p in payments.values())
+
+    known = [p for p in payments.values() if p[1] in idents]
+    unknown = {
+        entry_id for entry_id, f in entries if int(f["tg"]) not in idents
+    }
+    for entry_id in unknown:
+        logger.warning(f"[STARS] Unknown telegram user for entry {entry_id}, will retry")
+
+    if not known:
+        return 0, unknown
+
+    user_ids = sorted({idents[p[1]].user_id for p in known})
+
+    if wallet_meter.metering_enabled():
+        # The ledger row is the durable dedupe: record and commit
+        # first, then credit only rows not yet marked credited. A
+        # crash between commit and mark leaves credited_at NULL, so
+        # the redelivery finishes the credit; the once key stops that
+        # retry from doubling a credit that did land before the crash.
+        async with AsyncSessionLocal() as db:
+            await _ensure_wallets(db, user_ids)
+            await _record_payments(db, known, credited=False)
+            await db.commit()
+            pending = await _uncredited(db, known)
+
+        for eid, tg, stars in pending:
+            await wallet_meter.credit(
+                idents[tg].user_id,
+                stars * TEST_MINUTES_PER_STAR,
+                ledger.STARS_CREDIT,
+                f"stars:{eid}",
+                once_key=_credited_key(eid),
+            )
+
+        if pending:
+            async with AsyncSessionLocal() as db:
+                await _mark_credited(db, pending)
+                await db.commit()
+        return len(pending), unknown
+
+    async with AsyncSessionLocal() as db:
+        await _ensure_wallets(db, user_ids)
+        new = await _record_payments(db, known, credited=True)
+
+        totals: dict[int, int] = {}
+        for _, tg, stars in new:
+            uid = idents[tg].user_id
+            totals[uid] = totals.get(uid, 0) + stars * TEST_MINUTES_PER_STAR
+
+        if totals:
+            users = sorted(totals)
+            await db.execute(
+                text("""
+                    UPDATE wallets AS w
+                    SET paid_minutes = w.paid_minutes + v.minutes
+                    FROM UNNEST(
+                        CAST(:users AS integer[]),
+                        CAST(:minutes AS integer[])
+                    ) AS v(user_id, minutes)
+                    WHERE w.user_id = v.user_id
+                """),
+                {"users": users, "minutes": [totals[u] for u in users]},
+            )
+
+            await ledger.record(db, [
+                ledger.Entry(
+                    idents[tg].user_id, ledger.MINUTES, ledger.STARS_CREDIT,
+                    stars * TEST_MINUTES_PER_STAR, f"stars:{eid}",
+                )
+                for eid, tg, stars in new
+            ])
+
+        await db.commit()
+
+    return len(new), unknown
+
+
+async def _retry_later(entries: list[tuple[str, dict]]):
+    """
+    Leaves unresolved payments pending (XAUTOCLAIM redelivers them
+    after CLAIM_IDLE_MS) until they hit STARS_MAX_DELIVERIES, then
+    dead-letters them. A payment is never acked without a credit.
+    """
+    counts = await delivery_counts([entry_id for entry_id, _ in entries])
+    await dead_letter([
+        (entry_id, fields) for entry_id, fields in entries
+        if counts.get(entry_id, 0) >= STARS_MAX_DELIVERIES
+    ])
+
+
+# -------------------------
+# WORKERS
+# -------------------------
+async def _worker(index: int):
+    consumer = f"{socket.gethostname()}-{os.getpid()}-{index}"
+    logger.info(f"[STARS] Worker started as {consumer}")
+
+    while True:
+        try:
+            entries = await read_payments(consumer, STARS_BATCH_SIZE)
+            if entries:
+                credited, unknown = await apply_payments(entries)
+                await ack_payments([eid for eid, _ in entries if eid not in unknown])
+                if unknown:
+                    await _retry_later([e for e in entries if e[0] in unknown])
+                logger.info(
+                    f"[STARS] Credited {credited} of {len(entries)} payments"
+                )
+                if len(entries) == STARS_BATCH_SIZE:
+                    continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"[STARS] Batch failed: {e}")
+
+        await asyncio.sleep(STARS_POLL_SECONDS)
+
+
+async def start_stars_workers():
+    await ensure_group()
+    if not _tasks:
+        _tasks.extend(
+            asyncio.create_task(_worker(i)) for i in range(STARS_WORKERS)
+        )
+
+
+async def stop_stars_workers():
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
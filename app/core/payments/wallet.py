@@ -3,6 +3,7 @@ from sqlalchemy import select
 from app.database import AsyncSessionLocal
 from app.models.wallet import Wallet
 from app.models.withdrawal import Withdrawal
+from app.services import ledger
 
 
 class WalletError(Exception):
@@ -12,7 +13,7 @@ class WalletError(Exception):
 async def request_withdrawal(user_id: int):
     async with AsyncSessionLocal() as db:
         wallet = await db.scalar(
-            select(Wallet).where(Wallet.user_id == user_id)
+            select(Wallet).where(Wallet.user_id == user_id).with_for_update()
         )
 
         if not wallet or wallet.withdrawable_balance <= 0:
@@ -27,4 +28,10 @@ async def request_withdrawal(user_id: int):
         wallet.withdrawable_balance = 0
 
         db.add(withdrawal)
+        await db.flush()
+
+        await ledger.post(
+            db, user_id, ledger.EARNINGS, ledger.WITHDRAW,
+            -withdrawal.amount, ref=f"withdrawal:{withdrawal.id}",
+        )
         await db.commit()
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal
+from app.models.session import ChatSession
+from app.services.billing import finalize_sessions
+from app.services.session_expiry import (
+    claim_due_expiries,
+    claim_due_warnings,
+    ack_expiries,
+    next_due_at,
+    EXPIRY_WARNING_MINUTES,
+)
+from app.services.chat_session import begin_end_session
+from app.services.identity import resolve_many_ids
+from app.services.outbox import outbox
+from app.core.sessions.lifecycle import complete_end
+
+logger = logging.getLogger("trueme.session.expiry")
+
+EXPIRY_BATCH_SIZE = int(os.getenv("TRUEME_EXPIRY_BATCH_SIZE", "100"))
+
+# Upper bound on sleep so sessions started elsewhere are picked up
+EXPIRY_MAX_SLEEP_SECONDS = 5.0
+
+_task: Optional[asyncio.Task] = None
+
+
+# -------------------------
+# HELPERS
+# -------------------------
+async def _telegram_ids(user_ids: set[int]) -> dict[int, int]:
+    idents = await resolve_many_ids(user_ids)
+    return {uid: ident.telegram_id for uid, ident in idents.items()}
+
+
+def _notify(chat_ids, text: str):
+    for chat_id in chat_ids:
+        if chat_id:
+            outbox.enqueue(chat_id, text)
+
+
+# -------------------------
+# EXPIRE (BATCH)
+# -------------------------
+async def expire_sessions(session_ids: list[int]) -> int:
+    """
+    Takes the ending claim of each live session, finalizes the
+    batch in one transaction, then ends the Redis records and
+    notifies both sides. Re-running a batch is safe: finalize is
+    idempotent and only sessions this call moved to "ending" are
+    ended and notified.
+    """
+
+    now = time.time()
+    owned = set()
+    for session_id in session_ids:
+        if await begin_end_session(session_id, now):
+            owned.add(session_id)
+
+    async with AsyncSessionLocal() as db:
+        rows = await db.execute(
+            select(ChatSession.id, ChatSession.male_id, ChatSession.female_id)
+            .where(ChatSession.id.in_(session_ids))
+        )
+        pairs = rows.all()
+
+        await finalize_sessions(db, [session_id for session_id, _, _ in pairs])
+        await db.commit()
+
+    tg = await _telegram_ids({uid for _, m, f in pairs for uid in (m, f)})
+
+    released = 0
+    for session_id, male_id, female_id in pairs:
+        if session_id not in owned or not await complete_end(session_id):
+            continue
+
+        released += 1
+        _notify([tg.get(male_id)], "⏰ Chat ended (30 minutes completed).")
+        _notify([tg.get(female_id)], "⏰ Chat ended. Thanks for chatting!")
+
+        logger.info(f"[EXPIRY] Session expired id={session_id}")
+
+    return released
+
+
+# -------------------------
+# WARN (BATCH)
+# -------------------------
+async def warn_sessions(session_ids: list[int]):
+    async with AsyncSessionLocal() as db:
+        rows = await db.execute(
+            select(ChatSession.male_id, ChatSession.female_id)
+            .where(
+                ChatSession.id.in_(session_ids),
+                ChatSession.ended_at.is_(None),
+            )
+        )
+        pairs = rows.all()
+
+    tg = await _telegram_ids({uid for m, f in pairs for uid in (m, f)})
+
+    text = f"⏳ {EXPIRY_WARNING_MINUTES} minutes left in this chat."
+    for male_id, female_id in pairs:
+        _notify([tg.get(male_id), tg.get(female_id)], text)
+
+
+# -------------------------
+# ENGINE LOOP
+# -------------------------
+async def _tick() -> bool:
+    """
+    Processes one batch of due warnings and expiries.
+    Returns True when a batch was full and more work is likely waiting.
+    """
+
+    warned = await claim_due_warnings(EXPIRY_BATCH_SIZE)
+    if warned:
+        await warn_sessions(warned)
+
+    expired = await claim_due_expiries(EXPIRY_BATCH_SIZE)
+    if expired:
+        await expire_sessions(expired)
+        await ack_expiries(expired)
+
+    return (
+        len(warned) == EXPIRY_BATCH_SIZE
+        or len(expired) == EXPIRY_BATCH_SIZE
+    )
+
+
+async def _run():
+    logger.info("[EXPIRY] Engine started")
+
+    while True:
+        try:
+            if await _tick():
+                continue
+
+            due_at = await next_due_at()
+            delay = EXPIRY_MAX_SLEEP_SECONDS
+            if due_at is not None:
+                delay = min(max(due_at - time.time(), 0), delay)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"[EXPIRY] Tick failed: {e}")
+            delay = EXPIRY_MAX_SLEEP_SECONDS
+
+        await asyncio.sleep(delay)
+
+
+def start_expiry_engine():
+    """
+    Safe to start on every worker: claims are atomic in Redis.
+    Notifications go through the outbox, which must be started first.
+    """
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_run())
+
+
+async def stop_expiry_engine():
+    global _task
+    if _task is None:
+        return
+
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
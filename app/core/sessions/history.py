@@ -0,0 +1,30 @@
+from typing import Optional
+
+from sqlalchemy import select, or_, and_
+
+from app.database import AsyncSessionLocal
+from app.models.session import ChatSession
+
+
+# -------------------------
+# PAST SESSIONS (READ ONLY)
+# -------------------------
+async def shared_session(user_id: int, partner_id: int) -> Optional[int]:
+    """
+    Id of the latest session these two users had together, if any.
+    Post-chat buttons carry the partner id; this proves the caller
+    really chatted with them before a report or favorite is stored.
+    """
+    if user_id == partner_id:
+        return None
+
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(
+            select(ChatSession.id)
+            .where(or_(
+                and_(ChatSession.male_id == user_id, ChatSession.female_id == partner_id),
+                and_(ChatSession.male_id == partner_id, ChatSession.female_id == user_id),
+            ))
+            .order_by(ChatSession.id.desc())
+            .limit(1)
+        )
@@ -1,17 +1,24 @@
 from typing import Optional
 import logging
+import time
 from sqlalchemy import select
-from datetime import datetime
+from datetime import datetime, timezone
 
 from app.database import AsyncSessionLocal
 from app.models.session import ChatSession
 from app.services.chat_session import (
-    get_partner,
-    clear_active_pair,
-    set_active_pair,
+    activate_session,
+    begin_end,
+    finish_end,
+    clear_stale_pointer,
 )
-from app.redis_client import redis_client
-from app.services.billing import finalize_session
+from app.services.matchmaking import return_to_pool, request_dispatch
+from app.services.session_expiry import (
+    schedule_session_expiry,
+    cancel_session_expiry,
+    EXPIRY_WARNING_MINUTES,
+)
+from app.services.billing import finalize_session, SESSION_DURATION_MINUTES
 
 logger = logging.getLogger("trueme.session.lifecycle")
 
@@ -19,68 +26,124 @@ logger = logging.getLogger("trueme.session.lifecycle")
 # -------------------------
 # START SESSION
 # -------------------------
-async def start_session(user_a: int, user_b: int):
+async def start_session(
+    user_a: int,
+    user_b: int,
+    session_id: int,
+    started_at: datetime,
+    telegram_ids: Optional[tuple[int, int]] = None,
+):
     """
-    Called only after matchmaking success.
+    Called only after matchmaking success (claim confirmed).
     Does NOT touch pool logic.
+
+    Registers the session with the expiry engine, then flips it
+    to active in one script: session record, both user pointers
+    and, when both telegram ids are known, the relay pointers.
     """
 
-    await set_active_pair(user_a, user_b)
+    started = started_at.replace(tzinfo=timezone.utc).timestamp()
+    expires_at = started + SESSION_DURATION_MINUTES * 60
 
-    await redis_client.set(f"user:{user_a}:in_session", "1")
-    await redis_client.set(f"user:{user_b}:in_session", "1")
+    await schedule_session_expiry(
+        session_id,
+        expires_at,
+        warn_at=(
+            expires_at - EXPIRY_WARNING_MINUTES * 60
+            if EXPIRY_WARNING_MINUTES else None
+        ),
+    )
+
+    a_tg, b_tg = telegram_ids or (None, None)
+    await activate_session(
+        session_id=session_id,
+        started_at=started,
+        expires_at=expires_at,
+        user_a=user_a,
+        user_b=user_b,
+        user_a_tg=a_tg,
+        user_b_tg=b_tg,
+    )
 
     logger.info(
-        f"[SESSION] Started session between {user_a} and {user_b}"
+        f"[SESSION] Started session id={session_id} between {user_a} and {user_b}"
     )
 
 
+# -------------------------
+# END SESSION (ending → ended)
+# -------------------------
+async def complete_end(session_id: int) -> bool:
+    """
+    Second half of a teardown the caller owns (begin_end) and has
+    already finalized in Postgres. Wakes the dispatcher if a
+    still-online female went back to the pool.
+    """
+    requeued = await finish_end(session_id, time.time())
+    if requeued is None:
+        return False
+
+    if requeued:
+        request_dispatch()
+
+    logger.info(f"[SESSION] Session ended id={session_id}")
+    return True
+
+
 # -------------------------
 # STOP SESSION (CLEAN ONLY)
 # -------------------------
 async def stop_session(user_id: int) -> Optional[int]:
     """
     Clean stop:
+    - Take ownership of the teardown (active → ending)
     - Finalize DB session
-    - Clear active pairing
-    - Clear in_session flags
-    - DOES NOT modify matchmaking pool
+    - Clear pointers, return still-online females to the pool
+      (ending → ended, one script)
+
+    Without a live Redis record (crash, lost key) any open DB
+    session of the user is still finalized and stale marks dropped.
     """
 
-    partner = await get_partner(user_id)
+    ending = await begin_end(user_id, time.time())
 
-    async with AsyncSessionLocal() as db:
+    if not ending and not await clear_stale_pointer(user_id):
+        # Someone else owns the teardown (or a claim is in flight)
+        logger.info(f"[SESSION] stop_session: {user_id} busy elsewhere")
+        return None
 
-        session = await db.scalar(
-            select(ChatSession).where(
-                (
-                    (ChatSession.male_id == user_id)
-                    | (ChatSession.female_id == user_id)
-                ),
-                ChatSession.ended_at.is_(None)
+    async with AsyncSessionLocal() as db:
+        if ending:
+            session_id = ending["sid"]
+        else:
+            session_id = await db.scalar(
+                select(ChatSession.id).where(
+                    (
+                        (ChatSession.male_id == user_id)
+                        | (ChatSession.female_id == user_id)
+                    ),
+                    ChatSession.ended_at.is_(None)
+                )
             )
-        )
 
-        if session:
+        if session_id:
             logger.info(
-                f"[SESSION] Manual stop → finalizing session id={session.id}"
+                f"[SESSION] Manual stop → finalizing session id={session_id}"
             )
-            await finalize_session(db, session.id)
-
-    # Clear Redis session flags
-    await redis_client.delete(f"user:{user_id}:in_session")
+            await finalize_session(db, session_id)
+            await db.commit()
+            await cancel_session_expiry(session_id)
 
-    if not partner:
+    if not ending:
+        await return_to_pool(user_id)
         logger.info(
-            f"[SESSION] stop_session: no active partner for {user_id}"
+            f"[SESSION] stop_session: no active session record for {user_id}"
         )
         return None
 
-    # Clear pairing
-    await clear_active_pair(user_id, partner)
+    await complete_end(ending["sid"])
 
-    # Clear partner flag
-    await redis_client.delete(f"user:{partner}:in_session")
+    partner = ending["b"] if ending["a"] == user_id else ending["a"]
 
     logger.info(
         f"[SESSION] Session stopped for {user_id} and {partner}"
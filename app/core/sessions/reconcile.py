@@ -0,0 +1,384 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import timezone
+from typing import Optional
+
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal
+from app.models.session import ChatSession
+from app.redis_client import redis_client
+from app.services.billing import SESSION_DURATION_MINUTES
+from app.services.chat_session import (
+    live_session_ids,
+    session_states,
+    begin_end_session,
+)
+from app.services.identity import resolve_many_ids
+from app.services.matchmaking import (
+    pool_key,
+    user_in_session_key,
+    request_dispatch,
+)
+from app.services.user_flags import (
+    has_role,
+    are_available,
+    sync_many,
+    rebuild_in_session,
+)
+from app.services.presence import leases_key
+from app.services.buckets import all_buckets, user_buckets, USER_BUCKET_HASH, DEFAULT_BUCKET
+from app.services.session_expiry import cancel_session_expiry
+from app.core.sessions.lifecycle import start_session, complete_end
+from app.core.sessions.expiry import expire_sessions
+from app.core.users.reports import ensure_blocks_loaded
+from app.core.users.favorites import ensure_favorites_loaded
+
+logger = logging.getLogger("trueme.session.reconcile")
+
+RECONCILE_INTERVAL_SECONDS = int(os.getenv("TRUEME_RECONCILE_INTERVAL_SECONDS", "600"))
+
+# Redis reads/writes are pipelined in chunks of this size
+RECONCILE_BATCH_SIZE = 500
+
+# One worker reconciles at a time
+LOCK_KEY = "reconcile:lock"
+LOCK_TTL_SECONDS = 300
+LAST_REPORT_KEY = "reconcile:last"
+
+# KEYS: lock; ARGV: token
+# Frees the lock only if this pass still holds it
+_RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# KEYS: female leases, user bucket hash
+# ARGV: now, default bucket, female pool prefix, number of adds,
+#       then (pool, uid) pairs to add, then (pool, uid) pairs to remove
+# The pool diff is computed from reads taken at different moments,
+# so each write rechecks the member here: a female is only added
+# if still eligible for that pool, and only removed if she is not
+# — someone who came online or was requeued after the snapshot
+# (pool score >= now) is never removed.
+# NOTE: availability / in_session flags and pointer keys are built
+# inline. Returns {added, removed}.
+_SYNC_FEMALE_POOLS_LUA = """
+local now = tonumber(ARGV[1])
+
+local function eligible(pool, uid)
+    local lease = redis.call('ZSCORE', KEYS[1], uid)
+    local bucket = redis.call('HGET', KEYS[2], uid) or ARGV[2]
+    return lease and tonumber(lease) >= now
+        and redis.call('GETBIT', 'flags:available', uid) == 1
+        and redis.call('GETBIT', 'flags:in_session', uid) == 0
+        and redis.call('EXISTS', 'user:' .. uid .. ':in_session') == 0
+        and pool == ARGV[3] .. bucket
+end
+
+local adds = 4 + 2 * tonumber(ARGV[4])
+local added, removed = 0, 0
+for i = 5, #ARGV, 2 do
+    local pool, uid = ARGV[i], ARGV[i + 1]
+    if i < adds then
+        if eligible(pool, uid) then
+            added = added + redis.call('ZADD', pool, 'NX', now, uid)
+        end
+    else
+        local score = redis.call('ZSCORE', pool, uid)
+        if score and tonumber(score) < now and not eligible(pool, uid) then
+            removed = removed + redis.call('ZREM', pool, uid)
+        end
+    end
+end
+return {added, removed}
+"""
+
+# ARGV: (pool, uid) pairs — males seen queued while in a session
+# NOTE: pointer keys are built inline.
+_DROP_BUSY_MALES_LUA = """
+local removed = 0
+for i = 1, #ARGV, 2 do
+    if redis.call('EXISTS', 'user:' .. ARGV[i + 1] .. ':in_session') == 1 then
+        removed = removed + redis.call('ZREM', ARGV[i], ARGV[i + 1])
+    end
+end
+return removed
+"""
+
+_release_lock = redis_client.register_script(_RELEASE_LOCK_LUA)
+_sync_female_pools = redis_client.register_script(_SYNC_FEMALE_POOLS_LUA)
+_drop_busy_males = redis_client.register_script(_DROP_BUSY_MALES_LUA)
+
+_task: Optional[asyncio.Task] = None
+
+
+def _chunks(items: list, size: int = RECONCILE_BATCH_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# -------------------------
+# SESSIONS
+# -------------------------
+async def _reconcile_sessions(report: dict) -> set[int]:
+    """
+    Diffs open chat_sessions rows against live Redis records.
+    Returns the user ids that are in a live session afterwards.
+    """
+    now = time.time()
+
+    # Live set FIRST: a session is activated only after its row is
+    # committed, so anything live here is already visible to the
+    # query below. Read the other way round, a chat opened between
+    # the two reads would look like an orphan and be torn down.
+    live = await live_session_ids()
+
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(
+                ChatSession.id,
+                ChatSession.male_id,
+                ChatSession.female_id,
+                ChatSession.started_at,
+            ).where(ChatSession.ended_at.is_(None))
+        )).all()
+
+    db_open = {row.id: row for row in rows}
+    states = await session_states(set(db_open) | live)
+
+    # 1️⃣ Open in DB, over in time or already ended in Redis → finalize
+    overdue, restore = [], []
+    for sid, row in db_open.items():
+        started = row.started_at.replace(tzinfo=timezone.utc).timestamp()
+        state = states.get(sid)
+
+        if state == "ended" or started + SESSION_DURATION_MINUTES * 60 <= now:
+            overdue.append(sid)
+        elif state is None:
+            restore.append(row)
+
+    for batch in _chunks(overdue):
+        await expire_sessions(batch)
+        for sid in batch:
+            await cancel_session_expiry(sid)
+    report["finalized"] = len(overdue)
+
+    # 2️⃣ Open in DB, missing in Redis → restore record + deadline
+    if restore:
+        idents = await resolve_many_ids(
+            uid for row in restore for uid in (row.male_id, row.female_id)
+        )
+        for row in restore:
+            male, female = idents.get(row.male_id), idents.get(row.female_id)
+            await start_session(
+                row.male_id,
+                row.female_id,
+                session_id=row.id,
+                started_at=row.started_at,
+                telegram_ids=(
+                    male.telegram_id if male else None,
+                    female.telegram_id if female else None,
+                ),
+            )
+    report["restored"] = len(restore)
+
+    # 3️⃣ Live in Redis, not open in DB → end the orphan (nothing to bill)
+    orphans = [sid for sid in live if sid not in db_open]
+    ended = 0
+    for sid in orphans:
+        if await begin_end_session(sid, now) and await complete_end(sid):
+            ended += 1
+        await cancel_session_expiry(sid)
+    report["orphans_ended"] = ended
+
+    return {
+        uid
+        for sid, row in db_open.items() if sid not in overdue
+        for uid in (row.male_id, row.female_id)
+    }
+
+
+# -------------------------
+# ROLES + POOL
+# -------------------------
+async def _restore_roles(user_ids: set[int], report: dict):
+    """Role bits drive pool eligibility; refill any that were lost."""
+    user_ids = list(user_ids)
+    missing = []
+    for batch in _chunks(user_ids):
+        missing += [
+            uid for uid, ok in zip(batch, await has_role(batch)) if not ok
+        ]
+
+    idents = [
+        ident for ident in (await resolve_many_ids(missing)).values()
+        if ident.role
+    ]
+    await sync_many(idents)
+
+    report["roles_restored"] = len(idents)
+
+
+async def _rebuild_pool(busy: set[int], report: dict):
+    """
+    Female pools = leased, available, not in a session, each in
+    her own bucket. Males still queued while in a session are dropped.
+    The diff is planned from snapshots; every write is rechecked
+    server-side, so concurrent logins / requeues are never undone.
+    """
+    now = time.time()
+    buckets = await all_buckets()
+
+    leased = [
+        int(uid) for uid in
+        await redis_client.zrangebyscore(leases_key("female"), now, "+inf")
+    ]
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for bucket in buckets:
+            pipe.zrange(pool_key("female", bucket), 0, -1)
+            pipe.zrange(pool_key("male", bucket), 0, -1)
+        pools = await pipe.execute()
+
+    current, queued = {}, []
+    for bucket, females, males in zip(buckets, pools[::2], pools[1::2]):
+        current.update({int(uid): bucket for uid in females})
+        queued += [(int(uid), bucket) for uid in males]
+
+    want = set()
+    for batch in _chunks(leased):
+        available = await are_available(batch)
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for uid in batch:
+                pipe.exists(user_in_session_key(uid))
+            flags = await pipe.execute()
+        for uid, online, in_session in zip(batch, available, flags):
+            if online and not in_session and uid not in busy:
+                want.add(uid)
+
+    stale_males = []
+    for batch in _chunks(queued):
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for uid, _ in batch:
+                pipe.exists(user_in_session_key(uid))
+            flags = await pipe.execute()
+        stale_males += [m for m, in_session in zip(batch, flags) if in_session]
+
+    wanted = await user_buckets(want)
+    added = [uid for uid, bucket in wanted.items() if current.get(uid) != bucket]
+    removed = [
+        (uid, bucket) for uid, bucket in current.items()
+        if wanted.get(uid) != bucket
+    ]
+
+    added_n = removed_n = 0
+    adds = [(pool_key("female", wanted[uid]), uid) for uid in added]
+    removes = [(pool_key("female", bucket), uid) for uid, bucket in removed]
+    batches = [(batch, len(batch)) for batch in _chunks(adds)]
+    batches += [(batch, 0) for batch in _chunks(removes)]
+    for batch, n_adds in batches:
+        n_added, n_removed = await _sync_female_pools(
+            keys=[leases_key("female"), USER_BUCKET_HASH],
+            args=[
+                now, DEFAULT_BUCKET, pool_key("female", ""),
+                n_adds,
+                *(v for pair in batch for v in pair),
+            ],
+        )
+        added_n += n_added
+        removed_n += n_removed
+
+    for batch in _chunks(stale_males):
+        removed_n += await _drop_busy_males(
+            keys=[],
+            args=[v for uid, bucket in batch for v in (pool_key("male", bucket), uid)],
+        )
+
+    if added_n:
+        request_dispatch()
+
+    report["pool_added"] = added_n
+    report["pool_removed"] = removed_n
+    return leased
+
+
+# -------------------------
+# ENTRY POINTS
+# -------------------------
+async def reconcile() -> Optional[dict]:
+    """
+    One full pass. Returns the report, or None if another
+    worker holds the lock.
+    """
+    token = uuid.uuid4().hex
+    if not await redis_client.set(LOCK_KEY, token, nx=True, ex=LOCK_TTL_SECONDS):
+        return None
+
+    started = time.monotonic()
+    report = {"at": time.time()}
+    try:
+        busy = await _reconcile_sessions(report)
+        # Claims in flight right now are missed until the next pass
+        await rebuild_in_session(busy)
+        leased = await _rebuild_pool(busy, report)
+        await _restore_roles(busy | set(leased), report)
+        report["blocks_reloaded"] = await ensure_blocks_loaded()
+        report["favorites_reloaded"] = await ensure_favorites_loaded()
+    finally:
+        # A pass that outlived the lock must not free another's
+        await _release_lock(keys=[LOCK_KEY], args=[token])
+
+    report["seconds"] = round(time.monotonic() - started, 3)
+    await redis_client.set(LAST_REPORT_KEY, json.dumps(report))
+
+    logger.info(f"[RECONCILE] {report}")
+    return report
+
+
+async def last_report() -> Optional[dict]:
+    raw = await redis_client.get(LAST_REPORT_KEY)
+    return json.loads(raw) if raw else None
+
+
+async def _run():
+    logger.info("[RECONCILE] Reconciler started")
+
+    while True:
+        try:
+            await reconcile()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"[RECONCILE] Pass failed: {e}")
+
+        await asyncio.sleep(RECONCILE_INTERVAL_SECONDS)
+
+
+def start_reconciler():
+    """
+    First pass runs right away (startup), then every
+    RECONCILE_INTERVAL_SECONDS. Needs the outbox started first.
+    """
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_run())
+
+
+async def stop_reconciler():
+    global _task
+    if _task is None:
+        return
+
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
@@ -1,13 +1,16 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from sqlalchemy import select, desc
 import logging
+import time
 
 from app.database import AsyncSessionLocal
 from app.models.session import ChatSession
-from app.models.user import User
-from app.services.chat_session import get_partner
+from app.services.chat_session import (
+    get_session_context,
+    activate_session,
+)
+from app.services.identity import resolve, resolve_id
 from app.core.sessions.lifecycle import stop_session
-from app.services.billing import finalize_session
 
 logger = logging.getLogger("trueme.relay")
 
@@ -23,26 +26,47 @@ class RelayResult:
 async def relay_text(telegram_id: int, text: str):
     logger.info(f"[RELAY] Incoming message from TG {telegram_id}: {text}")
 
-    async with AsyncSessionLocal() as db:
+    # ⚡ Hot path: single Redis read, no Postgres
+    ctx = await get_session_context(telegram_id)
+    if ctx:
+        return await _relay_from_context(ctx)
+
+    return await _relay_from_db(telegram_id)
+
 
-        # Convert telegram_id → DB ID
-        user = await db.scalar(
-            select(User).where(User.telegram_id == telegram_id)
+async def _relay_from_context(ctx: dict):
+    if time.time() < ctx["exp"]:
+        logger.info(
+            f"[RELAY] Relaying message db:{ctx['me']} → db:{ctx['peer']} "
+            f"(session_id={ctx['sid']}, cached)"
         )
+        return RelayResult.RELAY, ctx["peer_tg"]
 
-        if not user:
-            logger.warning(f"[RELAY] No DB user found for telegram_id={telegram_id}")
-            return RelayResult.NONE, None
+    logger.warning(f"[RELAY] Session expired for session_id={ctx['sid']}")
 
-        db_user_id = user.id
-        logger.info(f"[RELAY] telegram_id={telegram_id} → db_id={db_user_id}")
+    # Finalizes under the session's ending claim
+    await stop_session(ctx["me"])
 
-        # Get partner from Redis pairing
-        partner_db_id = await get_partner(db_user_id)
+    return RelayResult.EXPIRED, ctx["peer_tg"]
 
-        if not partner_db_id:
-            logger.warning(f"[RELAY] No partner found for db_id={db_user_id}")
-            return RelayResult.NONE, None
+
+async def _relay_from_db(telegram_id: int):
+    """
+    Cache miss: resolve everything from Postgres and
+    backfill the session record for the next message.
+    """
+
+    # Convert telegram_id → DB ID (identity cache)
+    user = await resolve(telegram_id)
+
+    if not user:
+        logger.warning(f"[RELAY] No DB user found for telegram_id={telegram_id}")
+        return RelayResult.NONE, None
+
+    db_user_id = user.user_id
+    logger.info(f"[RELAY] telegram_id={telegram_id} → db_id={db_user_id}")
+
+    async with AsyncSessionLocal() as db:
 
         # 🔥 FIX 1: Always get LATEST active session
         session = await db.scalar(
@@ -62,6 +86,11 @@ async def relay_text(telegram_id: int, text: str):
             await stop_session(db_user_id)
             return RelayResult.NONE, None
 
+        partner_db_id = (
+            session.female_id if session.male_id == db_user_id
+            else session.male_id
+        )
+
         logger.info(
             f"[RELAY] Active session id={session.id} started_at={session.started_at}"
         )
@@ -72,24 +101,36 @@ async def relay_text(telegram_id: int, text: str):
         if datetime.utcnow() >= expiry:
             logger.warning(f"[RELAY] Session expired for session_id={session.id}")
 
-            # 🔥 FIX 2: Use NEW DB session for finalize to avoid nested transaction
-            async with AsyncSessionLocal() as new_db:
-                await finalize_session(new_db, session.id)
-
+            # Finalizes (in its own DB session) under the ending claim
             await stop_session(db_user_id)
 
-            partner = await db.get(User, partner_db_id)
+            partner = await resolve_id(partner_db_id)
             partner_tg = partner.telegram_id if partner else None
 
             return RelayResult.EXPIRED, partner_tg
 
         # Convert partner DB ID → telegram_id
-        partner = await db.get(User, partner_db_id)
+        partner = await resolve_id(partner_db_id)
 
         if not partner:
             logger.warning(f"[RELAY] Partner missing id={partner_db_id}")
             return RelayResult.NONE, None
 
+        started = session.started_at.replace(tzinfo=timezone.utc).timestamp()
+        activated = await activate_session(
+            session_id=session.id,
+            started_at=started,
+            expires_at=expiry.replace(tzinfo=timezone.utc).timestamp(),
+            user_a=db_user_id,
+            user_b=partner_db_id,
+            user_a_tg=telegram_id,
+            user_b_tg=partner.telegram_id,
+        )
+
+        if not activated:
+            logger.warning(f"[RELAY] Session id={session.id} is ending")
+            return RelayResult.NONE, None
+
         logger.info(
             f"[RELAY] Relaying message db:{db_user_id} → db:{partner_db_id}"
         )
@@ -0,0 +1,81 @@
+import logging
+
+from sqlalchemy import select, text
+
+from app.database import AsyncSessionLocal
+from app.models.favorite import Favorite
+from app.services.identity import resolve
+from app.services.favorites import (
+    add_favorite,
+    favorites_loaded,
+    load_favorites,
+)
+from app.core.sessions.history import shared_session
+
+logger = logging.getLogger("trueme.favorites")
+
+
+class FavoriteError(Exception):
+    pass
+
+
+# -------------------------
+# FAVORITE
+# -------------------------
+async def favorite_partner(telegram_id: int, partner_id: int) -> int:
+    """
+    Saves a female the caller has chatted with (the partner id
+    comes from the post-chat button, checked against chat_sessions)
+    and mirrors it into his Redis set, which the direct "chat again"
+    claim reads. Repeating it is harmless. Returns the female id.
+    """
+    user = await resolve(telegram_id)
+    if not user:
+        raise FavoriteError("USER_NOT_FOUND")
+
+    if user.role != "male":
+        raise FavoriteError("ONLY_MALE_CAN_FAVORITE")
+
+    if not await shared_session(user.user_id, partner_id):
+        raise FavoriteError("NO_PARTNER")
+
+    # ON CONFLICT: a double tap must not trip uq_favorites_pair
+    async with AsyncSessionLocal() as db:
+        added = await db.scalar(
+            text("""
+                INSERT INTO favorites (male_id, female_id)
+                VALUES (:male_id, :female_id)
+                ON CONFLICT (male_id, female_id) DO NOTHING
+                RETURNING id
+            """),
+            {"male_id": user.user_id, "female_id": partner_id},
+        )
+        await db.commit()
+
+    if added:
+        logger.info(f"[FAVORITES] {user.user_id} favorited {partner_id}")
+
+    await add_favorite(user.user_id, partner_id)
+    return partner_id
+
+
+# -------------------------
+# RELOAD (after a Redis flush)
+# -------------------------
+async def ensure_favorites_loaded() -> bool:
+    """
+    Rebuilds the favorite sets from the favorites table if Redis
+    lost them. Returns True if a reload was needed.
+    """
+    if await favorites_loaded():
+        return False
+
+    async with AsyncSessionLocal() as db:
+        pairs = (await db.execute(
+            select(Favorite.male_id, Favorite.female_id)
+        )).all()
+
+    await load_favorites(pairs)
+
+    logger.info(f"[FAVORITES] Reloaded {len(pairs)} favorites")
+    return True
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+from typing import Optional
+
+from app.services.identity import resolve_many_ids
+from app.services.outbox import outbox, Lane
+from app.services.presence import sweep_expired
+
+logger = logging.getLogger("trueme.presence.sweeper")
+
+SWEEP_BATCH_SIZE = 500
+SWEEP_INTERVAL_SECONDS = 30.0
+
+_task: Optional[asyncio.Task] = None
+
+
+async def _sweep() -> bool:
+    """
+    Evicts one batch of lapsed leases.
+    Returns True when a batch was full and more are likely waiting.
+    """
+    evicted = await sweep_expired(SWEEP_BATCH_SIZE)
+
+    females = evicted["female"]
+    if females:
+        idents = await resolve_many_ids(females)
+        for ident in idents.values():
+            outbox.enqueue(
+                ident.telegram_id,
+                "🔴 You were set OFFLINE after a period of inactivity.\n"
+                "Use /start to go online again.",
+                lane=Lane.BULK,
+            )
+
+    total = sum(len(ids) for ids in evicted.values())
+    if total:
+        logger.info(
+            f"[PRESENCE] Evicted {len(females)} females, "
+            f"{len(evicted['male'])} males"
+        )
+
+    return any(len(ids) == SWEEP_BATCH_SIZE for ids in evicted.values())
+
+
+async def _run():
+    logger.info("[PRESENCE] Sweeper started")
+
+    while True:
+        try:
+            if await _sweep():
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"[PRESENCE] Sweep failed: {e}")
+
+        await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
+
+
+def start_presence_sweeper():
+    """
+    Safe to start on every worker: each eviction is one Lua call.
+    Notifications go through the outbox, which must be started first.
+    """
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_run())
+
+
+async def stop_presence_sweeper():
+    global _task
+    if _task is None:
+        return
+
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
@@ -2,6 +2,9 @@ from sqlalchemy import select
 
 from app.database import AsyncSessionLocal
 from app.models.user import User
+from app.services.buckets import parse_language_code
+from app.services.identity import Identity, invalidate, remember
+from app.services.user_flags import set_role as set_role_flag, set_verified
 
 
 class ProfileError(Exception):
@@ -32,12 +35,40 @@ async def set_role(telegram_id: int, role: str) -> str:
             user.role = "male"
             user.is_verified = True
             await db.commit()
+            await invalidate(user.id, telegram_id)
+            await set_role_flag(user.id, "male")
+            await set_verified(user.id, True)
             return "male_activated"
 
         if role == "female":
             user.role = "female"
             user.is_verified = False
             await db.commit()
+            await invalidate(user.id, telegram_id)
+            await set_role_flag(user.id, "female")
+            await set_verified(user.id, False)
             return "female_pending"
 
         raise ProfileError("INVALID_ROLE")
+
+
+async def set_locale(telegram_id: int, language_code: str) -> Identity:
+    """
+    Fills language / region (matchmaking bucket) from Telegram's
+    language_code. Values already on the profile are kept.
+    """
+    language, region = parse_language_code(language_code)
+
+    async with AsyncSessionLocal() as db:
+        user = await db.scalar(
+            select(User).where(User.telegram_id == telegram_id)
+        )
+
+        if not user:
+            raise ProfileError("USER_NOT_FOUND")
+
+        user.language = user.language or language
+        user.region = user.region or region
+        await db.commit()
+
+    return await remember(user)
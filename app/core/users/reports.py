@@ -0,0 +1,124 @@
+import logging
+import os
+from typing import Optional
+
+from sqlalchemy import select, func
+
+from app.database import AsyncSessionLocal
+from app.models.report import UserReport
+from app.services.identity import resolve
+from app.services.match_filters import (
+    block_pair,
+    blocks_loaded,
+    load_blocks,
+)
+from app.services.matchmaking import remove_user_from_pool
+from app.services.user_flags import set_suspended
+from app.core.sessions.history import shared_session
+
+logger = logging.getLogger("trueme.reports")
+
+# Distinct reporters after which a user is no longer matched
+REPORT_SUSPEND_THRESHOLD = int(os.getenv("TRUEME_REPORT_SUSPEND_THRESHOLD", "3"))
+
+
+class ReportError(Exception):
+    pass
+
+
+def _over_threshold():
+    """Reported ids with at least REPORT_SUSPEND_THRESHOLD reporters."""
+    return (
+        select(UserReport.reported_id)
+        .group_by(UserReport.reported_id)
+        .having(
+            func.count(func.distinct(UserReport.reporter_id))
+            >= REPORT_SUSPEND_THRESHOLD
+        )
+    )
+
+
+async def _suspend(user_id: int):
+    await set_suspended(user_id, True)
+    await remove_user_from_pool(user_id)
+    logger.warning(f"[REPORTS] User {user_id} suspended from matching")
+
+
+# -------------------------
+# REPORT
+# -------------------------
+async def report_partner(
+    telegram_id: int,
+    partner_id: int,
+    reason: Optional[str] = None,
+) -> int:
+    """
+    Reports a user the caller has chatted with (the partner id
+    comes from the post-chat button, checked against chat_sessions).
+    The pair is never matched again; enough distinct reporters
+    suspend the reported user from matching. Returns the reported
+    user id.
+    """
+    user = await resolve(telegram_id)
+    if not user:
+        raise ReportError("USER_NOT_FOUND")
+
+    if not await shared_session(user.user_id, partner_id):
+        raise ReportError("NO_PARTNER")
+
+    async with AsyncSessionLocal() as db:
+        already = await db.scalar(
+            select(UserReport.id).where(
+                UserReport.reporter_id == user.user_id,
+                UserReport.reported_id == partner_id,
+            )
+        )
+        if already:
+            raise ReportError("ALREADY_REPORTED")
+
+        db.add(UserReport(
+            reporter_id=user.user_id,
+            reported_id=partner_id,
+            reason=reason,
+        ))
+        await db.flush()
+
+        suspend = await db.scalar(
+            _over_threshold().where(UserReport.reported_id == partner_id)
+        )
+        await db.commit()
+
+    await block_pair(user.user_id, partner_id)
+    logger.info(f"[REPORTS] {user.user_id} reported {partner_id}")
+
+    if suspend:
+        await _suspend(partner_id)
+
+    return partner_id
+
+
+# -------------------------
+# RELOAD (after a Redis flush)
+# -------------------------
+async def ensure_blocks_loaded() -> bool:
+    """
+    Rebuilds block sets and suspensions from user_reports if Redis
+    lost them. Returns True if a reload was needed.
+    """
+    if await blocks_loaded():
+        return False
+
+    async with AsyncSessionLocal() as db:
+        pairs = (await db.execute(
+            select(UserReport.reporter_id, UserReport.reported_id).distinct()
+        )).all()
+        suspended = (await db.scalars(_over_threshold())).all()
+
+    await load_blocks(pairs)
+    for user_id in suspended:
+        await set_suspended(user_id, True)
+
+    logger.info(
+        f"[REPORTS] Reloaded {len(pairs)} blocks, {len(suspended)} suspensions"
+    )
+    return True
@@ -2,6 +2,7 @@ from aiogram import Router, types, F
 import logging
 
 from app.core.sessions.relay import relay_text, RelayResult
+from app.services.outbox import outbox, Lane
 
 router = Router()
 logger = logging.getLogger("trueme.chat")
@@ -29,12 +30,12 @@ async def relay_message(message: types.Message):
         return
 
     if result == RelayResult.EXPIRED:
-        await message.bot.send_message(
+        outbox.enqueue(
             message.from_user.id,
             "⏰ Chat ended (30 minutes completed)."
         )
         if partner_id:
-            await message.bot.send_message(
+            outbox.enqueue(
                 partner_id,
                 "⏰ Chat ended. Thanks for chatting!"
             )
@@ -42,4 +43,4 @@ async def relay_message(message: types.Message):
 
     # ✅ Normal relay
     if partner_id:
-        await message.bot.send_message(partner_id, message.text)
+        outbox.enqueue(partner_id, message.text, lane=Lane.RELAY)
@@ -1,9 +1,12 @@
+from typing import Optional
+
 from aiogram import Router, types
-from aiogram.types import CallbackQuery
-from sqlalchemy import select
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 
-from app.database import AsyncSessionLocal
-from app.models.user import User
+from app.core.matchmaking.flow import reconnect_favorite, MatchError
+from app.core.users.favorites import favorite_partner, FavoriteError
+from app.core.users.reports import report_partner, ReportError
+from app.services.identity import resolve
 
 router = Router()
 
@@ -18,23 +21,97 @@ async def next_chat_handler(callback: CallbackQuery):
     )
 
 
-@router.callback_query(lambda c: c.data == "fav_user")
+def _partner_id(data: str) -> Optional[int]:
+    """report_user:{id} / fav_user:{id} → id; None for buttons sent without one."""
+    _, _, raw = data.partition(":")
+    return int(raw) if raw.isdigit() else None
+
+
+def chat_again_keyboard(female_id: int):
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="💬 Chat Again",
+                    callback_data=f"chat_again:{female_id}"
+                )
+            ]
+        ]
+    )
+
+
+@router.callback_query(lambda c: c.data and c.data.startswith("fav_user"))
 async def fav_user_handler(callback: CallbackQuery):
 
+    try:
+        partner_id = _partner_id(callback.data)
+        if partner_id is None:
+            raise FavoriteError("NO_PARTNER")
+        female_id = await favorite_partner(callback.from_user.id, partner_id)
+    except FavoriteError as e:
+        responses = {
+            "NO_PARTNER": "⚠️ No recent chat to add.",
+            "ONLY_MALE_CAN_FAVORITE": "🚫 Only male users can add favorites.",
+        }
+        await callback.answer(responses.get(str(e), "❌ Unable to add favorite."))
+        return
+
     await callback.answer("⭐ Added to favorites")
 
     await callback.message.answer(
-        "⭐ User added to favorites."
+        "⭐ User added to favorites.\n"
+        "Tap below to chat again whenever she is free.",
+        reply_markup=chat_again_keyboard(female_id)
     )
 
 
-@router.callback_query(lambda c: c.data == "report_user")
+@router.callback_query(lambda c: c.data and c.data.startswith("chat_again:"))
+async def chat_again_handler(callback: CallbackQuery):
+
+    # Both sides are notified by the flow once the pair is opened
+    try:
+        female_id = int(callback.data.split(":", 1)[1])
+        await reconnect_favorite(callback.from_user.id, female_id)
+    except (ValueError, MatchError) as e:
+        responses = {
+            "PARTNER_BUSY": "⏳ She is in another chat right now. Try again soon or use /find.",
+            "PARTNER_OFFLINE": "💤 She is offline right now. Use /find to meet someone new.",
+            "PARTNER_UNAVAILABLE": "🚫 This user is no longer available.",
+            "NOT_FAVORITE": "⚠️ Add this user to favorites first.",
+            "ALREADY_IN_SESSION": "💬 You are already in an active chat.",
+            "INSUFFICIENT_STARS": "❌ You don’t have enough Stars.\nPlease recharge.",
+            "SUSPENDED": "🚫 Matching is paused for your account after user reports.",
+        }
+        await callback.answer(
+            responses.get(str(e), "❌ Unable to reconnect."),
+            show_alert=True
+        )
+        return
+
+    await callback.answer()
+
+
+@router.callback_query(lambda c: c.data and c.data.startswith("report_user"))
 async def report_user_handler(callback: CallbackQuery):
 
+    try:
+        partner_id = _partner_id(callback.data)
+        if partner_id is None:
+            raise ReportError("NO_PARTNER")
+        await report_partner(callback.from_user.id, partner_id)
+    except ReportError as e:
+        responses = {
+            "NO_PARTNER": "⚠️ No recent chat to report.",
+            "ALREADY_REPORTED": "🚨 You already reported this user.",
+        }
+        await callback.answer(responses.get(str(e), "❌ Unable to report."))
+        return
+
     await callback.answer("🚨 Report submitted")
 
     await callback.message.answer(
-        "🚨 Report submitted. Admin will review."
+        "🚨 Report submitted. Admin will review.\n"
+        "You won't be matched with this user again."
     )
 
 
@@ -45,10 +122,7 @@ async def session_stats_handler(callback: CallbackQuery):
 
     telegram_id = callback.from_user.id
 
-    async with AsyncSessionLocal() as db:
-        user = await db.scalar(
-            select(User).where(User.telegram_id == telegram_id)
-        )
+    user = await resolve(telegram_id)
 
     if not user:
         await callback.message.answer("Stats unavailable.")
@@ -2,6 +2,7 @@ from aiogram import Router, types
 import logging
 
 from app.core.sessions.relay import relay_text, RelayResult
+from app.services.outbox import outbox, Lane
 
 router = Router()
 logger = logging.getLogger("trueme.relay")
@@ -29,31 +30,23 @@ async def relay_handler(message: types.Message):
         return
 
     if result == RelayResult.EXPIRED:
-        try:
-            await message.answer(
+        outbox.enqueue(
+            user_id,
+            "⛔ Chat ended.\n⏱ Session time expired."
+        )
+        if partner_id:
+            outbox.enqueue(
+                partner_id,
                 "⛔ Chat ended.\n⏱ Session time expired."
             )
-            if partner_id:
-                await message.bot.send_message(
-                    partner_id,
-                    "⛔ Chat ended.\n⏱ Session time expired."
-                )
-        except Exception as e:
-            logger.warning(f"[RELAY] Expiry notify failed: {e}")
         return
 
-    # Relay message
-    try:
-        await message.bot.send_message(
-            partner_id,
-            text
-        )
-
+    # Relay message (delivery + retries handled by the outbox)
+    if outbox.enqueue(partner_id, text, lane=Lane.RELAY):
         logger.info(
             f"[RELAY] {user_id} → {partner_id}: {text}"
         )
-
-    except Exception as e:
+    else:
         logger.warning(
-            f"[RELAY] Failed {user_id} → {partner_id}: {e}"
+            f"[RELAY] Failed to queue {user_id} → {partner_id}"
         )
@@ -11,10 +11,12 @@ from aiogram.types import (
 from sqlalchemy import select
 
 from app.core.users.registration import ensure_user_exists
+from app.core.users.profile import set_locale
 from app.database import AsyncSessionLocal
 from app.models.user import User
-from app.redis_client import get_redis
-from app.services.matchmaking import add_user_to_pool, remove_user_from_pool
+from app.services.identity import resolve, remember, invalidate
+from app.services.presence import go_online, go_offline
+from app.services.user_flags import set_role, is_available
 
 logger = logging.getLogger("trueme.start")
 
@@ -69,19 +71,17 @@ def female_online_keyboard(is_online: bool):
 @router.message(CommandStart())
 async def start_handler(message: types.Message):
     telegram_id = message.from_user.id
-    await ensure_user_exists(telegram_id=telegram_id)
 
-    async with AsyncSessionLocal() as db:
-        user = await db.scalar(
-            select(User).where(User.telegram_id == telegram_id)
-        )
+    # Known users are served from the identity cache (no DB)
+    user = await resolve(telegram_id)
+    if not user:
+        user = await remember(await ensure_user_exists(telegram_id=telegram_id))
 
-    redis = await get_redis()
+    # Matchmaking bucket, once (later /start calls are cache hits)
+    if not user.language and message.from_user.language_code:
+        user = await set_locale(telegram_id, message.from_user.language_code)
 
-    # 🔁 Always backfill role into Redis
-    if user.role:
-        await redis.set(f"user:{user.id}:role", user.role)
-        logger.info(f"[START] Backfilled role={user.role} for user={user.id}")
+    # Role / verified bits are written by the identity cache on load
 
     # ---------------- FEMALE ----------------
     if user.role == "female":
@@ -93,7 +93,7 @@ async def start_handler(message: types.Message):
             )
             return
 
-        is_online = await redis.get(f"user:{user.id}:available") == "1"
+        is_online = await is_available(user.user_id)
 
         await message.answer(
             "👋 <b>Welcome back to TRUEME!</b>\n\n"
@@ -137,8 +137,9 @@ async def role_selected(callback: CallbackQuery):
         db.add(user)
         await db.commit()
 
-    redis = await get_redis()
-    await redis.set(f"user:{user.id}:role", role)
+    await invalidate(user.id, telegram_id)
+
+    await set_role(user.id, role)
 
     logger.info(f"[START] User {user.id} selected role={role}")
 
@@ -162,27 +163,18 @@ async def female_toggle(callback: CallbackQuery):
     telegram_id = callback.from_user.id
     await callback.answer()
 
-    async with AsyncSessionLocal() as db:
-        user = await db.scalar(
-            select(User).where(User.telegram_id == telegram_id)
-        )
-
-    redis = await get_redis()
-
-    # 🔥 ENSURE ROLE IS IN REDIS (THIS WAS MISSING)
-    await redis.set(f"user:{user.id}:role", "female")
+    user = await resolve(telegram_id)
 
-    available_key = f"user:{user.id}:available"
+    # Requeue after a session checks the female role bit
+    await set_role(user.user_id, "female")
 
     if callback.data == "female_online":
-        await redis.set(available_key, "1")
-        await add_user_to_pool(user.id)
-        logger.info(f"[START] Female {user.id} ONLINE, role synced, added to pool")
+        await go_online(user.user_id)
+        logger.info(f"[START] Female {user.user_id} ONLINE, role synced, added to pool")
         is_online = True
     else:
-        await redis.delete(available_key)
-        await remove_user_from_pool(user.id)
-        logger.info(f"[START] Female {user.id} OFFLINE, removed from pool")
+        await go_offline(user.user_id)
+        logger.info(f"[START] Female {user.user_id} OFFLINE, removed from pool")
         is_online = False
 
     await callback.message.edit_text(
@@ -1,11 +1,13 @@
+from typing import Optional
+
 from aiogram import Router, types
 from aiogram.filters import Command
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from sqlalchemy import select
 
-from app.database import AsyncSessionLocal
-from app.models.user import User
 from app.core.sessions.lifecycle import stop_session
+from app.services.matchmaking import cancel_search
+from app.services.identity import resolve, resolve_id
+from app.services.outbox import outbox, Lane
 
 router = Router()
 
@@ -14,46 +16,47 @@ router = Router()
 # KEYBOARDS
 # =====================================================
 
-def male_post_chat_keyboard():
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text="🔎 Next Chat",
-                    callback_data="next_chat"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    text="⭐ Add to Favorites",
-                    callback_data="fav_user"
-                ),
-                InlineKeyboardButton(
-                    text="🚨 Report User",
-                    callback_data="report_user"
-                )
-            ]
+# Partner actions carry the partner's user id: the handlers act on
+# the chat this message belongs to, not on whoever was matched last.
+def male_post_chat_keyboard(partner_id: Optional[int] = None):
+    rows = [
+        [
+            InlineKeyboardButton(
+                text="🔎 Next Chat",
+                callback_data="next_chat"
+            )
         ]
-    )
-
-
-def female_post_chat_keyboard():
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text="🚨 Report User",
-                    callback_data="report_user"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    text="📊 Session Stats",
-                    callback_data="session_stats"
-                )
-            ]
-        ]
-    )
+    ]
+    if partner_id:
+        rows.append([
+            InlineKeyboardButton(
+                text="⭐ Add to Favorites",
+                callback_data=f"fav_user:{partner_id}"
+            ),
+            InlineKeyboardButton(
+                text="🚨 Report User",
+                callback_data=f"report_user:{partner_id}"
+            )
+        ])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def female_post_chat_keyboard(partner_id: Optional[int] = None):
+    rows = []
+    if partner_id:
+        rows.append([
+            InlineKeyboardButton(
+                text="🚨 Report User",
+                callback_data=f"report_user:{partner_id}"
+            )
+        ])
+    rows.append([
+        InlineKeyboardButton(
+            text="📊 Session Stats",
+            callback_data="session_stats"
+        )
+    ])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
 # =====================================================
@@ -69,17 +72,21 @@ async def stop_handler(message: types.Message):
     # ----------------------------------
     # Resolve Telegram → DB User
     # ----------------------------------
-    async with AsyncSessionLocal() as db:
-        user = await db.scalar(
-            select(User).where(User.telegram_id == telegram_id)
-        )
+    user = await resolve(telegram_id)
 
-        if not user:
-            await message.answer("⚠️ User not found.")
-            return
+    if not user:
+        outbox.enqueue(message.chat.id, "⚠️ User not found.")
+        return
 
-        user_role = user.role
-        user_db_id = user.id
+    user_role = user.role
+    user_db_id = user.user_id
+
+    # ----------------------------------
+    # Waiting male → cancel the search
+    # ----------------------------------
+    if user_role == "male" and await cancel_search(user_db_id):
+        outbox.enqueue(message.chat.id, "🔍 Search cancelled.")
+        return
 
     # ----------------------------------
     # Stop Session (core lifecycle)
@@ -90,35 +97,40 @@ async def stop_handler(message: types.Message):
     # Notify Partner (if exists)
     # ----------------------------------
     if partner_db_id:
-        async with AsyncSessionLocal() as db:
-            partner = await db.get(User, partner_db_id)
+        partner = await resolve_id(partner_db_id)
 
         if partner:
             if partner.role == "male":
-                await message.bot.send_message(
+                outbox.enqueue(
                     partner.telegram_id,
                     "⛔ Partner left the chat.",
-                    reply_markup=male_post_chat_keyboard()
+                    lane=Lane.BULK,
+                    reply_markup=male_post_chat_keyboard(user_db_id)
                 )
             else:
-                await message.bot.send_message(
+                outbox.enqueue(
                     partner.telegram_id,
                     "⛔ Partner left the chat.\n\n"
                     "You are still ONLINE and will auto-connect when a male searches.",
-                    reply_markup=female_post_chat_keyboard()
+                    lane=Lane.BULK,
+                    reply_markup=female_post_chat_keyboard(user_db_id)
                 )
 
     # ----------------------------------
     # Self Response (Role Based)
     # ----------------------------------
     if user_role == "male":
-        await message.answer(
+        outbox.enqueue(
+            message.chat.id,
             "⛔ Chat ended.",
-            reply_markup=male_post_chat_keyboard()
+            lane=Lane.BULK,
+            reply_markup=male_post_chat_keyboard(partner_db_id)
         )
     else:
-        await message.answer(
+        outbox.enqueue(
+            message.chat.id,
             "⛔ Chat ended.\n\n"
             "You are still ONLINE and will auto-connect when a male searches.",
-            reply_markup=female_post_chat_keyboard()
+            lane=Lane.BULK,
+            reply_markup=female_post_chat_keyboard(partner_db_id)
         )
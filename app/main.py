@@ -6,6 +6,18 @@ from aiogram.types import Update
 
 from app.config import BOT_TOKEN
 from app.config import ADMIN_SECRET
+from app.core.sessions.expiry import start_expiry_engine, stop_expiry_engine
+from app.core.matchmaking.dispatcher import start_dispatcher, stop_dispatcher
+from app.core.sessions.reconcile import start_reconciler, stop_reconciler
+from app.core.payments.stars import start_stars_workers, stop_stars_workers
+from app.core.payments.metering import start_wallet_flusher, stop_wallet_flusher
+from app.core.users.presence import start_presence_sweeper, stop_presence_sweeper
+from app.middlewares.flood import FloodControlMiddleware
+from app.middlewares.presence import PresenceMiddleware
+from app.services.outbox import outbox
+from app.services.update_queue import update_queue
+from app.services.update_dedupe import first_delivery, forget
+from app.redis_client import assert_single_node
 import logging
 
 logging.basicConfig(
@@ -23,6 +35,8 @@ app = FastAPI()
 # -------------------------
 bot = Bot(token=BOT_TOKEN, parse_mode=ParseMode.HTML)
 dp = Dispatcher()
+dp.update.outer_middleware(FloodControlMiddleware())
+dp.update.outer_middleware(PresenceMiddleware())
 
 # -------------------------
 # TELEGRAM HANDLERS
@@ -80,11 +94,32 @@ app.add_middleware(
 async def telegram_webhook(request: Request):
     try:
         data = await request.json()
+        update_id = int(data["update_id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid Telegram update")
+
+    # 🔁 Redelivery (we were slow or errored): ack without processing
+    if not await first_delivery(update_id):
+        return {"ok": True}
+
+    try:
         update = Update.model_validate(data)
     except Exception:
+        await forget(update_id)
         raise HTTPException(status_code=400, detail="Invalid Telegram update")
 
-    await dp.feed_update(bot, update)
+    # ⚡ Queued mode: ack now, shard workers run the handlers
+    if update_queue.enabled:
+        if not await update_queue.submit(update):
+            await forget(update_id)
+            raise HTTPException(status_code=503, detail="Update queue full")
+        return {"ok": True}
+
+    try:
+        await dp.feed_update(bot, update)
+    except Exception:
+        await forget(update_id)
+        raise
     return {"ok": True}
 
 # -------------------------
@@ -93,10 +128,27 @@ async def telegram_webhook(request: Request):
 @app.on_event("startup")
 async def on_startup():
     print("🚀 TRUEME BOT STARTED (WEBHOOK MODE)")
+    await assert_single_node()
     await dp.emit_startup()
+    outbox.start(bot)
+    update_queue.start(dp, bot)
+    start_wallet_flusher()
+    await start_stars_workers()
+    start_reconciler()
+    start_expiry_engine()
+    start_dispatcher()
+    start_presence_sweeper()
 
 @app.on_event("shutdown")
 async def on_shutdown():
     print("🛑 TRUEME BOT SHUTDOWN")
+    await stop_presence_sweeper()
+    await stop_dispatcher()
+    await stop_expiry_engine()
+    await stop_reconciler()
+    await stop_stars_workers()
+    await stop_wallet_flusher()
+    await update_queue.stop()
+    await outbox.stop()
     await dp.emit_shutdown()
     await bot.session.close()
@@ -0,0 +1,64 @@
+import logging
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, TelegramObject, Update
+
+from app.services.flood import Budget, hit
+from app.services.outbox import outbox
+
+logger = logging.getLogger("trueme.flood.middleware")
+
+FLOOD_WARNING = "🐢 You're going too fast. Please slow down."
+FLOOD_CALLBACK_TOAST = "🐢 Slow down"
+
+
+def _budget(update: Update):
+    if update.callback_query:
+        return Budget.CALLBACK
+
+    message = update.message or update.edited_message
+    if message is None:
+        return None
+
+    text = message.text or ""
+    return Budget.COMMAND if text.startswith("/") else Budget.RELAY
+
+
+async def _answer_quietly(callback: CallbackQuery):
+    try:
+        await callback.answer(FLOOD_CALLBACK_TOAST)
+    except Exception as e:
+        logger.debug(f"[FLOOD] Could not answer callback {callback.id}: {e}")
+
+
+class FloodControlMiddleware(BaseMiddleware):
+    """
+    Outer update middleware, registered first: an over-limit update
+    is dropped here, before identity lookups, handlers or DB work.
+    The user gets one throttled warning through the outbox; dropped
+    button presses are still answered so the client stops spinning.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        tg_user = data.get("event_from_user")
+        budget = _budget(event) if tg_user else None
+
+        if budget:
+            warn = await hit(tg_user.id, budget)
+            if warn is not None:
+                if event.callback_query:
+                    # Stop the button spinner; the toast replaces the warning
+                    await _answer_quietly(event.callback_query)
+                elif warn:
+                    outbox.enqueue(tg_user.id, FLOOD_WARNING)
+                if warn:
+                    logger.info(f"[FLOOD] Throttling {tg_user.id} ({budget})")
+                return None
+
+        return await handler(event, data)
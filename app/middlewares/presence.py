@@ -0,0 +1,35 @@
+import logging
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.services.identity import resolve
+from app.services.presence import heartbeat
+
+logger = logging.getLogger("trueme.presence.middleware")
+
+
+class PresenceMiddleware(BaseMiddleware):
+    """
+    Outer update middleware: any interaction refreshes the sender's
+    presence lease. Never blocks the handler on a Redis failure.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        tg_user = data.get("event_from_user")
+
+        if tg_user:
+            try:
+                ident = await resolve(tg_user.id)
+                if ident and ident.role:
+                    await heartbeat(ident.user_id, ident.role)
+            except Exception as e:
+                logger.warning(f"[PRESENCE] Heartbeat failed for {tg_user.id}: {e}")
+
+        return await handler(event, data)
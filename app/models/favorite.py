@@ -1,11 +1,14 @@
-from sqlalchemy import Column, Integer, DateTime
+from sqlalchemy import Column, Integer, DateTime, UniqueConstraint
 from sqlalchemy.sql import func
-from sqlalchemy.orm import declarative_base
 
-Base = declarative_base()
+from app.database import Base
+
 
 class Favorite(Base):
     __tablename__ = "favorites"
+    __table_args__ = (
+        UniqueConstraint("male_id", "female_id", name="uq_favorites_pair"),
+    )
 
     id = Column(Integer, primary_key=True)
     male_id = Column(Integer, nullable=False)
@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Numeric, DateTime
+from sqlalchemy.sql import func
+
+from app.database import Base
+
+
+class LedgerEntry(Base):
+    """
+    Append-only: rows are never updated or deleted
+    (enforced by a trigger, see migrations/0002_ledger.sql).
+    """
+    __tablename__ = "ledger"
+
+    id = Column(BigInteger, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+
+    # earnings (female money) | minutes (male paid minutes)
+    asset = Column(String(20), nullable=False, default="earnings")
+
+    # earn | withdraw | stars_credit | session_debit | session_refund
+    type = Column(String(20), nullable=False)
+
+    # signed: credits > 0, debits < 0
+    amount = Column(Numeric, nullable=False)
+
+    ref = Column(String)
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class LedgerBalance(Base):
+    """Running totals per (user, asset), updated with every entry."""
+    __tablename__ = "ledger_balances"
+
+    user_id = Column(Integer, primary_key=True)
+    asset = Column(String(20), primary_key=True)
+
+    credited = Column(Numeric, nullable=False, default=0)
+    debited = Column(Numeric, nullable=False, default=0)
+    balance = Column(Numeric, nullable=False, default=0)
+    entries = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime, server_default=func.now())
@@ -1,8 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime
 from sqlalchemy.sql import func
-from sqlalchemy.orm import declarative_base
 
-Base = declarative_base()
+from app.database import Base
+
 
 class UserReport(Base):
     __tablename__ = "user_reports"
@@ -12,4 +12,3 @@ class UserReport(Base):
     reported_id = Column(Integer, nullable=False)
     reason = Column(String(255))
     created_at = Column(DateTime, server_default=func.now())
-
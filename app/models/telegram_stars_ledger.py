@@ -12,3 +12,5 @@ class TelegramStarsLedger(Base):
     telegram_user_id = Column(BigInteger, nullable=False)
     stars = Column(Integer, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # NULL while a metered counter credit is still outstanding
+    credited_at = Column(DateTime(timezone=True))
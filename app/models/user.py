@@ -14,4 +14,8 @@ class User(Base):
     role = Column(String(10), nullable=True)   # male / female
     is_verified = Column(Boolean, default=False)
 
+    # Matchmaking bucket (services/buckets); from Telegram on /start
+    language = Column(String(8), nullable=True)
+    region = Column(String(16), nullable=True)
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
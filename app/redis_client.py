@@ -20,3 +20,17 @@ redis_client = _redis
 # ---- New async-safe accessor (NEW CODE) ----
 async def get_redis():
     return _redis
+
+
+# ---- Deployment guard ----
+# The matchmaking, session and presence Lua scripts build most of
+# their keys inline (per-user pointers, flag bitmaps, every bucket's
+# pools), so they need all keys on ONE node. Redis Cluster is not
+# supported; scale matchmaking with buckets, not cluster slots.
+async def assert_single_node():
+    info = await _redis.info("cluster")
+    if int(info.get("cluster_enabled", 0)):
+        raise RuntimeError(
+            "Redis Cluster is not supported: matchmaking scripts "
+            "need every key on a single node"
+        )
@@ -1,11 +1,12 @@
 from datetime import datetime
+from decimal import Decimal
 import os
-from sqlalchemy import select
+from sqlalchemy import text
 
 from app.models.session import ChatSession
 from app.models.wallet import Wallet
-from app.models.female_stats import FemaleStats
 from app.services.commission import get_commission_rate
+from app.services import ledger, wallet_meter
 
 
 # =========================================================
@@ -26,6 +27,10 @@ MALE_SESSION_COST_MINUTES = 1 if TEST_PRICING else 49
 # =========================================================
 
 async def can_start_session(db, male_id: int) -> bool:
+    if wallet_meter.metering_enabled():
+        minutes = await wallet_meter.balance(male_id)
+        return minutes is not None and minutes >= MALE_SESSION_COST_MINUTES
+
     wallet = await db.get(Wallet, male_id)
     if not wallet:
         return False
@@ -40,14 +45,21 @@ async def start_paid_session(db, male_id: int, female_id: int) -> ChatSession:
     """
     Deducts minutes and creates a session.
     Assumes caller already owns the transaction.
+
+    Metered mode debits the Redis counter instead of locking the
+    wallet row; if the transaction then fails the caller must
+    call abort_paid_session.
     """
 
-    male_wallet = await db.get(Wallet, male_id, with_for_update=True)
-    if not male_wallet or male_wallet.paid_minutes < MALE_SESSION_COST_MINUTES:
-        raise ValueError("INSUFFICIENT_MINUTES")
+    metered = wallet_meter.metering_enabled()
+
+    if not metered:
+        male_wallet = await db.get(Wallet, male_id, with_for_update=True)
+        if not male_wallet or male_wallet.paid_minutes < MALE_SESSION_COST_MINUTES:
+            raise ValueError("INSUFFICIENT_MINUTES")
 
-    # 🔒 Deduct upfront
-    male_wallet.paid_minutes -= MALE_SESSION_COST_MINUTES
+        # 🔒 Deduct upfront
+        male_wallet.paid_minutes -= MALE_SESSION_COST_MINUTES
 
     # ✅ ONLY session fields that EXIST in model
     session = ChatSession(
@@ -58,35 +70,81 @@ async def start_paid_session(db, male_id: int, female_id: int) -> ChatSession:
     )
 
     db.add(session)
+    await db.flush()
+
+    ref = f"session:{session.id}"
+
+    if metered:
+        try:
+            paid = await wallet_meter.debit(
+                male_id, MALE_SESSION_COST_MINUTES, ledger.SESSION_DEBIT, ref
+            )
+        except wallet_meter.MeterError:
+            paid = False
+        if not paid:
+            raise ValueError("INSUFFICIENT_MINUTES")
+    else:
+        await ledger.post(
+            db, male_id, ledger.MINUTES, ledger.SESSION_DEBIT,
+            -MALE_SESSION_COST_MINUTES, ref=ref,
+        )
+
     return session
 
 
+async def _refund_minutes(db, male_id: int, session_id: int):
+    ref = f"session:{session_id}"
+
+    if wallet_meter.metering_enabled():
+        await wallet_meter.credit(
+            male_id, MALE_SESSION_COST_MINUTES, ledger.SESSION_REFUND, ref
+        )
+        return
+
+    male_wallet = await db.get(Wallet, male_id, with_for_update=True)
+    if male_wallet:
+        male_wallet.paid_minutes += MALE_SESSION_COST_MINUTES
+        await ledger.post(
+            db, male_id, ledger.MINUTES, ledger.SESSION_REFUND,
+            MALE_SESSION_COST_MINUTES, ref=ref,
+        )
+
+
+async def abort_paid_session(session: ChatSession):
+    """
+    Undoes a start_paid_session whose transaction rolled back.
+    Only the metered debit lives outside the transaction.
+    """
+    if wallet_meter.metering_enabled():
+        await _refund_minutes(None, session.male_id, session.id)
+
+
 # =========================================================
-# FINALIZE SESSION (OWNS TRANSACTION)
+# VOID SESSION (COMPENSATION, NO TRANSACTION HERE)
 # =========================================================
 
-async def finalize_session(db, session_id: int):
+async def void_paid_session(db, session_id: int):
     """
-    Finalizes session.
-    Assumes caller already owns transaction.
-    DO NOT start a new transaction here.
+    Reverses start_paid_session for a session that never ran
+    (e.g. its match reservation was lost after commit).
+    Assumes caller already owns the transaction.
     """
 
     session = await db.get(ChatSession, session_id, with_for_update=True)
     if not session or session.completed:
         return
 
-    now = datetime.utcnow()
-    session.ended_at = now
+    session.ended_at = datetime.utcnow()
     session.completed = True
 
-    # ⏱ Actual minutes used
-    duration_seconds = (now - session.started_at).total_seconds()
-    actual_minutes = max(
-        1,
-        min(int(duration_seconds // 60), SESSION_DURATION_MINUTES)
-    )
+    await _refund_minutes(db, session.male_id, session_id)
 
+
+# =========================================================
+# FINALIZE SESSIONS (BATCH, NO TRANSACTION HERE)
+# =========================================================
+
+def _female_earning(actual_minutes: int, has_stats: bool, level) -> float:
     # 💰 Platform revenue model
     platform_gross = MALE_SESSION_COST_MINUTES
     platform_net = platform_gross * (1 - TELEGRAM_FEE_RATE)
@@ -94,27 +152,170 @@ async def finalize_session(db, session_id: int):
     per_minute_value = platform_net / SESSION_DURATION_MINUTES
     female_earning = per_minute_value * actual_minutes
 
-    # 📊 Female stats
-    stats = await db.scalar(
-        select(FemaleStats)
-        .where(FemaleStats.user_id == session.female_id)
-        .with_for_update()
+    # Commission applies whenever a female_stats row exists; a NULL
+    # level falls through to get_commission_rate's default rate
+    if has_stats:
+        female_earning *= get_commission_rate(level)
+
+    return female_earning
+
+
+def _values(rows: list[tuple], types: tuple[str, ...]) -> tuple[str, dict]:
+    """
+    (VALUES ...) clause with typed bind params for UPDATE ... FROM.
+    """
+    params = {}
+    tuples = []
+    for i, row in enumerate(rows):
+        cells = []
+        for j, (value, sql_type) in enumerate(zip(row, types)):
+            params[f"v{i}_{j}"] = value
+            cells.append(f"CAST(:v{i}_{j} AS {sql_type})")
+        tuples.append(f"({', '.join(cells)})")
+    return "VALUES " + ", ".join(tuples), params
+
+
+async def finalize_sessions(db, session_ids: list[int]) -> list[int]:
+    """
+    Finalizes many sessions with a fixed number of statements:
+    one locking read per table, one set-based UPDATE per table.
+    Per-session results match finalizing them one by one in id
+    order (a female's stats advance session by session, so each
+    earning uses the level reached by that session).
+    Assumes caller already owns the transaction.
+    Returns the ids that were finalized (skips completed/missing).
+    """
+
+    if not session_ids:
+        return []
+
+    # 🔒 Lock order matches the single-session path:
+    #    sessions → female_stats → wallets, each by primary key
+    sessions = (await db.execute(
+        text("""
+            SELECT id, female_id, started_at
+            FROM chat_sessions
+            WHERE id = ANY(:ids) AND completed IS NOT TRUE
+            ORDER BY id
+            FOR UPDATE
+        """),
+        {"ids": list(session_ids)},
+    )).all()
+
+    if not sessions:
+        return []
+
+    female_ids = sorted({s.female_id for s in sessions})
+
+    stats = {
+        r.user_id: [r.total_sessions, r.level]
+        for r in (await db.execute(
+            text("""
+                SELECT user_id, total_sessions, level
+                FROM female_stats
+                WHERE user_id = ANY(:ids)
+                ORDER BY user_id
+                FOR UPDATE
+            """),
+            {"ids": female_ids},
+        )).all()
+    }
+
+    wallet_ids = set((await db.scalars(
+        text("""
+            SELECT user_id FROM wallets
+            WHERE user_id = ANY(:ids)
+            ORDER BY user_id
+            FOR UPDATE
+        """),
+        {"ids": female_ids},
+    )).all())
+
+    now = datetime.utcnow()
+    earnings: dict[int, Decimal] = {}
+    entries: list[ledger.Entry] = []
+
+    for session in sessions:
+        # ⏱ Actual minutes used
+        duration_seconds = (now - session.started_at).total_seconds()
+        actual_minutes = max(
+            1,
+            min(int(duration_seconds // 60), SESSION_DURATION_MINUTES)
+        )
+
+        # 📊 Female stats
+        has_stats = session.female_id in stats
+        level = None
+        if has_stats:
+            entry = stats[session.female_id]
+            entry[0] += 1
+            if entry[0] >= 3000:
+                entry[1] = 3
+            elif entry[0] >= 1200:
+                entry[1] = 2
+            level = entry[1]
+
+        earning = Decimal(str(_female_earning(actual_minutes, has_stats, level)))
+        earnings[session.female_id] = (
+            earnings.get(session.female_id, Decimal(0)) + earning
+        )
+        if session.female_id in wallet_ids:
+            entries.append(ledger.Entry(
+                session.female_id, ledger.EARNINGS, ledger.EARN,
+                earning, f"session:{session.id}",
+            ))
+
+    finalized = [s.id for s in sessions]
+
+    await db.execute(
+        text("""
+            UPDATE chat_sessions
+            SET ended_at = :now, completed = TRUE
+            WHERE id = ANY(:ids)
+        """),
+        {"now": now, "ids": finalized},
     )
 
     if stats:
-        stats.total_sessions += 1
-        if stats.total_sessions >= 3000:
-            stats.level = 3
-        elif stats.total_sessions >= 1200:
-            stats.level = 2
+        values, params = _values(
+            [(uid, total, level) for uid, (total, level) in stats.items()],
+            ("integer", "integer", "integer"),
+        )
+        await db.execute(
+            text(f"""
+                UPDATE female_stats AS fs
+                SET total_sessions = v.total_sessions, level = v.level
+                FROM ({values}) AS v(user_id, total_sessions, level)
+                WHERE fs.user_id = v.user_id
+            """),
+            params,
+        )
 
-        female_earning *= get_commission_rate(stats.level)
-
-    # 👛 Female wallet
-    female_wallet = await db.get(
-        Wallet, session.female_id, with_for_update=True
+    # 👛 Female wallets (rows without a wallet are simply not matched)
+    values, params = _values(
+        list(earnings.items()),
+        ("integer", "numeric"),
+    )
+    await db.execute(
+        text(f"""
+            UPDATE wallets AS w
+            SET pending_balance = w.pending_balance + v.amount,
+                lifetime_earnings = w.lifetime_earnings + v.amount
+            FROM ({values}) AS v(user_id, amount)
+            WHERE w.user_id = v.user_id
+        """),
+        params,
     )
 
-    if female_wallet:
-        female_wallet.pending_balance += female_earning
-        female_wallet.lifetime_earnings += female_earning
+    await ledger.record(db, entries)
+
+    return finalized
+
+
+async def finalize_session(db, session_id: int):
+    """
+    Finalizes session.
+    Assumes caller already owns transaction.
+    DO NOT start a new transaction here.
+    """
+    await finalize_sessions(db, [session_id])
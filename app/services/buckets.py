@@ -0,0 +1,128 @@
+import os
+import time
+from typing import Iterable, Optional
+
+from app.redis_client import redis_client
+
+# -------------------------
+# CONFIG
+# -------------------------
+# Matchmaking is sharded into buckets "<language>-<region>"; each
+# bucket has its own male and female queues. Buckets shard the
+# WORK (a claim scans one bucket's queues), not the keyspace: the
+# claim / requeue / sweep scripts read other buckets' pools and
+# per-user keys inline, so all of it must live on a single Redis
+# node (checked at startup, see redis_client.assert_single_node).
+DEFAULT_LANGUAGE = os.getenv("TRUEME_DEFAULT_LANGUAGE", "en").lower()
+DEFAULT_REGION = os.getenv("TRUEME_DEFAULT_REGION", "global").lower()
+
+# A waiting male may take a female from an adjacent bucket once he
+# has waited this long: same language / other region first, then the
+# configured fallback languages (0 disables that step).
+MATCH_REGION_OVERFLOW_SECONDS = int(
+    os.getenv("TRUEME_MATCH_REGION_OVERFLOW_SECONDS", "30")
+)
+MATCH_LANGUAGE_OVERFLOW_SECONDS = int(
+    os.getenv("TRUEME_MATCH_LANGUAGE_OVERFLOW_SECONDS", "120")
+)
+
+# "hi:en,bn:hi" → a Hindi speaker may overflow into English buckets
+LANGUAGE_FALLBACKS = {
+    lang.strip().lower(): fallback.strip().lower()
+    for lang, fallback in (
+        pair.split(":") for pair in
+        os.getenv("TRUEME_MATCH_LANGUAGE_FALLBACKS", "").split(",") if ":" in pair
+    )
+}
+
+# user_id -> bucket, read inline by Lua scripts (requeue, sweep)
+USER_BUCKET_HASH = "matchmaking:user_bucket"
+
+# Every bucket that has ever had a member
+BUCKETS_KEY = "matchmaking:buckets"
+
+# In-process copy of BUCKETS_KEY
+BUCKETS_CACHE_SECONDS = 10
+
+
+def bucket_of(language: Optional[str], region: Optional[str]) -> str:
+    return f"{(language or DEFAULT_LANGUAGE).lower()}-{(region or DEFAULT_REGION).lower()}"
+
+
+DEFAULT_BUCKET = bucket_of(None, None)
+
+
+def parse_language_code(code: Optional[str]) -> tuple[Optional[str], Optional[str]]:
+    """Telegram language_code ("pt-br", "en") → (language, region)."""
+    if not code:
+        return None, None
+    language, _, region = code.lower().replace("_", "-").partition("-")
+    return language or None, region or None
+
+
+def _language(bucket: str) -> str:
+    return bucket.split("-", 1)[0]
+
+
+# -------------------------
+# USER → BUCKET
+# -------------------------
+async def publish(buckets: dict[int, str]):
+    if not buckets:
+        return
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.hset(USER_BUCKET_HASH, mapping={str(k): v for k, v in buckets.items()})
+        pipe.sadd(BUCKETS_KEY, *set(buckets.values()))
+        await pipe.execute()
+    _cache["at"] = 0.0
+
+
+async def user_bucket(user_id: int) -> str:
+    return await redis_client.hget(USER_BUCKET_HASH, str(user_id)) or DEFAULT_BUCKET
+
+
+async def user_buckets(user_ids: Iterable[int]) -> dict[int, str]:
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    raws = await redis_client.hmget(USER_BUCKET_HASH, [str(u) for u in user_ids])
+    return {uid: raw or DEFAULT_BUCKET for uid, raw in zip(user_ids, raws)}
+
+
+# -------------------------
+# REGISTRY / OVERFLOW
+# -------------------------
+_cache = {"at": 0.0, "buckets": [DEFAULT_BUCKET]}
+
+
+async def all_buckets() -> list[str]:
+    now = time.monotonic()
+    if now - _cache["at"] > BUCKETS_CACHE_SECONDS:
+        members = await redis_client.smembers(BUCKETS_KEY)
+        _cache["buckets"] = sorted(set(members) | {DEFAULT_BUCKET})
+        _cache["at"] = now
+    return _cache["buckets"]
+
+
+def overflow_plan(bucket: str, buckets: list[str]) -> list[tuple[str, float]]:
+    """
+    Female buckets a male of `bucket` may draw from, with how long
+    he must have waited for each: own bucket first, at 0.
+    """
+    language = _language(bucket)
+    plan = [(bucket, 0.0)]
+
+    if MATCH_REGION_OVERFLOW_SECONDS:
+        plan += [
+            (other, MATCH_REGION_OVERFLOW_SECONDS) for other in buckets
+            if other != bucket and _language(other) == language
+        ]
+
+    fallback = LANGUAGE_FALLBACKS.get(language)
+    if fallback and MATCH_LANGUAGE_OVERFLOW_SECONDS:
+        plan += [
+            (other, MATCH_LANGUAGE_OVERFLOW_SECONDS) for other in buckets
+            if _language(other) == fallback
+        ]
+
+    return plan
@@ -1,30 +1,325 @@
 from typing import Optional
 from app.redis_client import redis_client
+from app.services.buckets import DEFAULT_BUCKET
+
+# -------------------------
+# SESSION STATE MACHINE
+# -------------------------
+# One hash per session plus pointers to it:
+#   session:{sid}          state, a, b, a_tg, b_tg, started, exp, ending_at
+#   user:{id}:in_session   sid (also the matchmaking eligibility mark)
+#   chat_ctx:{tg}          sid (relay hot path, keyed by telegram_id)
+#   session:active         set of live sids (dashboard count)
+# Pointer writes also flip the user's bit in flags:in_session.
+#
+# reserved (claim token) → active → ending → ended
+# Each transition is one Lua script, so a crash can't leave a
+# half-paired user: either the whole transition applied or none of it.
+# The DB finalize happens while a session is "ending"; an ending
+# claim older than SESSION_ENDING_LEASE_SECONDS may be taken over.
+SESSION_CTX_GRACE_SECONDS = 300
+SESSION_ENDING_LEASE_SECONDS = 60
+
+# Ended records linger briefly so late callers see "ended", not "missing"
+SESSION_ENDED_TTL_SECONDS = 600
+
+ACTIVE_SESSIONS_KEY = "session:active"
+
+
+def session_key(session_id: int) -> str:
+    return f"session:{session_id}"
+
+
+def session_ctx_key(telegram_id: int) -> str:
+    return f"chat_ctx:{telegram_id}"
+
+
+def _user_pointer_key(user_id: int) -> str:
+    # Same key as matchmaking.user_in_session_key
+    return f"user:{user_id}:in_session"
 
-CHAT_KEY = "active_chat"   # Redis hash: user_id -> partner_id
+
+# KEYS: session, ptr a, ptr b, active set, ctx a, ctx b
+# ARGV: sid, a, b, a_tg, b_tg, started, exp, ttl
+# Idempotent; refuses to resurrect an ending/ended session.
+_ACTIVATE_LUA = """
+local state = redis.call('HGET', KEYS[1], 'state')
+if state and state ~= 'active' then
+    return 0
+end
+redis.call('HSET', KEYS[1],
+    'state', 'active', 'a', ARGV[2], 'b', ARGV[3],
+    'a_tg', ARGV[4], 'b_tg', ARGV[5],
+    'started', ARGV[6], 'exp', ARGV[7])
+redis.call('EXPIRE', KEYS[1], ARGV[8])
+redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[8])
+redis.call('SET', KEYS[3], ARGV[1], 'EX', ARGV[8])
+redis.call('SETBIT', 'flags:in_session', ARGV[2], 1)
+redis.call('SETBIT', 'flags:in_session', ARGV[3], 1)
+redis.call('SADD', KEYS[4], ARGV[1])
+if ARGV[4] ~= '' and ARGV[5] ~= '' then
+    redis.call('SET', KEYS[5], ARGV[1], 'EX', ARGV[8])
+    redis.call('SET', KEYS[6], ARGV[1], 'EX', ARGV[8])
+end
+return 1
+"""
+
+# KEYS: user pointer (ignored when a sid is given)
+# ARGV: now, ending lease seconds, sid or ''
+# Returns {sid, a, b, a_tg, b_tg} if this caller now owns the ending.
+_BEGIN_END_LUA = """
+local sid = ARGV[3]
+if sid == '' then
+    sid = redis.call('GET', KEYS[1])
+    if not sid then
+        return nil
+    end
+end
+local key = 'session:' .. sid
+local s = redis.call('HMGET', key, 'state', 'ending_at', 'a', 'b', 'a_tg', 'b_tg')
+if s[1] == 'ending' then
+    if tonumber(ARGV[1]) - tonumber(s[2]) < tonumber(ARGV[2]) then
+        return nil
+    end
+elseif s[1] ~= 'active' then
+    return nil
+end
+redis.call('HSET', key, 'state', 'ending', 'ending_at', ARGV[1])
+return {sid, s[3], s[4], s[5] or '', s[6] or ''}
+"""
+
+# KEYS: session, active set
+# ARGV: sid, now, ended ttl, default bucket
+# Clears pointers that still reference this session and returns
+# still-ONLINE females to their bucket's pool. Returns the requeued ids.
+# NOTE: pointer/flag/pool keys are built inline (single Redis node
+# only, see redis_client.assert_single_node).
+_FINISH_END_LUA = """
+local s = redis.call('HMGET', KEYS[1], 'state', 'a', 'b', 'a_tg', 'b_tg')
+if s[1] ~= 'ending' then
+    return nil
+end
+local requeued = {}
+for i = 2, 3 do
+    local uid = s[i]
+    local ptr = 'user:' .. uid .. ':in_session'
+    if redis.call('GET', ptr) == ARGV[1] then
+        redis.call('DEL', ptr)
+        redis.call('SETBIT', 'flags:in_session', uid, 0)
+    end
+    if redis.call('GETBIT', 'flags:role:female', uid) == 1
+        and redis.call('GETBIT', 'flags:available', uid) == 1 then
+        local bucket = redis.call('HGET', 'matchmaking:user_bucket', uid) or ARGV[4]
+        redis.call('ZADD', 'matchmaking:pool:female:' .. bucket, 'NX', ARGV[2], uid)
+        table.insert(requeued, uid)
+    end
+end
+for i = 4, 5 do
+    if s[i] and s[i] ~= '' then
+        local ctx = 'chat_ctx:' .. s[i]
+        if redis.call('GET', ctx) == ARGV[1] then
+            redis.call('DEL', ctx)
+        end
+    end
+end
+redis.call('HSET', KEYS[1], 'state', 'ended')
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('SREM', KEYS[2], ARGV[1])
+return requeued
+"""
+
+# KEYS: pointer (user or ctx)
+# Returns the session fields if the pointed-to session is active.
+_READ_LUA = """
+local sid = redis.call('GET', KEYS[1])
+if not sid then
+    return nil
+end
+local s = redis.call('HMGET', 'session:' .. sid,
+    'state', 'a', 'b', 'a_tg', 'b_tg', 'started', 'exp')
+if s[1] ~= 'active' then
+    return nil
+end
+return {sid, s[2], s[3], s[4], s[5], s[6], s[7]}
+"""
+
+# KEYS: user pointer
+# ARGV: user id
+# Drops a pointer left behind by a crash: a confirmed claim that
+# never became a session ("1"), or a session that is gone or ended.
+# Returns 0 if the user is still busy (live session or a
+# reservation token, which is left to its own TTL), else 1.
+_CLEAR_STALE_LUA = """
+local v = redis.call('GET', KEYS[1])
+if not v then
+    return 1
+end
+if v ~= '1' then
+    if not tonumber(v) then
+        return 0
+    end
+    local state = redis.call('HGET', 'session:' .. v, 'state')
+    if state == 'active' or state == 'ending' then
+        return 0
+    end
+end
+redis.call('DEL', KEYS[1])
+redis.call('SETBIT', 'flags:in_session', ARGV[1], 0)
+return 1
+"""
+
+_activate = redis_client.register_script(_ACTIVATE_LUA)
+_begin_end = redis_client.register_script(_BEGIN_END_LUA)
+_finish_end = redis_client.register_script(_FINISH_END_LUA)
+_read = redis_client.register_script(_READ_LUA)
+_clear_stale = redis_client.register_script(_CLEAR_STALE_LUA)
+
+
+def _opt_int(raw) -> Optional[int]:
+    return int(raw) if raw else None
 
 
 # -------------------------
-# LOW-LEVEL PRIMITIVES ONLY
+# TRANSITIONS
 # -------------------------
-async def set_active_pair(user_a: int, user_b: int):
-    await redis_client.hset(
-        CHAT_KEY,
-        mapping={
-            str(user_a): str(user_b),
-            str(user_b): str(user_a),
-        }
+async def activate_session(
+    session_id: int,
+    started_at: float,
+    expires_at: float,
+    user_a: int,
+    user_b: int,
+    user_a_tg: Optional[int] = None,
+    user_b_tg: Optional[int] = None,
+) -> bool:
+    """
+    reserved → active in one round trip. Safe to repeat (backfill).
+    Timestamps are unix epoch seconds (UTC).
+    """
+    ttl = max(1, int(expires_at - started_at) + SESSION_CTX_GRACE_SECONDS)
+
+    return bool(await _activate(
+        keys=[
+            session_key(session_id),
+            _user_pointer_key(user_a),
+            _user_pointer_key(user_b),
+            ACTIVE_SESSIONS_KEY,
+            session_ctx_key(user_a_tg or 0),
+            session_ctx_key(user_b_tg or 0),
+        ],
+        args=[
+            session_id, user_a, user_b,
+            user_a_tg or "", user_b_tg or "",
+            started_at, expires_at, ttl,
+        ],
+    ))
+
+
+async def _begin(args: list, pointer: str) -> Optional[dict]:
+    raw = await _begin_end(keys=[pointer], args=args)
+    if not raw:
+        return None
+
+    sid, a, b, a_tg, b_tg = raw
+    return {
+        "sid": int(sid),
+        "a": int(a),
+        "b": int(b),
+        "a_tg": _opt_int(a_tg),
+        "b_tg": _opt_int(b_tg),
+    }
+
+
+async def begin_end(user_id: int, now: float) -> Optional[dict]:
+    """
+    active → ending for the user's current session.
+    None if there is none or another caller is already ending it.
+    """
+    return await _begin(
+        [now, SESSION_ENDING_LEASE_SECONDS, ""],
+        _user_pointer_key(user_id),
     )
 
 
-async def clear_active_pair(user_a: int, user_b: int):
-    await redis_client.hdel(CHAT_KEY, str(user_a), str(user_b))
+async def begin_end_session(session_id: int, now: float) -> Optional[dict]:
+    """Same as begin_end, addressed by session id (expiry engine)."""
+    return await _begin(
+        [now, SESSION_ENDING_LEASE_SECONDS, session_id],
+        session_key(session_id),
+    )
+
 
+async def finish_end(session_id: int, now: float) -> Optional[list[int]]:
+    """
+    ending → ended. Returns the females put back in the pool,
+    or None if the session was not in "ending".
+    """
+    requeued = await _finish_end(
+        keys=[session_key(session_id), ACTIVE_SESSIONS_KEY],
+        args=[session_id, now, SESSION_ENDED_TTL_SECONDS, DEFAULT_BUCKET],
+    )
+    if requeued is None:
+        return None
+    return [int(uid) for uid in requeued]
 
+
+async def clear_stale_pointer(user_id: int) -> bool:
+    """True if the user is now free of any session or reservation."""
+    return bool(await _clear_stale(
+        keys=[_user_pointer_key(user_id)],
+        args=[user_id],
+    ))
+
+
+# -------------------------
+# READS
+# -------------------------
 async def get_partner(user_id: int) -> Optional[int]:
-    partner = await redis_client.hget(CHAT_KEY, str(user_id))
-    return int(partner) if partner else None
+    raw = await _read(keys=[_user_pointer_key(user_id)])
+    if not raw:
+        return None
+
+    a, b = int(raw[1]), int(raw[2])
+    return b if a == user_id else a
 
 
 async def is_in_chat(user_id: int) -> bool:
-    return await redis_client.hexists(CHAT_KEY, str(user_id))
+    return await get_partner(user_id) is not None
+
+
+async def get_session_context(telegram_id: int) -> Optional[dict]:
+    """
+    Relay view of the active session, oriented to this participant.
+    """
+    raw = await _read(keys=[session_ctx_key(telegram_id)])
+    if not raw:
+        return None
+
+    sid, a, b, a_tg, b_tg, started, exp = raw
+    mine_a = int(a_tg) == telegram_id
+
+    return {
+        "sid": int(sid),
+        "started": float(started),
+        "exp": float(exp),
+        "me": int(a) if mine_a else int(b),
+        "peer": int(b) if mine_a else int(a),
+        "peer_tg": int(b_tg) if mine_a else int(a_tg),
+    }
+
+
+async def active_session_count() -> int:
+    return await redis_client.scard(ACTIVE_SESSIONS_KEY)
+
+
+async def live_session_ids() -> set[int]:
+    return {int(sid) for sid in await redis_client.smembers(ACTIVE_SESSIONS_KEY)}
+
+
+async def session_states(session_ids) -> dict[int, Optional[str]]:
+    """sid -> state (None if the record is gone), one pipelined read."""
+    session_ids = list(session_ids)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for sid in session_ids:
+            pipe.hget(session_key(sid), "state")
+        states = await pipe.execute()
+    return dict(zip(session_ids, states))
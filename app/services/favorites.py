@@ -0,0 +1,42 @@
+from typing import Iterable
+
+from app.redis_client import redis_client
+
+FAVORITES_LOADED_KEY = "favorites:loaded"
+
+
+# -------------------------
+# Redis key helpers
+# -------------------------
+# NOTE: the direct claim script reads this set through KEYS.
+def favorites_key(male_id: int) -> str:
+    """set of female ids this male may reconnect with directly"""
+    return f"favorites:{male_id}"
+
+
+# -------------------------
+# WRITES
+# -------------------------
+async def add_favorite(male_id: int, female_id: int):
+    await redis_client.sadd(favorites_key(male_id), female_id)
+
+
+async def load_favorites(pairs: Iterable[tuple[int, int]]):
+    """Bulk (re)load from the favorites table; marks the sets as loaded."""
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for male_id, female_id in pairs:
+            pipe.sadd(favorites_key(male_id), female_id)
+        pipe.set(FAVORITES_LOADED_KEY, "1")
+        await pipe.execute()
+
+
+# -------------------------
+# READS
+# -------------------------
+async def favorites_loaded() -> bool:
+    """False after a Redis flush: the sets must be reloaded."""
+    return bool(await redis_client.exists(FAVORITES_LOADED_KEY))
+
+
+async def is_favorite(male_id: int, female_id: int) -> bool:
+    return bool(await redis_client.sismember(favorites_key(male_id), female_id))
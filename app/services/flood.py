@@ -0,0 +1,117 @@
+import logging
+import os
+import time
+from typing import Optional
+
+from app.redis_client import redis_client
+
+logger = logging.getLogger("trueme.flood")
+
+
+class Budget:
+    COMMAND = "command"
+    CALLBACK = "callback"
+    RELAY = "relay"
+
+
+def _limit(name: str, rate: str, burst: str) -> tuple[float, int]:
+    prefix = f"TRUEME_FLOOD_{name.upper()}"
+    return (
+        float(os.getenv(f"{prefix}_RATE", rate)),
+        int(os.getenv(f"{prefix}_BURST", burst)),
+    )
+
+
+# -------------------------
+# CONFIG
+# -------------------------
+# Per user and budget: sustained events per second, and burst size
+FLOOD_LIMITS = {
+    Budget.COMMAND: _limit(Budget.COMMAND, "0.5", "5"),
+    Budget.CALLBACK: _limit(Budget.CALLBACK, "1", "8"),
+    Budget.RELAY: _limit(Budget.RELAY, "2", "20"),
+}
+
+# At most one "slow down" reply per user per this many seconds
+FLOOD_WARN_SECONDS = int(os.getenv("TRUEME_FLOOD_WARN_SECONDS", "30"))
+
+
+def _tat_key(user_tg: int, budget: str) -> str:
+    return f"flood:{budget}:{user_tg}"
+
+
+def _warn_key(user_tg: int) -> str:
+    return f"flood:warned:{user_tg}"
+
+
+# GCRA: one key per user+budget holding the theoretical arrival
+# time (ms); it expires once the user is fully caught up. An event
+# is allowed while tat - now <= tolerance = interval * (burst - 1),
+# so exactly `burst` back-to-back events pass.
+# KEYS: tat key, warn key
+# ARGV: now ms, emission interval ms, burst tolerance ms, warn ttl ms
+# Returns {0, 0} if allowed, else {retry after ms, 1 if this
+# caller should send the warning}.
+_GCRA_LUA = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local over = tat - now - tonumber(ARGV[3])
+if over > 0 then
+    local warn = redis.call('SET', KEYS[2], 1, 'PX', ARGV[4], 'NX') and 1 or 0
+    return {math.ceil(over), warn}
+end
+local new_tat = tat + interval
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now))
+return {0, 0}
+"""
+
+_gcra = redis_client.register_script(_GCRA_LUA)
+
+_counters = {"allowed": 0, "limited": 0, "errors": 0}
+
+
+async def hit(user_tg: int, budget: str) -> Optional[bool]:
+    """
+    Charges one event to the user's budget.
+    None if allowed; otherwise whether this caller should warn
+    the user (True at most once per FLOOD_WARN_SECONDS).
+    Fails open on Redis errors.
+    """
+    rate, burst = FLOOD_LIMITS[budget]
+    interval = 1000.0 / rate
+
+    try:
+        retry_ms, warn = await _gcra(
+            keys=[_tat_key(user_tg, budget), _warn_key(user_tg)],
+            args=[
+                int(time.time() * 1000),
+                interval,
+                interval * (burst - 1),
+                FLOOD_WARN_SECONDS * 1000,
+            ],
+        )
+    except Exception as e:
+        _counters["errors"] += 1
+        logger.warning(f"[FLOOD] Limiter failed for {user_tg}: {e}")
+        return None
+
+    if not retry_ms:
+        _counters["allowed"] += 1
+        return None
+
+    _counters["limited"] += 1
+    return bool(warn)
+
+
+def metrics() -> dict:
+    return {
+        "limits": {
+            budget: {"rate": rate, "burst": burst}
+            for budget, (rate, burst) in FLOOD_LIMITS.items()
+        },
+        **_counters,
+    }
@@ -0,0 +1,222 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Iterable, NamedTuple, Optional
+
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal
+from app.models.user import User
+from app.redis_client import redis_client
+from app.services.buckets import bucket_of, publish as publish_buckets
+from app.services.user_flags import sync_many
+
+logger = logging.getLogger("trueme.identity")
+
+# -------------------------
+# CONFIG
+# -------------------------
+IDENTITY_LRU_SIZE = int(os.getenv("TRUEME_IDENTITY_LRU_SIZE", "50000"))
+
+# Local entries are short-lived so role changes made by another
+# worker are picked up without cross-process invalidation.
+IDENTITY_LRU_TTL_SECONDS = float(os.getenv("TRUEME_IDENTITY_LRU_TTL", "60"))
+
+# Redis hashes: telegram_id -> record, user.id -> record
+TG_HASH = "identity:tg"
+ID_HASH = "identity:id"
+
+
+class Identity(NamedTuple):
+    user_id: int
+    telegram_id: int
+    role: Optional[str]
+    is_verified: bool
+    language: Optional[str] = None
+    region: Optional[str] = None
+
+    @property
+    def bucket(self) -> str:
+        """Matchmaking shard (see services/buckets)."""
+        return bucket_of(self.language, self.region)
+
+
+# -------------------------
+# ENCODING
+# -------------------------
+def _encode(ident: Identity) -> str:
+    return (
+        f"{ident.user_id}|{ident.telegram_id}|"
+        f"{ident.role or ''}|{int(bool(ident.is_verified))}|"
+        f"{ident.language or ''}|{ident.region or ''}"
+    )
+
+
+def _decode(raw: str) -> Identity:
+    # Records written before language/region have four fields
+    user_id, telegram_id, role, verified, *locale = raw.split("|")
+    language, region = (locale + ["", ""])[:2]
+    return Identity(
+        int(user_id), int(telegram_id), role or None, verified == "1",
+        language or None, region or None,
+    )
+
+
+def _from_user(user: User) -> Identity:
+    return Identity(
+        user.id, user.telegram_id, user.role, bool(user.is_verified),
+        user.language, user.region,
+    )
+
+
+# -------------------------
+# IN-PROCESS LRU
+# -------------------------
+class _LRU:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._data[key] = (value, time.monotonic())
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+
+_by_tg = _LRU(IDENTITY_LRU_SIZE, IDENTITY_LRU_TTL_SECONDS)
+_by_id = _LRU(IDENTITY_LRU_SIZE, IDENTITY_LRU_TTL_SECONDS)
+
+
+def _cache_local(ident: Identity):
+    _by_tg.put(ident.telegram_id, ident)
+    _by_id.put(ident.user_id, ident)
+
+
+# -------------------------
+# WRITE / INVALIDATE
+# -------------------------
+async def _publish(idents: list[Identity]):
+    if not idents:
+        return
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.hset(TG_HASH, mapping={str(i.telegram_id): _encode(i) for i in idents})
+        pipe.hset(ID_HASH, mapping={str(i.user_id): _encode(i) for i in idents})
+        await pipe.execute()
+
+    # Role / verified bitmaps and matchmaking buckets follow every
+    # fresh load from the DB
+    await sync_many(idents)
+    await publish_buckets({i.user_id: i.bucket for i in idents})
+
+    for ident in idents:
+        _cache_local(ident)
+
+
+async def remember(user: User) -> Identity:
+    """
+    Publishes a freshly loaded or created user to both cache tiers.
+    """
+    ident = _from_user(user)
+    await _publish([ident])
+    return ident
+
+
+async def invalidate(user_id: int, telegram_id: int):
+    """
+    Call after any write to users.role / users.is_verified.
+    """
+    _by_tg.pop(telegram_id)
+    _by_id.pop(user_id)
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.hdel(TG_HASH, str(telegram_id))
+        pipe.hdel(ID_HASH, str(user_id))
+        await pipe.execute()
+
+    logger.info(f"[IDENTITY] Invalidated user_id={user_id} tg={telegram_id}")
+
+
+# -------------------------
+# BATCH RESOLUTION
+# -------------------------
+async def _resolve_many(keys: Iterable[int], by_telegram: bool) -> dict[int, Identity]:
+    lru, redis_hash = (_by_tg, TG_HASH) if by_telegram else (_by_id, ID_HASH)
+    column = User.telegram_id if by_telegram else User.id
+
+    found: dict[int, Identity] = {}
+    misses = []
+
+    # 1️⃣ in-process
+    for key in dict.fromkeys(k for k in keys if k):
+        ident = lru.get(key)
+        if ident:
+            found[key] = ident
+        else:
+            misses.append(key)
+
+    if not misses:
+        return found
+
+    # 2️⃣ Redis (single HMGET)
+    raws = await redis_client.hmget(redis_hash, [str(k) for k in misses])
+    db_misses = []
+    for key, raw in zip(misses, raws):
+        if raw:
+            ident = _decode(raw)
+            _cache_local(ident)
+            found[key] = ident
+        else:
+            db_misses.append(key)
+
+    if not db_misses:
+        return found
+
+    # 3️⃣ Postgres (single IN query)
+    async with AsyncSessionLocal() as db:
+        users = (
+            await db.scalars(select(User).where(column.in_(db_misses)))
+        ).all()
+
+    idents = [_from_user(u) for u in users]
+    await _publish(idents)
+
+    for ident in idents:
+        found[ident.telegram_id if by_telegram else ident.user_id] = ident
+
+    return found
+
+
+async def resolve_many(telegram_ids: Iterable[int]) -> dict[int, Identity]:
+    """telegram_id -> Identity for every known id."""
+    return await _resolve_many(telegram_ids, by_telegram=True)
+
+
+async def resolve_many_ids(user_ids: Iterable[int]) -> dict[int, Identity]:
+    """user.id -> Identity for every known id."""
+    return await _resolve_many(user_ids, by_telegram=False)
+
+
+async def resolve(telegram_id: int) -> Optional[Identity]:
+    return (await resolve_many([telegram_id])).get(telegram_id)
+
+
+async def resolve_id(user_id: int) -> Optional[Identity]:
+    return (await resolve_many_ids([user_id])).get(user_id)
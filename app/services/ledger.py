@@ -0,0 +1,149 @@
+from decimal import Decimal
+from typing import Iterable, NamedTuple, Optional
+
+from sqlalchemy import text
+
+# Assets
+EARNINGS = "earnings"
+MINUTES = "minutes"
+
+# Entry types
+EARN = "earn"
+WITHDRAW = "withdraw"
+STARS_CREDIT = "stars_credit"
+SESSION_DEBIT = "session_debit"
+SESSION_REFUND = "session_refund"
+
+
+class Entry(NamedTuple):
+    user_id: int
+    asset: str
+    type: str
+    amount: Decimal     # signed
+    ref: Optional[str] = None
+
+
+# =========================================================
+# WRITE (NO TRANSACTION HERE)
+# =========================================================
+
+async def record(db, entries: Iterable[Entry]):
+    """
+    Appends entries and folds them into the balance snapshots,
+    in the caller's transaction, so both commit or neither does.
+    Two statements regardless of batch size.
+    """
+    entries = [e._replace(amount=Decimal(e.amount)) for e in entries]
+    if not entries:
+        return
+
+    await db.execute(
+        text("""
+            INSERT INTO ledger (user_id, asset, type, amount, ref, created_at)
+            SELECT * , NOW() FROM UNNEST(
+                CAST(:users AS integer[]),
+                CAST(:assets AS varchar[]),
+                CAST(:types AS varchar[]),
+                CAST(:amounts AS numeric[]),
+                CAST(:refs AS varchar[])
+            )
+        """),
+        {
+            "users": [e.user_id for e in entries],
+            "assets": [e.asset for e in entries],
+            "types": [e.type for e in entries],
+            "amounts": [e.amount for e in entries],
+            "refs": [e.ref for e in entries],
+        },
+    )
+
+    # Pre-aggregate so each snapshot row is touched once
+    totals: dict[tuple[int, str], list] = {}
+    for e in entries:
+        t = totals.setdefault((e.user_id, e.asset), [Decimal(0), Decimal(0), 0])
+        if e.amount >= 0:
+            t[0] += e.amount
+        else:
+            t[1] -= e.amount
+        t[2] += 1
+
+    keys = sorted(totals)   # stable lock order
+    await db.execute(
+        text("""
+            INSERT INTO ledger_balances AS b
+                (user_id, asset, credited, debited, balance, entries, updated_at)
+            SELECT u, a, c, d, c - d, n, NOW() FROM UNNEST(
+                CAST(:users AS integer[]),
+                CAST(:assets AS varchar[]),
+                CAST(:credited AS numeric[]),
+                CAST(:debited AS numeric[]),
+                CAST(:counts AS integer[])
+            ) AS v(u, a, c, d, n)
+            ON CONFLICT (user_id, asset) DO UPDATE SET
+                credited = b.credited + EXCLUDED.credited,
+                debited = b.debited + EXCLUDED.debited,
+                balance = b.balance + EXCLUDED.balance,
+                entries = b.entries + EXCLUDED.entries,
+                updated_at = NOW()
+        """),
+        {
+            "users": [k[0] for k in keys],
+            "assets": [k[1] for k in keys],
+            "credited": [totals[k][0] for k in keys],
+            "debited": [totals[k][1] for k in keys],
+            "counts": [totals[k][2] for k in keys],
+        },
+    )
+
+
+async def post(db, user_id: int, asset: str, type: str, amount, ref: Optional[str] = None):
+    await record(db, [Entry(user_id, asset, type, Decimal(amount), ref)])
+
+
+# =========================================================
+# READ
+# =========================================================
+
+async def get_balance(db, user_id: int, asset: str = EARNINGS) -> Decimal:
+    """O(1): primary-key read of the snapshot."""
+    balance = await db.scalar(
+        text("""
+            SELECT balance FROM ledger_balances
+            WHERE user_id = :uid AND asset = :asset
+        """),
+        {"uid": user_id, "asset": asset},
+    )
+    return balance if balance is not None else Decimal(0)
+
+
+async def audit_balances(db, user_id: Optional[int] = None) -> list[dict]:
+    """
+    Full-history check: recomputes every balance from the ledger
+    and returns the snapshots that disagree. Audits only.
+    """
+    where = "WHERE user_id = :uid" if user_id else ""
+    rows = await db.execute(
+        text(f"""
+            WITH history AS (
+                SELECT user_id, asset, SUM(amount) AS balance, COUNT(*) AS entries
+                FROM ledger
+                {where}
+                GROUP BY user_id, asset
+            )
+            SELECT
+                COALESCE(h.user_id, b.user_id) AS user_id,
+                COALESCE(h.asset, b.asset) AS asset,
+                h.balance AS ledger_balance,
+                b.balance AS snapshot_balance,
+                h.entries AS ledger_entries,
+                b.entries AS snapshot_entries
+            FROM history h
+            FULL JOIN (
+                SELECT * FROM ledger_balances {where}
+            ) b ON b.user_id = h.user_id AND b.asset = h.asset
+            WHERE h.balance IS DISTINCT FROM b.balance
+               OR h.entries IS DISTINCT FROM b.entries
+        """),
+        {"uid": user_id} if user_id else {},
+    )
+    return [dict(r) for r in rows.mappings().all()]
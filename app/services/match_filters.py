@@ -0,0 +1,70 @@
+import os
+from typing import Iterable
+
+from app.redis_client import redis_client
+
+# -------------------------
+# CONFIG
+# -------------------------
+# A pair is not matched again within this long of its last match
+MATCH_COOLDOWN_SECONDS = int(os.getenv("TRUEME_MATCH_COOLDOWN_SECONDS", "3600"))
+
+# Recent partners kept per user (newest win)
+RECENT_PARTNERS_MAX = 20
+
+# The cooldown (never a block) is relaxed for a male who has waited
+# this long, or whenever the female pool is this small or smaller
+MATCH_RELAX_AFTER_SECONDS = int(os.getenv("TRUEME_MATCH_RELAX_AFTER_SECONDS", "60"))
+MATCH_THIN_POOL_SIZE = int(os.getenv("TRUEME_MATCH_THIN_POOL_SIZE", "5"))
+
+# Waiting males tried per claim when the head has no eligible female
+MALE_SCAN_LIMIT = 4
+
+BLOCKS_LOADED_KEY = "match:blocked:loaded"
+RELAXED_COUNTER_KEY = "matchmaking:relaxed"
+
+
+# -------------------------
+# Redis key helpers
+# -------------------------
+# NOTE: the claim script builds both names inline.
+def recent_key(user_id: int) -> str:
+    """zset partner_id -> matched at; written by the claim script"""
+    return f"match:recent:{user_id}"
+
+
+def blocked_key(user_id: int) -> str:
+    """set of user ids never to be paired with this user (symmetric)"""
+    return f"match:blocked:{user_id}"
+
+
+# -------------------------
+# BLOCKS
+# -------------------------
+async def block_pair(user_a: int, user_b: int):
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.sadd(blocked_key(user_a), user_b)
+        pipe.sadd(blocked_key(user_b), user_a)
+        await pipe.execute()
+
+
+async def load_blocks(pairs: Iterable[tuple[int, int]]):
+    """Bulk (re)load from the reports table; marks the sets as loaded."""
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for user_a, user_b in pairs:
+            pipe.sadd(blocked_key(user_a), user_b)
+            pipe.sadd(blocked_key(user_b), user_a)
+        pipe.set(BLOCKS_LOADED_KEY, "1")
+        await pipe.execute()
+
+
+async def blocks_loaded() -> bool:
+    """False after a Redis flush: the block sets must be reloaded."""
+    return bool(await redis_client.exists(BLOCKS_LOADED_KEY))
+
+
+# -------------------------
+# HISTORY
+# -------------------------
+async def relaxed_matches() -> int:
+    return int(await redis_client.get(RELAXED_COUNTER_KEY) or 0)
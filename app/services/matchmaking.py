@@ -1,92 +1,579 @@
+import asyncio
 import logging
-from typing import Optional, Tuple
+import time
+import uuid
+from typing import NamedTuple, Optional
 
 from app.redis_client import redis_client
+from app.services.user_flags import get_role, is_available
+from app.services.favorites import favorites_key
+from app.services.buckets import (
+    DEFAULT_BUCKET,
+    all_buckets,
+    overflow_plan,
+    user_bucket,
+)
+from app.services.match_filters import (
+    MATCH_COOLDOWN_SECONDS,
+    RECENT_PARTNERS_MAX,
+    MATCH_RELAX_AFTER_SECONDS,
+    MATCH_THIN_POOL_SIZE,
+    MALE_SCAN_LIMIT,
+    RELAXED_COUNTER_KEY,
+)
 
 logger = logging.getLogger("trueme.matchmaking")
 
+ROLES = ("male", "female")
+
+# Queue-head window a single claim reads per side (stale members
+# in it are discarded, the rest are candidates)
+CLAIM_SCAN_LIMIT = 16
+
+# A claim is a reservation until billing commits; if the worker
+# dies in between, the in_session marks simply expire.
+CLAIM_RESERVATION_MS = 15000
+
+# Recent female wait times (seconds) kept for fairness percentiles
+WAIT_SAMPLE_SIZE = 1000
+
 
 # -------------------------
 # Redis key helpers
 # -------------------------
-def pool_key() -> str:
-    return "matchmaking:pool"
+def pool_key(role: str, bucket: str = DEFAULT_BUCKET) -> str:
+    """
+    One pair of queues per bucket (see services/buckets):
+    male:   zset scored by when he started searching (FIFO wait queue)
+    female: zset scored by idle-since (went online / last session end),
+            so the head is the longest-idle female
+    """
+    return f"matchmaking:pool:{role}:{bucket}"
 
 
-def user_role_key(user_id: int) -> str:
-    return f"user:{user_id}:role"
+def female_wait_samples_key() -> str:
+    return "matchmaking:female_wait_samples"
 
 
 def user_in_session_key(user_id: int) -> str:
+    # Role and availability live in bitmaps (see services/user_flags)
     return f"user:{user_id}:in_session"
 
 
+# -------------------------
+# Atomic claim (server-side)
+# -------------------------
+# Claim protocol:
+#   1. reserve: pick an eligible male + female, set both in_session
+#      marks to a unique token with a short TTL
+#   2. extend:  push the TTL out right before the billing commit
+#   3. confirm: swap the token for a permanent "1" after commit
+# A failed step releases the reservation (token-checked) instead.
+# Any in_session value (token or "1") makes a member ineligible.
+#
+# Both queues are read from their head: the longest-waiting males
+# of one bucket (up to MALE_SCAN_LIMIT) against windows of the
+# longest-idle females of the buckets he may draw from — his own,
+# then adjacent ones once he has waited their overflow time.
+# Busy or suspended members found on the way are dropped.
+# For each male, in queue order, the first female that is
+#   - not blocked with him (match:blocked:{id}, from reports), and
+#   - not his partner within the cooldown (match:recent:{id})
+# is taken. If none is, the cooldown (never a block) is relaxed
+# once he has waited long enough or his own female pool is thin.
+# The pair is written to both recent-partner sets and the female's
+# wait is recorded — all inside the one script, no extra round trips.
+# NOTE: in_session keys are built inline (see user_in_session_key),
+# as are the flags bitmaps and the match_filters keys. Like every
+# script here this needs a single Redis node, not Redis Cluster.
+#
+# KEYS: male pool, wait samples, relaxed counter,
+#       female pools (own bucket first)
+# ARGV: scan limit, token, ttl_ms, now, sample size,
+#       cooldown seconds, relax after seconds, thin pool size,
+#       male scan limit, recent partners max,
+#       min wait per female pool (aligned with KEYS[4..])
+_CLAIM_PAIR_LUA = """
+local now = tonumber(ARGV[4])
+local cutoff = now - tonumber(ARGV[6])
+local scan = tonumber(ARGV[1])
+
+local function head(pool, keep)
+    local members = {}
+    local window = redis.call('ZRANGE', pool, 0, scan - 1, 'WITHSCORES')
+    for i = 1, #window, 2 do
+        local uid = window[i]
+        if redis.call('EXISTS', 'user:' .. uid .. ':in_session') == 1
+            or redis.call('GETBIT', 'flags:suspended', uid) == 1 then
+            redis.call('ZREM', pool, uid)
+        elseif #members < keep then
+            table.insert(members, {uid, tonumber(window[i + 1]), window[i + 1]})
+        end
+    end
+    return members
+end
+
+local males = head(KEYS[1], tonumber(ARGV[9]))
+if #males == 0 then
+    return nil
+end
+
+local pools = {}
+for i = 4, #KEYS do
+    table.insert(pools, {key = KEYS[i], after = tonumber(ARGV[i + 7])})
+end
+
+local function females(pool)
+    if not pool.window then
+        pool.window = head(pool.key, scan)
+    end
+    return pool.window
+end
+
+local thin = redis.call('ZCARD', KEYS[4]) <= tonumber(ARGV[8])
+
+local male, female, source, relaxed
+for _, m in ipairs(males) do
+    local waited = now - m[2]
+    local relax = thin or waited >= tonumber(ARGV[7])
+    local fallback, fallback_pool
+    for _, pool in ipairs(pools) do
+        if waited >= pool.after then
+            for _, f in ipairs(females(pool)) do
+                if redis.call('SISMEMBER', 'match:blocked:' .. m[1], f[1]) == 0 then
+                    local last = redis.call('ZSCORE', 'match:recent:' .. m[1], f[1])
+                    if not last or tonumber(last) < cutoff then
+                        male, female, source = m, f, pool
+                        break
+                    end
+                    if relax and not fallback then
+                        fallback, fallback_pool = f, pool
+                    end
+                end
+            end
+        end
+        if female then
+            break
+        end
+    end
+    if not female and fallback then
+        male, female, source, relaxed = m, fallback, fallback_pool, 1
+    end
+    if female then
+        break
+    end
+end
+
+if not female then
+    return nil
+end
+
+redis.call('ZREM', KEYS[1], male[1])
+redis.call('ZREM', source.key, female[1])
+
+redis.call('SET', 'user:' .. male[1] .. ':in_session', ARGV[2], 'PX', ARGV[3])
+redis.call('SET', 'user:' .. female[1] .. ':in_session', ARGV[2], 'PX', ARGV[3])
+redis.call('SETBIT', 'flags:in_session', male[1], 1)
+redis.call('SETBIT', 'flags:in_session', female[1], 1)
+
+for _, pair in ipairs({{male[1], female[1]}, {female[1], male[1]}}) do
+    local recent = 'match:recent:' .. pair[1]
+    redis.call('ZADD', recent, now, pair[2])
+    redis.call('ZREMRANGEBYRANK', recent, 0, -tonumber(ARGV[10]) - 1)
+    redis.call('EXPIRE', recent, ARGV[6])
+end
+
+if relaxed then
+    redis.call('INCR', KEYS[3])
+end
+
+redis.call('LPUSH', KEYS[2], now - female[2])
+redis.call('LTRIM', KEYS[2], 0, tonumber(ARGV[5]) - 1)
+
+return {male[1], female[1], female[3], male[3], relaxed or 0, source.key}
+"""
+
+# Direct reconnect: one male claims one favorite female, bypassing
+# the pool scan. Same reservation protocol as above. She must be in
+# his favorites set, not blocked, and idle — ONLINE, unreserved and
+# waiting in her bucket's pool. The partner cooldown does not apply
+# (asking for her again is the point). If he was waiting in his own
+# pool he leaves it. Returns {'OK', female idle-since, male since,
+# female pool, male pool or ''} or {reason}.
+# NOTE: pool keys (via matchmaking:user_bucket), flags bitmaps and
+# match_filters keys are built inline.
+#
+# KEYS: favorites set, male in_session, female in_session, wait samples
+# ARGV: male id, female id, token, ttl_ms, now, default bucket,
+#       sample size, recent partners max, cooldown seconds
+_CLAIM_DIRECT_LUA = """
+local male, female = ARGV[1], ARGV[2]
+if redis.call('SISMEMBER', KEYS[1], female) == 0 then
+    return {'NOT_FAVORITE'}
+end
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return {'ALREADY_IN_SESSION'}
+end
+if redis.call('GETBIT', 'flags:suspended', female) == 1
+    or redis.call('SISMEMBER', 'match:blocked:' .. male, female) == 1 then
+    return {'PARTNER_UNAVAILABLE'}
+end
+if redis.call('GETBIT', 'flags:available', female) == 0 then
+    return {'PARTNER_OFFLINE'}
+end
+
+local function pool(role, uid)
+    local bucket = redis.call('HGET', 'matchmaking:user_bucket', uid) or ARGV[6]
+    return 'matchmaking:pool:' .. role .. ':' .. bucket
+end
+
+local female_pool = pool('female', female)
+local since = redis.call('ZSCORE', female_pool, female)
+if redis.call('EXISTS', KEYS[3]) == 1 or not since then
+    return {'PARTNER_BUSY'}
+end
+
+local male_pool = pool('male', male)
+local male_since = redis.call('ZSCORE', male_pool, male)
+if male_since then
+    redis.call('ZREM', male_pool, male)
+else
+    male_since, male_pool = ARGV[5], ''
+end
+redis.call('ZREM', female_pool, female)
+
+redis.call('SET', KEYS[2], ARGV[3], 'PX', ARGV[4])
+redis.call('SET', KEYS[3], ARGV[3], 'PX', ARGV[4])
+redis.call('SETBIT', 'flags:in_session', male, 1)
+redis.call('SETBIT', 'flags:in_session', female, 1)
+
+for _, pair in ipairs({{male, female}, {female, male}}) do
+    local recent = 'match:recent:' .. pair[1]
+    redis.call('ZADD', recent, ARGV[5], pair[2])
+    redis.call('ZREMRANGEBYRANK', recent, 0, -tonumber(ARGV[8]) - 1)
+    redis.call('EXPIRE', recent, ARGV[9])
+end
+
+redis.call('LPUSH', KEYS[4], tonumber(ARGV[5]) - tonumber(since))
+redis.call('LTRIM', KEYS[4], 0, tonumber(ARGV[7]) - 1)
+
+return {'OK', since, male_since, female_pool, male_pool}
+"""
+
+# KEYS: both in_session keys; ARGV: token, ttl_ms (0 = confirm)
+_EXTEND_CLAIM_LUA = """
+for _, key in ipairs(KEYS) do
+    if redis.call('GET', key) ~= ARGV[1] then
+        return 0
+    end
+end
+for _, key in ipairs(KEYS) do
+    if tonumber(ARGV[2]) > 0 then
+        redis.call('PEXPIRE', key, ARGV[2])
+    else
+        redis.call('SET', key, '1')
+    end
+end
+return 1
+"""
+
+# KEYS: male in_session, female in_session, male pool, female pool
+# ARGV: token, male id, female id, requeue male (0/1),
+#       female idle-since, male waiting-since
+# Both go back with their original score (keep their place), and
+# the pair never chatted, so it leaves the recent-partner sets.
+_RELEASE_CLAIM_LUA = """
+for i = 1, 2 do
+    if redis.call('GET', KEYS[i]) == ARGV[1] then
+        redis.call('DEL', KEYS[i])
+        redis.call('SETBIT', 'flags:in_session', ARGV[i + 1], 0)
+    end
+end
+redis.call('ZREM', 'match:recent:' .. ARGV[2], ARGV[3])
+redis.call('ZREM', 'match:recent:' .. ARGV[3], ARGV[2])
+if ARGV[4] == '1' then
+    redis.call('ZADD', KEYS[3], ARGV[6], ARGV[2])
+end
+redis.call('ZADD', KEYS[4], ARGV[5], ARGV[3])
+return 1
+"""
+
+# KEYS: male pools (one per bucket); ARGV: cutoff
+_EXPIRE_WAITING_LUA = """
+local stale = {}
+for _, pool in ipairs(KEYS) do
+    local expired = redis.call('ZRANGEBYSCORE', pool, '-inf', ARGV[1])
+    if #expired > 0 then
+        redis.call('ZREMRANGEBYSCORE', pool, '-inf', ARGV[1])
+        for _, uid in ipairs(expired) do
+            table.insert(stale, uid)
+        end
+    end
+end
+return stale
+"""
+
+
+class Claim(NamedTuple):
+    male_id: int
+    female_id: int
+    token: str
+    female_since: float
+    male_since: float
+    # Queues they were taken from (female's may be an adjacent bucket;
+    # male's is empty for a direct claim made while not searching)
+    male_pool: str
+    female_pool: str
+    # True if the partner cooldown had to be waived
+    relaxed: bool = False
+
+
+_claim_pair = redis_client.register_script(_CLAIM_PAIR_LUA)
+_extend_claim = redis_client.register_script(_EXTEND_CLAIM_LUA)
+_claim_direct = redis_client.register_script(_CLAIM_DIRECT_LUA)
+_release_claim = redis_client.register_script(_RELEASE_CLAIM_LUA)
+_expire_waiting = redis_client.register_script(_EXPIRE_WAITING_LUA)
+
+# Set whenever a female becomes matchable; the dispatcher wakes on it
+_dispatch_event = asyncio.Event()
+
+
 # -------------------------
 # Pool operations
 # -------------------------
-async def add_user_to_pool(user_id: int):
-    await redis_client.sadd(pool_key(), user_id)
-    logger.info(f"[MATCHMAKING] User {user_id} added to pool")
+async def add_user_to_pool(
+    user_id: int,
+    role: str,
+    since: Optional[float] = None,
+    bucket: Optional[str] = None,
+):
+    """
+    Queued by since (default: now) in the user's bucket (looked up
+    if not given). Re-adding someone already waiting keeps their
+    original place (ZADD NX). A new female wakes the dispatcher.
+    """
+    if role not in ROLES:
+        raise ValueError(f"Unknown pool role: {role}")
+
+    bucket = bucket or await user_bucket(user_id)
+    await redis_client.zadd(
+        pool_key(role, bucket), {str(user_id): since or time.time()}, nx=True
+    )
+    logger.info(f"[MATCHMAKING] User {user_id} added to {role} pool ({bucket})")
+
+    if role == "female":
+        request_dispatch()
 
 
 async def remove_user_from_pool(user_id: int):
-    await redis_client.srem(pool_key(), user_id)
+    bucket = await user_bucket(user_id)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for role in ROLES:
+            pipe.zrem(pool_key(role, bucket), user_id)
+        await pipe.execute()
     logger.info(f"[MATCHMAKING] User {user_id} removed from pool")
 
 
+async def cancel_search(user_id: int) -> bool:
+    """Drops a waiting male from the queue (/stop)."""
+    bucket = await user_bucket(user_id)
+    removed = await redis_client.zrem(pool_key("male", bucket), user_id)
+    if removed:
+        logger.info(f"[MATCHMAKING] Search cancelled for {user_id}")
+    return bool(removed)
+
+
+async def expire_waiting_males(timeout_seconds: float) -> list[int]:
+    """Removes and returns males who have waited longer than the timeout."""
+    stale = await _expire_waiting(
+        keys=[pool_key("male", bucket) for bucket in await all_buckets()],
+        args=[time.time() - timeout_seconds],
+    )
+    return [int(uid) for uid in stale]
+
+
 async def get_pool_members():
-    members = await redis_client.smembers(pool_key())
-    return {int(m) for m in members}
+    buckets = await all_buckets()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for bucket in buckets:
+            for role in ROLES:
+                pipe.zrange(pool_key(role, bucket), 0, -1)
+        pools = await pipe.execute()
+    return {int(uid) for members in pools for uid in members}
+
+
+async def pool_sizes() -> dict:
+    """Queue lengths per role, in total and per bucket."""
+    buckets = await all_buckets()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for bucket in buckets:
+            for role in ROLES:
+                pipe.zcard(pool_key(role, bucket))
+        counts = iter(await pipe.execute())
+
+    per_bucket = {
+        bucket: {role: next(counts) for role in ROLES} for bucket in buckets
+    }
+    return {
+        **{role: sum(b[role] for b in per_bucket.values()) for role in ROLES},
+        "buckets": {b: c for b, c in per_bucket.items() if any(c.values())},
+    }
+
+
+async def waiting_buckets() -> list[str]:
+    """Buckets with at least one male in the queue."""
+    buckets = await all_buckets()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for bucket in buckets:
+            pipe.zcard(pool_key("male", bucket))
+        counts = await pipe.execute()
+    return [bucket for bucket, n in zip(buckets, counts) if n]
+
+
+# -------------------------
+# Dispatch signal (in-process)
+# -------------------------
+def request_dispatch():
+    _dispatch_event.set()
+
+
+async def wait_for_dispatch(timeout: float) -> bool:
+    """True if woken by a signal, False on timeout."""
+    try:
+        await asyncio.wait_for(_dispatch_event.wait(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        _dispatch_event.clear()
+
+
+async def return_to_pool(user_id: int) -> bool:
+    """
+    Re-queues a female who is still ONLINE after her session ended.
+    Claims pop members out of the pool, so this is how she
+    becomes matchable again (idle-since = now, back of the queue).
+    """
+    if await get_role(user_id) != "female":
+        return False
+
+    if not await is_available(user_id):
+        return False
+
+    await add_user_to_pool(user_id, "female")
+    return True
 
 
 # -------------------------
 # Session checks (READ ONLY)
 # -------------------------
 async def is_user_in_session(user_id: int) -> bool:
-    return await redis_client.get(user_in_session_key(user_id)) == "1"
+    """True while in a session or reserved by an in-flight claim."""
+    return await redis_client.exists(user_in_session_key(user_id)) == 1
 
 
 # -------------------------
 # Core matcher (internal)
 # -------------------------
-async def _pick_match() -> Optional[Tuple[int, int]]:
-    pool = await get_pool_members()
-
-    males = []
-    females = []
-
-    for uid in pool:
-        if await is_user_in_session(uid):
-            continue
-
-        role = await redis_client.get(user_role_key(uid))
-        if role == "male":
-            males.append(uid)
-        elif role == "female":
-            females.append(uid)
+async def _pick_match(bucket: str) -> Optional[Claim]:
+    token = uuid.uuid4().hex
+    plan = overflow_plan(bucket, await all_buckets())
+    pair = await _claim_pair(
+        keys=[
+            pool_key("male", bucket),
+            female_wait_samples_key(),
+            RELAXED_COUNTER_KEY,
+            *(pool_key("female", source) for source, _ in plan),
+        ],
+        args=[
+            CLAIM_SCAN_LIMIT,
+            token,
+            CLAIM_RESERVATION_MS,
+            time.time(),
+            WAIT_SAMPLE_SIZE,
+            MATCH_COOLDOWN_SECONDS,
+            MATCH_RELAX_AFTER_SECONDS,
+            MATCH_THIN_POOL_SIZE,
+            MALE_SCAN_LIMIT,
+            RECENT_PARTNERS_MAX,
+            *(after for _, after in plan),
+        ],
+    )
 
-    if not males or not females:
+    if not pair:
         return None
 
-    male = males[0]
-    female = females[0]
+    male, female = int(pair[0]), int(pair[1])
+    since, male_since = float(pair[2]), float(pair[3])
+    relaxed = bool(int(pair[4]))
+    female_pool = pair[5]
 
     logger.info(
-        f"[MATCHMAKING] MATCH FOUND → male={male}, female={female}"
+        f"[MATCHMAKING] MATCH RESERVED → male={male}, female={female} "
+        f"(idle {time.time() - since:.0f}s, {female_pool}"
+        f"{', cooldown relaxed' if relaxed else ''})"
     )
 
-    return male, female
+    return Claim(
+        male, female, token, since, male_since,
+        pool_key("male", bucket), female_pool, relaxed,
+    )
 
 
 # -------------------------
 # PUBLIC API (used by flow.py)
 # -------------------------
-async def match_users() -> Optional[Tuple[int, int]]:
+async def match_users(bucket: str = DEFAULT_BUCKET) -> Optional[Claim]:
     """
     Compatibility wrapper.
     DO NOT add session logic here.
+    Returns a reserved Claim for a male of this bucket; the caller
+    must confirm or release it.
     """
-    return await _pick_match()
+    return await _pick_match(bucket)
+
+
+async def claim_direct(male_id: int, female_id: int) -> tuple[Optional[Claim], str]:
+    """
+    Reserves one favorite female for this male in one round trip.
+    Returns (claim, "OK") or (None, reason); the caller must
+    confirm or release a claim exactly as for match_users.
+    """
+    token = uuid.uuid4().hex
+    raw = await _claim_direct(
+        keys=[
+            favorites_key(male_id),
+            user_in_session_key(male_id),
+            user_in_session_key(female_id),
+            female_wait_samples_key(),
+        ],
+        args=[
+            male_id,
+            female_id,
+            token,
+            CLAIM_RESERVATION_MS,
+            time.time(),
+            DEFAULT_BUCKET,
+            WAIT_SAMPLE_SIZE,
+            RECENT_PARTNERS_MAX,
+            MATCH_COOLDOWN_SECONDS,
+        ],
+    )
+
+    if raw[0] != "OK":
+        return None, raw[0]
+
+    _, since, male_since, female_pool, male_pool = raw
+
+    logger.info(
+        f"[MATCHMAKING] DIRECT RESERVED → male={male_id}, female={female_id} "
+        f"(idle {time.time() - float(since):.0f}s)"
+    )
+
+    return Claim(
+        male_id, female_id, token, float(since), float(male_since),
+        male_pool, female_pool,
+    ), "OK"
 
 
 # -------------------------
@@ -104,3 +591,88 @@ async def release_users(user_a: int, user_b: int):
     logger.info(
         f"[MATCHMAKING] Released users {user_a} and {user_b}"
     )
+
+
+async def extend_claim(claim: Claim, ttl_ms: int = CLAIM_RESERVATION_MS) -> bool:
+    """False if the reservation already lapsed (or was taken over)."""
+    return bool(await _extend_claim(
+        keys=[user_in_session_key(claim.male_id), user_in_session_key(claim.female_id)],
+        args=[claim.token, ttl_ms],
+    ))
+
+
+async def confirm_claim(claim: Claim) -> bool:
+    """Turns the reservation into permanent in_session marks."""
+    return await extend_claim(claim, ttl_ms=0)
+
+
+async def release_claim(claim: Claim, requeue_male: bool = True):
+    """
+    Undo a claim whose billing step failed: drop the reservation
+    (only if still ours) and put both back in their pools. A male
+    who was not searching (direct claim) is not queued.
+    """
+    await _release_claim(
+        keys=[
+            user_in_session_key(claim.male_id),
+            user_in_session_key(claim.female_id),
+            claim.male_pool or pool_key("male"),
+            claim.female_pool,
+        ],
+        args=[
+            claim.token,
+            claim.male_id,
+            claim.female_id,
+            int(requeue_male and bool(claim.male_pool)),
+            claim.female_since,
+            claim.male_since,
+        ],
+    )
+
+    logger.info(
+        f"[MATCHMAKING] Claim released male={claim.male_id} female={claim.female_id}"
+    )
+
+
+# -------------------------
+# Fairness metrics (READ ONLY)
+# -------------------------
+async def female_wait_stats() -> dict:
+    """
+    Percentiles of how long matched females had been idle,
+    plus the current queue length and its oldest wait (all buckets),
+    and how many matches so far needed the partner cooldown waived.
+    """
+    buckets = await all_buckets()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.lrange(female_wait_samples_key(), 0, -1)
+        pipe.get(RELAXED_COUNTER_KEY)
+        for bucket in buckets:
+            pipe.zcard(pool_key("female", bucket))
+            pipe.zrange(pool_key("female", bucket), 0, 0, withscores=True)
+        samples, relaxed, *per_bucket = await pipe.execute()
+
+    waiting = sum(per_bucket[::2])
+    oldest = min((head[0][1] for head in per_bucket[1::2] if head), default=None)
+
+    waits = sorted(float(w) for w in samples)
+
+    def pct(p: float) -> Optional[float]:
+        if not waits:
+            return None
+        return round(waits[min(len(waits) - 1, int(p * len(waits)))], 1)
+
+    return {
+        "samples": len(waits),
+        "wait_seconds": {
+            "p50": pct(0.50),
+            "p90": pct(0.90),
+            "p99": pct(0.99),
+            "max": round(waits[-1], 1) if waits else None,
+        },
+        "waiting": waiting,
+        "oldest_wait_seconds": (
+            round(time.time() - oldest, 1) if oldest is not None else None
+        ),
+        "cooldown_relaxed": int(relaxed or 0),
+    }
@@ -0,0 +1,322 @@
+import asyncio
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from typing import Optional
+
+from aiogram.exceptions import (
+    TelegramRetryAfter,
+    TelegramForbiddenError,
+    TelegramBadRequest,
+)
+
+logger = logging.getLogger("trueme.outbox")
+
+# -------------------------
+# CONFIG
+# -------------------------
+OUTBOX_WORKERS = int(os.getenv("TRUEME_OUTBOX_WORKERS", "8"))
+OUTBOX_MAX_SIZE = int(os.getenv("TRUEME_OUTBOX_MAX_SIZE", "10000"))
+OUTBOX_MAX_RETRIES = int(os.getenv("TRUEME_OUTBOX_MAX_RETRIES", "5"))
+
+# Telegram: ~30 msg/s per bot, ~1 msg/s per chat with short bursts
+GLOBAL_RATE = float(os.getenv("TRUEME_OUTBOX_GLOBAL_RATE", "25"))
+GLOBAL_BURST = float(os.getenv("TRUEME_OUTBOX_GLOBAL_BURST", "30"))
+CHAT_RATE = float(os.getenv("TRUEME_OUTBOX_CHAT_RATE", "1"))
+CHAT_BURST = float(os.getenv("TRUEME_OUTBOX_CHAT_BURST", "5"))
+
+# Idle per-chat buckets are dropped after this long
+CHAT_BUCKET_TTL_SECONDS = 300
+
+# Longer waits are parked off-worker instead of slept inline
+MAX_INLINE_WAIT_SECONDS = 1.0
+
+LATENCY_WINDOW = 1000
+
+
+class Lane:
+    """Lower value is sent first."""
+    RELAY = 0
+    SYSTEM = 1
+    BULK = 2
+
+    NAMES = {RELAY: "relay", SYSTEM: "system", BULK: "bulk"}
+
+
+# -------------------------
+# TOKEN BUCKET
+# -------------------------
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(
+            self.capacity,
+            self.tokens + (now - self.updated) * self.rate,
+        )
+        self.updated = now
+
+    def reserve(self) -> float:
+        """
+        Takes one token and returns how long to wait before using it.
+        """
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+
+        wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def refund(self):
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def block(self, seconds: float):
+        """Honors a server-imposed RetryAfter for this bucket."""
+        self.blocked_until = max(
+            self.blocked_until, time.monotonic() + seconds
+        )
+
+
+# -------------------------
+# OUTBOX
+# -------------------------
+class Outbox:
+    def __init__(self):
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: list[asyncio.Task] = []
+        self._bot = None
+        self._seq = itertools.count()
+
+        self._global = TokenBucket(GLOBAL_RATE, GLOBAL_BURST)
+        self._chats: dict[int, TokenBucket] = {}
+        self._chat_locks: dict[int, asyncio.Lock] = {}
+        # chat_id -> [seq of its deferred head, items queued behind it]
+        self._parked: dict[int, list] = {}
+        self._last_gc = time.monotonic()
+
+        self._depth = {lane: 0 for lane in Lane.NAMES}
+        self._latency = deque(maxlen=LATENCY_WINDOW)
+        self._counters = {
+            "sent": 0,
+            "failed": 0,
+            "retried": 0,
+            "dropped": 0,
+        }
+
+    # ---------- lifecycle ----------
+    def start(self, bot):
+        self._bot = bot
+        self._queue = asyncio.PriorityQueue(maxsize=OUTBOX_MAX_SIZE)
+        self._workers = [
+            asyncio.create_task(self._worker(i))
+            for i in range(OUTBOX_WORKERS)
+        ]
+        logger.info(f"[OUTBOX] Started {OUTBOX_WORKERS} workers")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    # ---------- producer ----------
+    def enqueue(
+        self,
+        chat_id: int,
+        text: str,
+        lane: int = Lane.SYSTEM,
+        **kwargs,
+    ) -> bool:
+        """
+        Queues a send_message call and returns immediately.
+        Returns False if the outbox is not running or is full.
+        """
+        if self._queue is None:
+            logger.error(f"[OUTBOX] Not started, dropping message to {chat_id}")
+            self._counters["dropped"] += 1
+            return False
+
+        item = (lane, next(self._seq), time.monotonic(), 0, chat_id, text, kwargs)
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            logger.error(f"[OUTBOX] Queue full, dropping message to {chat_id}")
+            self._counters["dropped"] += 1
+            return False
+
+        self._depth[lane] += 1
+        return True
+
+    # ---------- consumer ----------
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        now = time.monotonic()
+        if now - self._last_gc > CHAT_BUCKET_TTL_SECONDS:
+            self._last_gc = now
+            for cid in [
+                c for c, b in self._chats.items()
+                if now - b.updated > CHAT_BUCKET_TTL_SECONDS
+                and not self._chat_locks[c].locked()
+                and c not in self._parked
+            ]:
+                del self._chats[cid]
+                del self._chat_locks[cid]
+
+        if chat_id not in self._chats:
+            self._chats[chat_id] = TokenBucket(CHAT_RATE, CHAT_BURST)
+            self._chat_locks[chat_id] = asyncio.Lock()
+        return self._chats[chat_id]
+
+    async def _worker(self, index: int):
+        while True:
+            item = await self._queue.get()
+            lane = item[0]
+            self._depth[lane] -= 1
+            try:
+                await self._deliver(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"[OUTBOX] Worker {index} error: {e}")
+                self._advance(item[4], item[1])
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, item):
+        lane, seq, enqueued_at, attempt, chat_id, text, kwargs = item
+
+        bucket = self._chat_bucket(chat_id)
+
+        # Per-chat lock keeps one chat's messages in queue order
+        async with self._chat_locks[chat_id]:
+            if self._park(item):
+                return
+
+            wait = max(bucket.reserve(), self._global.reserve())
+
+            if wait > MAX_INLINE_WAIT_SECONDS:
+                # Don't pin a worker on one throttled chat
+                bucket.refund()
+                self._global.refund()
+                self._defer(item, wait)
+                return
+
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            try:
+                await self._bot.send_message(chat_id, text, **kwargs)
+
+            except TelegramRetryAfter as e:
+                bucket.block(e.retry_after)
+                self._retry(item, e.retry_after, f"RetryAfter {e.retry_after}s")
+                return
+
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                logger.warning(f"[OUTBOX] Undeliverable to {chat_id}: {e}")
+                self._counters["failed"] += 1
+                self._advance(chat_id, seq)
+                return
+
+            except Exception as e:
+                self._retry(item, 2 ** attempt, str(e))
+                return
+
+            self._advance(chat_id, seq)
+
+        self._counters["sent"] += 1
+        self._latency.append(time.monotonic() - enqueued_at)
+
+    def _retry(self, item, delay: float, reason: str):
+        lane, seq, enqueued_at, attempt, chat_id, text, kwargs = item
+
+        if attempt + 1 >= OUTBOX_MAX_RETRIES:
+            logger.error(
+                f"[OUTBOX] Giving up on {chat_id} after {attempt + 1} tries: {reason}"
+            )
+            self._counters["failed"] += 1
+            self._advance(chat_id, seq)
+            return
+
+        logger.warning(f"[OUTBOX] Retrying {chat_id} in {delay}s ({reason})")
+        self._counters["retried"] += 1
+        self._defer(
+            (lane, seq, enqueued_at, attempt + 1, chat_id, text, kwargs),
+            delay,
+        )
+
+    # ---------- per-chat ordering ----------
+    # Once a chat's message is deferred it becomes the chat's head:
+    # later messages for that chat are parked behind it (not sent
+    # around it) and released one at a time as each head finishes.
+    def _park(self, item) -> bool:
+        """True if the item was queued behind its chat's deferred head."""
+        parked = self._parked.get(item[4])
+        if parked is None or parked[0] == item[1]:
+            return False
+        parked[1].append(item)
+        self._depth[item[0]] += 1
+        return True
+
+    def _advance(self, chat_id: int, seq: int):
+        """The chat's head is done (sent or given up): release the next."""
+        parked = self._parked.get(chat_id)
+        if parked is None or parked[0] != seq:
+            return
+        if not parked[1]:
+            del self._parked[chat_id]
+            return
+        item = parked[1].popleft()
+        parked[0] = item[1]
+        self._put_deferred(item)
+
+    def _defer(self, item, delay: float):
+        """
+        Re-queues after a delay, as the head of its chat: the chat's
+        later messages wait behind it, so relays keep their order.
+        """
+        lane = item[0]
+        self._parked.setdefault(item[4], [item[1], deque()])
+        self._depth[lane] += 1
+        asyncio.get_running_loop().call_later(delay, self._put_deferred, item)
+
+    def _put_deferred(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self._depth[item[0]] -= 1
+            self._counters["dropped"] += 1
+            logger.error(f"[OUTBOX] Queue full, dropping deferred message to {item[4]}")
+            self._advance(item[4], item[1])
+
+    # ---------- metrics ----------
+    def metrics(self) -> dict:
+        samples = sorted(self._latency)
+
+        def pct(p: float) -> Optional[float]:
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], 4)
+
+        return {
+            "depth": {
+                Lane.NAMES[lane]: depth for lane, depth in self._depth.items()
+            },
+            "workers": len(self._workers),
+            **self._counters,
+            "latency_seconds": {
+                "p50": pct(0.50),
+                "p95": pct(0.95),
+                "p99": pct(0.99),
+            },
+        }
+
+
+# ---- Singleton outbox ----
+outbox = Outbox()
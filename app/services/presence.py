@@ -0,0 +1,160 @@
+import logging
+import os
+import time
+
+from app.redis_client import redis_client
+from app.services.buckets import DEFAULT_BUCKET
+from app.services.matchmaking import (
+    ROLES,
+    add_user_to_pool,
+    remove_user_from_pool,
+    pool_sizes,
+)
+from app.services.user_flags import AVAILABLE_KEY, idle_female_counts
+
+logger = logging.getLogger("trueme.presence")
+
+# -------------------------
+# CONFIG
+# -------------------------
+# Availability is a lease: it lapses unless the user interacts
+PRESENCE_TTL_SECONDS = int(os.getenv("TRUEME_PRESENCE_TTL_SECONDS", "900"))
+
+# A user's lease is refreshed at most this often per process
+HEARTBEAT_MIN_INTERVAL_SECONDS = PRESENCE_TTL_SECONDS / 10
+
+_HEARTBEAT_MEMO_SIZE = 100000
+
+
+def leases_key(role: str) -> str:
+    """zset user_id -> lease expiry; ZCOUNT(now, +inf) = online count"""
+    return f"presence:leases:{role}"
+
+
+# -------------------------
+# Lua (server-side)
+# -------------------------
+# KEYS: available bitmap, leases zset
+# ARGV: lease expiry, user id, require available (0/1)
+# Females only hold a lease while they are toggled ONLINE.
+_HEARTBEAT_LUA = """
+if ARGV[3] == '1' then
+    if redis.call('GETBIT', KEYS[1], ARGV[2]) == 0 then
+        return 0
+    end
+end
+redis.call('ZADD', KEYS[2], ARGV[1], ARGV[2])
+return 1
+"""
+
+# KEYS: leases zset, available bitmap
+# ARGV: now, limit, role, default bucket
+# NOTE: bucket pools are built inline (see matchmaking.pool_key).
+_SWEEP_LUA = """
+local expired = redis.call(
+    'ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2]
+)
+for _, uid in ipairs(expired) do
+    redis.call('ZREM', KEYS[1], uid)
+    local bucket = redis.call('HGET', 'matchmaking:user_bucket', uid) or ARGV[4]
+    redis.call('ZREM', 'matchmaking:pool:' .. ARGV[3] .. ':' .. bucket, uid)
+    redis.call('SETBIT', KEYS[2], uid, 0)
+end
+return expired
+"""
+
+_heartbeat = redis_client.register_script(_HEARTBEAT_LUA)
+_sweep = redis_client.register_script(_SWEEP_LUA)
+
+# user_id -> monotonic time of last refresh (debounce)
+_last_beat: dict[int, float] = {}
+
+
+# -------------------------
+# ONLINE / OFFLINE
+# -------------------------
+async def go_online(user_id: int):
+    """Female toggles ONLINE: takes a lease and joins the pool."""
+    ttl = PRESENCE_TTL_SECONDS
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.setbit(AVAILABLE_KEY, user_id, 1)
+        pipe.zadd(leases_key("female"), {str(user_id): time.time() + ttl})
+        await pipe.execute()
+
+    _last_beat[user_id] = time.monotonic()
+    await add_user_to_pool(user_id, "female")
+
+
+async def go_offline(user_id: int):
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.setbit(AVAILABLE_KEY, user_id, 0)
+        pipe.zrem(leases_key("female"), user_id)
+        await pipe.execute()
+
+    _last_beat.pop(user_id, None)
+    await remove_user_from_pool(user_id)
+
+
+async def heartbeat(user_id: int, role: str) -> bool:
+    """
+    Extends the user's lease. Cheap to call on every update:
+    refreshes are debounced in-process.
+    Returns False if the user holds no lease (female offline).
+    """
+    if role not in ROLES:
+        return False
+
+    now = time.monotonic()
+    last = _last_beat.get(user_id)
+    if last is not None and now - last < HEARTBEAT_MIN_INTERVAL_SECONDS:
+        return True
+
+    ttl = PRESENCE_TTL_SECONDS
+    refreshed = await _heartbeat(
+        keys=[AVAILABLE_KEY, leases_key(role)],
+        args=[time.time() + ttl, user_id, int(role == "female")],
+    )
+
+    if len(_last_beat) >= _HEARTBEAT_MEMO_SIZE:
+        _last_beat.clear()
+    if refreshed:
+        _last_beat[user_id] = now
+
+    return bool(refreshed)
+
+
+# -------------------------
+# SWEEP / COUNTS
+# -------------------------
+async def sweep_expired(limit: int) -> dict[str, list[int]]:
+    """
+    Evicts users whose lease lapsed from the lease set and the pool.
+    Returns role -> evicted user ids.
+    """
+    now = time.time()
+    evicted = {}
+    for role in ROLES:
+        expired = await _sweep(
+            keys=[leases_key(role), AVAILABLE_KEY],
+            args=[now, limit, role, DEFAULT_BUCKET],
+        )
+        evicted[role] = [int(uid) for uid in expired]
+        for uid in evicted[role]:
+            _last_beat.pop(uid, None)
+
+    return evicted
+
+
+async def online_counts() -> dict:
+    """O(log n) per role and bucket; no key scans."""
+    now = time.time()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for role in ROLES:
+            pipe.zcount(leases_key(role), now, "+inf")
+        online_male, online_female = await pipe.execute()
+
+    return {
+        "online": {"male": online_male, "female": online_female},
+        "pool": await pool_sizes(),
+        "flags": await idle_female_counts(),
+    }
@@ -0,0 +1,111 @@
+import os
+import time
+from typing import Optional
+
+from app.redis_client import redis_client
+
+# "N minutes left" notice; 0 disables warnings
+EXPIRY_WARNING_MINUTES = int(os.getenv("TRUEME_EXPIRY_WARNING_MINUTES", "5"))
+
+# -------------------------
+# Redis keys
+# -------------------------
+DEADLINES_KEY = "session:deadlines"      # zset: session_id -> expires_at
+PROCESSING_KEY = "session:expiring"      # zset: session_id -> claimed_at
+WARNINGS_KEY = "session:warnings"        # zset: session_id -> warn_at
+
+# A claim not acked within this window is handed to another worker
+CLAIM_LEASE_SECONDS = 60
+
+
+# -------------------------
+# Atomic claims (server-side)
+# -------------------------
+# Requeues stale claims, then moves due deadlines into the
+# processing set. Whoever removes a member owns it, so each
+# expiry is handed to exactly one worker at a time.
+_CLAIM_DUE_LUA = """
+local now = tonumber(ARGV[1])
+local stale = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now - tonumber(ARGV[3]))
+for _, sid in ipairs(stale) do
+    redis.call('ZREM', KEYS[2], sid)
+    redis.call('ZADD', KEYS[1], now, sid)
+end
+
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, tonumber(ARGV[2]))
+for _, sid in ipairs(due) do
+    redis.call('ZREM', KEYS[1], sid)
+    redis.call('ZADD', KEYS[2], now, sid)
+end
+return due
+"""
+
+_CLAIM_WARNINGS_LUA = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, sid in ipairs(due) do
+    redis.call('ZREM', KEYS[1], sid)
+end
+return due
+"""
+
+_claim_due = redis_client.register_script(_CLAIM_DUE_LUA)
+_claim_warnings = redis_client.register_script(_CLAIM_WARNINGS_LUA)
+
+
+# -------------------------
+# Scheduling
+# -------------------------
+async def schedule_session_expiry(
+    session_id: int,
+    expires_at: float,
+    warn_at: Optional[float] = None,
+):
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.zadd(DEADLINES_KEY, {str(session_id): expires_at})
+        if warn_at and warn_at > time.time():
+            pipe.zadd(WARNINGS_KEY, {str(session_id): warn_at})
+        await pipe.execute()
+
+
+async def cancel_session_expiry(session_id: int):
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.zrem(DEADLINES_KEY, str(session_id))
+        pipe.zrem(WARNINGS_KEY, str(session_id))
+        await pipe.execute()
+
+
+# -------------------------
+# Worker side
+# -------------------------
+async def claim_due_expiries(limit: int) -> list[int]:
+    due = await _claim_due(
+        keys=[DEADLINES_KEY, PROCESSING_KEY],
+        args=[time.time(), limit, CLAIM_LEASE_SECONDS],
+    )
+    return [int(sid) for sid in due]
+
+
+async def ack_expiries(session_ids: list[int]):
+    if session_ids:
+        await redis_client.zrem(PROCESSING_KEY, *[str(s) for s in session_ids])
+
+
+async def claim_due_warnings(limit: int) -> list[int]:
+    due = await _claim_warnings(
+        keys=[WARNINGS_KEY],
+        args=[time.time(), limit],
+    )
+    return [int(sid) for sid in due]
+
+
+async def next_due_at() -> Optional[float]:
+    """
+    Earliest deadline or warning still pending, or None.
+    """
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.zrange(DEADLINES_KEY, 0, 0, withscores=True)
+        pipe.zrange(WARNINGS_KEY, 0, 0, withscores=True)
+        heads = await pipe.execute()
+
+    scores = [head[0][1] for head in heads if head]
+    return min(scores) if scores else None
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Optional
+
+from app.redis_client import redis_client
+
+logger = logging.getLogger("trueme.single_flight")
+
+# How often a waiting caller checks for the leader's result
+SINGLE_FLIGHT_POLL_SECONDS = 0.05
+
+# Results outlive the lock just long enough for waiters to read them
+SINGLE_FLIGHT_RESULT_SECONDS = 5
+
+
+def _lock_key(key: str) -> str:
+    return f"singleflight:{key}:lock"
+
+
+def _result_key(key: str, token: str) -> str:
+    return f"singleflight:{key}:result:{token}"
+
+
+# KEYS: lock, result
+# ARGV: token, outcome, result ttl
+# Publishes the outcome and frees the lock if we still hold it.
+_PUBLISH_LUA = """
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+end
+return 1
+"""
+
+# KEYS: lock
+# ARGV: token
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_publish = redis_client.register_script(_PUBLISH_LUA)
+_release = redis_client.register_script(_RELEASE_LUA)
+
+# Same-process callers join an in-flight call without touching Redis
+_inflight: dict[str, asyncio.Future] = {}
+
+
+# -------------------------
+# LEADER / WAITER
+# -------------------------
+async def _lead(key, token, fn, error_type) -> dict:
+    try:
+        outcome = {"value": await fn()}
+    except Exception as e:
+        if error_type is None or not isinstance(e, error_type):
+            # Not shareable: waiters see the lock go and retry themselves
+            await _release(keys=[_lock_key(key)], args=[token])
+            raise
+        outcome = {"error": str(e)}
+
+    await _publish(
+        keys=[_lock_key(key), _result_key(key, token)],
+        args=[token, json.dumps(outcome), SINGLE_FLIGHT_RESULT_SECONDS],
+    )
+    return outcome
+
+
+async def _wait(key: str, holder: str, lock_seconds: float) -> Optional[dict]:
+    """
+    Waits for the holder's outcome. None if the holder went away
+    without publishing one (crashed, failed or lock expired).
+    """
+    deadline = time.monotonic() + lock_seconds
+    while time.monotonic() < deadline:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.get(_result_key(key, holder))
+            pipe.get(_lock_key(key))
+            raw, current = await pipe.execute()
+
+        if raw:
+            return json.loads(raw)
+        if current != holder:
+            return None
+
+        await asyncio.sleep(SINGLE_FLIGHT_POLL_SECONDS)
+    return None
+
+
+async def _run(key, fn, error_type, lock_seconds) -> dict:
+    token = uuid.uuid4().hex
+
+    while True:
+        if await redis_client.set(
+            _lock_key(key), token, nx=True, px=int(lock_seconds * 1000)
+        ):
+            return await _lead(key, token, fn, error_type)
+
+        holder = await redis_client.get(_lock_key(key))
+        if holder is None:
+            continue
+
+        outcome = await _wait(key, holder, lock_seconds)
+        if outcome is not None:
+            return outcome
+
+
+def _unwrap(outcome: dict, error_type):
+    if "error" in outcome:
+        raise error_type(outcome["error"])
+    return outcome["value"]
+
+
+# -------------------------
+# PUBLIC
+# -------------------------
+async def single_flight(
+    key: str,
+    fn: Callable[[], Awaitable[Any]],
+    error_type: Optional[type] = None,
+    lock_seconds: float = 10,
+) -> Any:
+    """
+    Runs fn once per key across all workers; concurrent callers
+    wait for and share its result. Values must be JSON-serializable.
+    Exceptions of error_type are shared too (re-raised from their
+    message); any other failure is raised to the leader only and
+    waiters retry.
+    """
+    joined = _inflight.get(key)
+    if joined is not None:
+        return _unwrap(await asyncio.shield(joined), error_type)
+
+    future = asyncio.get_running_loop().create_future()
+    # Nobody may be waiting; don't log "exception never retrieved"
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    _inflight[key] = future
+
+    try:
+        outcome = await _run(key, fn, error_type, lock_seconds)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(outcome)
+    finally:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+    return _unwrap(outcome, error_type)
@@ -0,0 +1,126 @@
+import logging
+import os
+
+from app.redis_client import redis_client
+
+logger = logging.getLogger("trueme.stars.ingest")
+
+STREAM_KEY = "stars:payments"
+STREAM_GROUP = "stars-workers"
+
+# Payments that could not be credited after STARS_MAX_DELIVERIES
+# attempts (e.g. the telegram user never resolved) are parked here
+# for manual review instead of being retried forever
+DEAD_LETTER_KEY = "stars:payments:dead"
+STARS_MAX_DELIVERIES = int(os.getenv("TRUEME_STARS_MAX_DELIVERIES", "10"))
+
+# Redis answers repeat deliveries within this window; older
+# repeats are stopped by telegram_stars_ledger's unique constraint
+DEDUPE_TTL_SECONDS = 7 * 24 * 3600
+
+# Unacked payments older than this are taken over by another worker
+CLAIM_IDLE_MS = 60000
+
+
+def seen_key(event_id: str) -> str:
+    return f"stars:seen:{event_id}"
+
+
+# KEYS: seen key, stream
+# ARGV: ttl, event id, telegram user id, stars
+# Returns 1 if queued, 0 for a duplicate.
+_ACCEPT_LUA = """
+if redis.call('SET', KEYS[1], '1', 'NX', 'EX', ARGV[1]) == false then
+    return 0
+end
+redis.call('XADD', KEYS[2], '*', 'eid', ARGV[2], 'tg', ARGV[3], 'stars', ARGV[4])
+return 1
+"""
+
+_accept = redis_client.register_script(_ACCEPT_LUA)
+
+
+async def accept_payment(event_id: str, telegram_user_id: int, stars: int) -> bool:
+    """
+    Dedupe + durable enqueue in one round trip.
+    False if this event was already accepted.
+    """
+    return bool(await _accept(
+        keys=[seen_key(event_id), STREAM_KEY],
+        args=[DEDUPE_TTL_SECONDS, event_id, telegram_user_id, stars],
+    ))
+
+
+async def ensure_group():
+    try:
+        await redis_client.xgroup_create(
+            STREAM_KEY, STREAM_GROUP, id="0", mkstream=True
+        )
+    except Exception as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def read_payments(consumer: str, count: int) -> list[tuple[str, dict]]:
+    """Abandoned payments first, then new ones."""
+    _, claimed, *_ = await redis_client.xautoclaim(
+        STREAM_KEY, STREAM_GROUP, consumer,
+        min_idle_time=CLAIM_IDLE_MS, start_id="0-0", count=count,
+    )
+    if claimed:
+        return [(eid, fields) for eid, fields in claimed if fields]
+
+    streams = await redis_client.xreadgroup(
+        STREAM_GROUP, consumer, {STREAM_KEY: ">"}, count=count,
+    )
+    return [entry for _, entries in streams for entry in entries]
+
+
+async def ack_payments(entry_ids: list[str]):
+    if not entry_ids:
+        return
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.xack(STREAM_KEY, STREAM_GROUP, *entry_ids)
+        pipe.xdel(STREAM_KEY, *entry_ids)
+        await pipe.execute()
+
+
+async def delivery_counts(entry_ids: list[str]) -> dict[str, int]:
+    """Times each pending entry has been delivered (XPENDING)."""
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for entry_id in entry_ids:
+            pipe.xpending_range(
+                STREAM_KEY, STREAM_GROUP, min=entry_id, max=entry_id, count=1
+            )
+        rows = await pipe.execute()
+    return {
+        row[0]["message_id"]: row[0]["times_delivered"]
+        for row in rows if row
+    }
+
+
+async def dead_letter(entries: list[tuple[str, dict]]):
+    """Moves entries to the dead-letter stream and out of the group."""
+    if not entries:
+        return
+    async with redis_client.pipeline(transaction=True) as pipe:
+        for entry_id, fields in entries:
+            pipe.xadd(DEAD_LETTER_KEY, {**fields, "entry": entry_id})
+        ids = [entry_id for entry_id, _ in entries]
+        pipe.xack(STREAM_KEY, STREAM_GROUP, *ids)
+        pipe.xdel(STREAM_KEY, *ids)
+        await pipe.execute()
+
+    for entry_id, fields in entries:
+        logger.error(
+            f"[STARS] Dead-lettered event {fields.get('eid')} "
+            f"(tg={fields.get('tg')}, entry {entry_id})"
+        )
+
+
+async def backlog() -> int:
+    return await redis_client.xlen(STREAM_KEY)
+
+
+async def dead_letters() -> int:
+    return await redis_client.xlen(DEAD_LETTER_KEY)
@@ -0,0 +1,57 @@
+import logging
+import os
+
+from app.redis_client import redis_client
+
+logger = logging.getLogger("trueme.ingest.dedupe")
+
+# How long a delivered update_id is remembered
+UPDATE_DEDUPE_SECONDS = int(os.getenv("TRUEME_UPDATE_DEDUPE_SECONDS", "300"))
+
+# update_ids are sequential per bot, so they are kept as bits in
+# bitmaps of 65536 ids (8 KB each); a bitmap expires one window
+# after its last write, instead of one key + TTL per update.
+_BUCKET_BITS = 16
+_BUCKET_MASK = (1 << _BUCKET_BITS) - 1
+
+_counters = {"seen": 0, "duplicate": 0, "errors": 0}
+
+
+def _bucket_key(update_id: int) -> str:
+    return f"updates:seen:{update_id >> _BUCKET_BITS}"
+
+
+async def first_delivery(update_id: int) -> bool:
+    """
+    Marks the update as seen; False if it already was.
+    Fails open: if Redis errors, the update is processed.
+    """
+    key = _bucket_key(update_id)
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.setbit(key, update_id & _BUCKET_MASK, 1)
+            pipe.expire(key, UPDATE_DEDUPE_SECONDS)
+            previous, _ = await pipe.execute()
+    except Exception as e:
+        _counters["errors"] += 1
+        logger.warning(f"[INGEST] Dedupe check failed for {update_id}: {e}")
+        return True
+
+    if previous:
+        _counters["duplicate"] += 1
+        return False
+
+    _counters["seen"] += 1
+    return True
+
+
+def metrics() -> dict:
+    return {"window_seconds": UPDATE_DEDUPE_SECONDS, **_counters}
+
+
+async def forget(update_id: int):
+    """Un-marks an update we refused, so its redelivery is processed."""
+    try:
+        await redis_client.setbit(_bucket_key(update_id), update_id & _BUCKET_MASK, 0)
+    except Exception as e:
+        logger.warning(f"[INGEST] Could not forget {update_id}: {e}")
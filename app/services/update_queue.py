@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from aiogram.types.update import UpdateTypeLookupError
+
+logger = logging.getLogger("trueme.ingest")
+
+# -------------------------
+# CONFIG
+# -------------------------
+# inline: await dp.feed_update inside the webhook (default)
+# queued: enqueue, answer 200, process in shard workers (opt in)
+INGEST_MODE = os.getenv("TRUEME_INGEST_MODE", "inline").lower()
+
+INGEST_SHARDS = int(os.getenv("TRUEME_INGEST_SHARDS", "16"))
+INGEST_SHARD_QUEUE_SIZE = int(os.getenv("TRUEME_INGEST_SHARD_QUEUE_SIZE", "1000"))
+
+# Full shard behaviour:
+#   reject: answer 503 so Telegram redelivers later
+#   wait:   hold the webhook up to INGEST_WAIT_SECONDS, then reject
+#   drop:   answer 200 and discard the update
+INGEST_BACKPRESSURE = os.getenv("TRUEME_INGEST_BACKPRESSURE", "reject").lower()
+INGEST_WAIT_SECONDS = float(os.getenv("TRUEME_INGEST_WAIT_SECONDS", "2"))
+
+INGEST_DRAIN_SECONDS = 10
+
+
+def update_user_id(update) -> Optional[int]:
+    """
+    from_user.id of whatever event the update carries, if any.
+    Update types aiogram doesn't know fall back to the default shard.
+    """
+    try:
+        event = update.event
+    except UpdateTypeLookupError:
+        return None
+    user = getattr(event, "from_user", None)
+    return user.id if user else None
+
+
+# -------------------------
+# SHARDED DISPATCHER
+# -------------------------
+class UpdateQueue:
+    """
+    One queue + one worker per shard. Updates are routed by
+    from_user.id, so a user's updates run in arrival order while
+    different users are processed in parallel.
+    """
+
+    def __init__(self):
+        self._shards: list[asyncio.Queue] = []
+        self._workers: list[asyncio.Task] = []
+        self._dp = None
+        self._bot = None
+        self._counters = {
+            "accepted": 0,
+            "processed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "dropped": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return INGEST_MODE == "queued" and bool(self._workers)
+
+    # ---------- lifecycle ----------
+    def start(self, dp, bot):
+        if INGEST_MODE != "queued":
+            logger.info("[INGEST] Inline mode, shard workers not started")
+            return
+
+        self._dp = dp
+        self._bot = bot
+        self._shards = [
+            asyncio.Queue(maxsize=INGEST_SHARD_QUEUE_SIZE)
+            for _ in range(INGEST_SHARDS)
+        ]
+        self._workers = [
+            asyncio.create_task(self._worker(i))
+            for i in range(INGEST_SHARDS)
+        ]
+        logger.info(f"[INGEST] Started {INGEST_SHARDS} shard workers")
+
+    async def stop(self):
+        """
+        Drains what is already queued (bounded), then stops the workers.
+        """
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(shard.join() for shard in self._shards)),
+                INGEST_DRAIN_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            logger.warning("[INGEST] Drain timed out, dropping queued updates")
+
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    # ---------- producer ----------
+    def _shard_for(self, update) -> asyncio.Queue:
+        key = update_user_id(update)
+        if key is None:
+            key = update.update_id
+        return self._shards[key % len(self._shards)]
+
+    async def submit(self, update) -> bool:
+        """
+        Returns False when the update must be refused (webhook → 503).
+        """
+        shard = self._shard_for(update)
+
+        try:
+            shard.put_nowait(update)
+        except asyncio.QueueFull:
+            if INGEST_BACKPRESSURE == "drop":
+                logger.error(f"[INGEST] Shard full, dropping update {update.update_id}")
+                self._counters["dropped"] += 1
+                return True
+
+            if INGEST_BACKPRESSURE == "wait":
+                try:
+                    await asyncio.wait_for(shard.put(update), INGEST_WAIT_SECONDS)
+                except asyncio.TimeoutError:
+                    self._counters["rejected"] += 1
+                    return False
+            else:
+                self._counters["rejected"] += 1
+                return False
+
+        self._counters["accepted"] += 1
+        return True
+
+    # ---------- consumer ----------
+    async def _worker(self, index: int):
+        shard = self._shards[index]
+        while True:
+            update = await shard.get()
+            try:
+                await self._dp.feed_update(self._bot, update)
+                self._counters["processed"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._counters["failed"] += 1
+                logger.exception(
+                    f"[INGEST] Update {update.update_id} failed on shard {index}: {e}"
+                )
+            finally:
+                shard.task_done()
+
+    # ---------- metrics ----------
+    def metrics(self) -> dict:
+        depths = [shard.qsize() for shard in self._shards]
+        return {
+            "mode": INGEST_MODE,
+            "shards": len(self._shards),
+            "depth": sum(depths),
+            "max_shard_depth": max(depths, default=0),
+            **self._counters,
+        }
+
+
+# ---- Singleton update queue ----
+update_queue = UpdateQueue()
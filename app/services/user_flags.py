@@ -0,0 +1,164 @@
+from typing import Iterable, Optional
+
+from app.redis_client import redis_client
+
+# -------------------------
+# BITMAP LAYOUT
+# -------------------------
+# One bitmap per flag, bit offset = users.id:
+#   flags:role:male / flags:role:female   role (neither bit = no role)
+#   flags:verified                       users.is_verified
+#   flags:available                      female toggled ONLINE (leased)
+#   flags:in_session                     mirror of user:{id}:in_session
+#   flags:suspended                      reported too often; never matched
+#
+# A million users cost ~125 KB per flag instead of a key each, and
+# bulk questions are one BITOP/BITCOUNT. The in_session pointer stays
+# the authority (it carries the session id and claim TTL); its bit is
+# kept in step by the same Lua scripts and rebuilt by the reconciler.
+# NOTE: Lua scripts elsewhere build these names inline.
+ROLE_KEYS = {
+    "male": "flags:role:male",
+    "female": "flags:role:female",
+}
+VERIFIED_KEY = "flags:verified"
+AVAILABLE_KEY = "flags:available"
+IN_SESSION_KEY = "flags:in_session"
+SUSPENDED_KEY = "flags:suspended"
+
+_SCRATCH_KEY = "flags:scratch:{}"
+
+
+# KEYS: female, verified, available, in_session, scratch
+# Verified females online minus those in a session (no BITOP NOT:
+# it would stop at the in_session bitmap's length).
+_IDLE_FEMALES_LUA = """
+redis.call('BITOP', 'AND', KEYS[5], KEYS[1], KEYS[2], KEYS[3])
+local online = redis.call('BITCOUNT', KEYS[5])
+redis.call('BITOP', 'AND', KEYS[5], KEYS[5], KEYS[4])
+local busy = redis.call('BITCOUNT', KEYS[5])
+redis.call('DEL', KEYS[5])
+return {online, online - busy}
+"""
+
+_idle_females = redis_client.register_script(_IDLE_FEMALES_LUA)
+
+
+# -------------------------
+# WRITES
+# -------------------------
+def _stage_role(pipe, user_id: int, role: Optional[str]):
+    for name, key in ROLE_KEYS.items():
+        pipe.setbit(key, user_id, int(name == role))
+
+
+async def set_role(user_id: int, role: Optional[str]):
+    async with redis_client.pipeline(transaction=True) as pipe:
+        _stage_role(pipe, user_id, role)
+        await pipe.execute()
+
+
+async def set_verified(user_id: int, verified: bool):
+    await redis_client.setbit(VERIFIED_KEY, user_id, int(verified))
+
+
+async def set_suspended(user_id: int, suspended: bool):
+    await redis_client.setbit(SUSPENDED_KEY, user_id, int(suspended))
+
+
+async def sync_many(idents: Iterable):
+    """Role + verified bits for Identity records, one pipeline."""
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for ident in idents:
+            _stage_role(pipe, ident.user_id, ident.role)
+            pipe.setbit(VERIFIED_KEY, ident.user_id, int(ident.is_verified))
+        await pipe.execute()
+
+
+async def rebuild_in_session(user_ids: Iterable[int]):
+    """Replaces the in_session bitmap with exactly these users."""
+    scratch = _SCRATCH_KEY.format("in_session")
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.delete(scratch)
+        # Keeps the scratch key in existence even when nobody is busy
+        pipe.setbit(scratch, 0, 0)
+        for uid in user_ids:
+            pipe.setbit(scratch, uid, 1)
+        pipe.rename(scratch, IN_SESSION_KEY)
+        await pipe.execute()
+
+
+# -------------------------
+# READS
+# -------------------------
+async def get_role(user_id: int) -> Optional[str]:
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for key in ROLE_KEYS.values():
+            pipe.getbit(key, user_id)
+        bits = await pipe.execute()
+
+    for name, bit in zip(ROLE_KEYS, bits):
+        if bit:
+            return name
+    return None
+
+
+async def has_role(user_ids: list[int]) -> list[bool]:
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for uid in user_ids:
+            for key in ROLE_KEYS.values():
+                pipe.getbit(key, uid)
+        bits = await pipe.execute()
+
+    return [bool(m or f) for m, f in zip(bits[::2], bits[1::2])]
+
+
+async def is_available(user_id: int) -> bool:
+    return bool(await redis_client.getbit(AVAILABLE_KEY, user_id))
+
+
+async def is_suspended(user_id: int) -> bool:
+    return bool(await redis_client.getbit(SUSPENDED_KEY, user_id))
+
+
+async def are_available(user_ids: list[int]) -> list[bool]:
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for uid in user_ids:
+            pipe.getbit(AVAILABLE_KEY, uid)
+        return [bool(bit) for bit in await pipe.execute()]
+
+
+async def idle_female_counts() -> dict:
+    """Verified females online, and how many of them are idle."""
+    online, idle = await _idle_females(
+        keys=[
+            ROLE_KEYS["female"],
+            VERIFIED_KEY,
+            AVAILABLE_KEY,
+            IN_SESSION_KEY,
+            _SCRATCH_KEY.format("idle_females"),
+        ],
+    )
+    return {"verified_online": online, "verified_idle": idle}
+
+
+async def flag_counts() -> dict:
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for key in ROLE_KEYS.values():
+            pipe.bitcount(key)
+        pipe.bitcount(VERIFIED_KEY)
+        pipe.bitcount(AVAILABLE_KEY)
+        pipe.bitcount(IN_SESSION_KEY)
+        pipe.bitcount(SUSPENDED_KEY)
+        (
+            male, female, verified, available, in_session, suspended,
+        ) = await pipe.execute()
+
+    return {
+        "male": male,
+        "female": female,
+        "verified": verified,
+        "available": available,
+        "in_session": in_session,
+        "suspended": suspended,
+    }
@@ -0,0 +1,245 @@
+import logging
+import os
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.database import AsyncSessionLocal
+from app.models.wallet import Wallet
+from app.redis_client import redis_client
+
+logger = logging.getLogger("trueme.wallet.meter")
+
+# -------------------------
+# CONFIG
+# -------------------------
+# db:    paid minutes are read/locked on wallets rows (default)
+# redis: paid minutes live in Redis counters; every change is
+#        journaled and written behind to wallets in batches
+WALLET_METERING = os.getenv("TRUEME_WALLET_METERING", "db").lower()
+
+JOURNAL_KEY = "wallet:journal"          # stream: uid, delta, type, ref
+JOURNAL_GROUP = "wallet-flusher"
+
+# Unacked entries older than this are taken over by another flusher
+JOURNAL_CLAIM_IDLE_MS = 60000
+
+
+def metering_enabled() -> bool:
+    return WALLET_METERING == "redis"
+
+
+def minutes_key(user_id: int) -> str:
+    return f"wallet:minutes:{user_id}"
+
+
+# -------------------------
+# Lua (server-side)
+# -------------------------
+# Counter change + journal append are one atomic step, so the
+# counter never moves without a matching journal entry.
+#
+# KEYS: counter, journal, once key (optional)
+# ARGV: delta (signed), user id, type, ref, require funds (0/1),
+#       once ttl seconds
+# Returns -1 if the counter is not loaded, 0 if funds are short,
+# 1 when applied, 2 if the once key says it already was.
+_APPLY_LUA = """
+if KEYS[3] and redis.call('EXISTS', KEYS[3]) == 1 then
+    return 2
+end
+local current = redis.call('GET', KEYS[1])
+if not current then
+    return -1
+end
+local delta = tonumber(ARGV[1])
+if ARGV[5] == '1' and tonumber(current) + delta < 0 then
+    return 0
+end
+redis.call('INCRBY', KEYS[1], delta)
+redis.call('XADD', KEYS[2], '*',
+    'uid', ARGV[2], 'delta', ARGV[1], 'type', ARGV[3], 'ref', ARGV[4])
+if KEYS[3] then
+    redis.call('SET', KEYS[3], '1', 'EX', ARGV[6])
+end
+return 1
+"""
+
+# Once keys outlive any redelivery of the message that carried them
+ONCE_TTL_SECONDS = 7 * 24 * 3600
+
+_apply = redis_client.register_script(_APPLY_LUA)
+
+
+class MeterError(Exception):
+    pass
+
+
+# -------------------------
+# COUNTERS
+# -------------------------
+async def _load(user_id: int) -> bool:
+    """
+    Seeds the counter from Postgres (SET NX: never overwrites a live
+    counter, whose unflushed journal entries Postgres hasn't seen).
+    False if the user has no wallet.
+    """
+    async with AsyncSessionLocal() as db:
+        wallet = await db.get(Wallet, user_id)
+
+    if not wallet:
+        return False
+
+    await redis_client.set(minutes_key(user_id), wallet.paid_minutes or 0, nx=True)
+    return True
+
+
+async def balance(user_id: int) -> Optional[int]:
+    raw = await redis_client.get(minutes_key(user_id))
+    if raw is None:
+        if not await _load(user_id):
+            return None
+        raw = await redis_client.get(minutes_key(user_id))
+    return int(raw)
+
+
+async def _change(
+    user_id: int,
+    delta: int,
+    type: str,
+    ref: str,
+    require_funds: bool,
+    once_key: Optional[str] = None,
+) -> bool:
+    keys = [minutes_key(user_id), JOURNAL_KEY]
+    if once_key:
+        keys.append(once_key)
+
+    for _ in range(2):
+        result = await _apply(
+            keys=keys,
+            args=[delta, user_id, type, ref or "", int(require_funds), ONCE_TTL_SECONDS],
+        )
+        if result != -1:
+            return result in (1, 2)
+        if not await _load(user_id):
+            raise MeterError("NO_WALLET")
+
+    raise MeterError("COUNTER_UNAVAILABLE")
+
+
+async def debit(user_id: int, minutes: int, type: str, ref: str) -> bool:
+    """Atomic check-and-decrement. False if funds are short."""
+    return await _change(user_id, -minutes, type, ref, require_funds=True)
+
+
+async def credit(
+    user_id: int,
+    minutes: int,
+    type: str,
+    ref: str,
+    once_key: Optional[str] = None,
+):
+    """
+    With once_key, repeating the same credit (e.g. a redelivered
+    payment) is a no-op.
+    """
+    await _change(user_id, minutes, type, ref, require_funds=False, once_key=once_key)
+
+
+# -------------------------
+# JOURNAL → POSTGRES
+# -------------------------
+async def ensure_group():
+    try:
+        await redis_client.xgroup_create(
+            JOURNAL_KEY, JOURNAL_GROUP, id="0", mkstream=True
+        )
+    except Exception as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def read_journal(consumer: str, count: int) -> list[tuple[str, dict]]:
+    """
+    Entries abandoned by a dead flusher first, then new ones.
+    """
+    _, claimed, *_ = await redis_client.xautoclaim(
+        JOURNAL_KEY, JOURNAL_GROUP, consumer,
+        min_idle_time=JOURNAL_CLAIM_IDLE_MS, start_id="0-0", count=count,
+    )
+    if claimed:
+        return [(eid, fields) for eid, fields in claimed if fields]
+
+    streams = await redis_client.xreadgroup(
+        JOURNAL_GROUP, consumer, {JOURNAL_KEY: ">"}, count=count,
+    )
+    return [entry for _, entries in streams for entry in entries]
+
+
+async def apply_journal(db, entries: list[tuple[str, dict]]) -> list[tuple]:
+    """
+    Records entries in wallet_journal (keyed by stream id) and applies
+    only the newly recorded ones to wallets, so a batch redelivered
+    after a crash is applied exactly once.
+    Returns the applied (user_id, delta, type, ref) rows.
+    Assumes caller already owns the transaction.
+    """
+    if not entries:
+        return []
+
+    rows = (await db.execute(
+        text("""
+            INSERT INTO wallet_journal (entry_id, user_id, delta, type, ref)
+            SELECT * FROM UNNEST(
+                CAST(:ids AS varchar[]),
+                CAST(:users AS integer[]),
+                CAST(:deltas AS integer[]),
+                CAST(:types AS varchar[]),
+                CAST(:refs AS varchar[])
+            )
+            ON CONFLICT (entry_id) DO NOTHING
+            RETURNING user_id, delta, type, ref
+        """),
+        {
+            "ids": [eid for eid, _ in entries],
+            "users": [int(f["uid"]) for _, f in entries],
+            "deltas": [int(f["delta"]) for _, f in entries],
+            "types": [f["type"] for _, f in entries],
+            "refs": [f["ref"] or None for _, f in entries],
+        },
+    )).all()
+
+    totals: dict[int, int] = {}
+    for user_id, delta, _, _ in rows:
+        totals[user_id] = totals.get(user_id, 0) + delta
+
+    if totals:
+        users = sorted(totals)
+        await db.execute(
+            text("""
+                UPDATE wallets AS w
+                SET paid_minutes = w.paid_minutes + v.delta
+                FROM UNNEST(
+                    CAST(:users AS integer[]),
+                    CAST(:deltas AS integer[])
+                ) AS v(user_id, delta)
+                WHERE w.user_id = v.user_id
+            """),
+            {"users": users, "deltas": [totals[u] for u in users]},
+        )
+
+    return rows
+
+
+async def ack_journal(entry_ids: list[str]):
+    if not entry_ids:
+        return
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.xack(JOURNAL_KEY, JOURNAL_GROUP, *entry_ids)
+        pipe.xdel(JOURNAL_KEY, *entry_ids)
+        await pipe.execute()
+
+
+async def journal_backlog() -> int:
+    return await redis_client.xlen(JOURNAL_KEY)
@@ -3,11 +3,8 @@ import hmac
 import hashlib
 import os
 from fastapi import APIRouter, Request, HTTPException
-from sqlalchemy import select
 
-from app.database import AsyncSessionLocal
-from app.models.user import User
-from app.models.wallet import Wallet
+from app.services.stars_ingest import accept_payment
 
 logger = logging.getLogger("trueme.stars")
 
@@ -15,16 +12,6 @@ router = APIRouter(prefix="/webhook", tags=["telegram-stars"])
 
 TELEGRAM_STARS_SECRET = os.getenv("TELEGRAM_STARS_SECRET", "dev-secret")
 
-# ---------------------------------------------------------
-# CONFIG
-# ---------------------------------------------------------
-# TEST MODE: 1 star = 30 minutes
-TEST_MINUTES_PER_STAR = 30
-
-# PROD MODE (later): 49 stars = 30 minutes
-# We’ll switch later cleanly
-
-
 # ---------------------------------------------------------
 # SIGNATURE VERIFICATION
 # ---------------------------------------------------------
@@ -56,47 +43,23 @@ async def telegram_stars_webhook(request: Request):
 
     payload = await request.json()
 
+    event_id = payload.get("telegram_event_id")
     telegram_user_id = payload.get("telegram_user_id")
     stars = payload.get("stars")
 
-    if not telegram_user_id or not stars:
+    if not event_id or not telegram_user_id or not stars:
         raise HTTPException(status_code=400, detail="Invalid payload")
 
-    stars = int(stars)
-    minutes_to_add = stars * TEST_MINUTES_PER_STAR
-
-    async with AsyncSessionLocal() as db:
-        async with db.begin():
-
-            # 👤 Find user
-            user = await db.scalar(
-                select(User).where(User.telegram_id == telegram_user_id)
-            )
-            if not user:
-                raise HTTPException(status_code=404, detail="User not found")
-
-            # 👛 Get or create wallet
-            wallet = await db.get(Wallet, user.id, with_for_update=True)
-            if not wallet:
-                wallet = Wallet(
-                    user_id=user.id,
-                    free_minutes=15,
-                    referral_minutes=0,
-                    paid_minutes=0,
-                )
-                db.add(wallet)
-                await db.flush()
-
-                logger.info(
-                    f"[STARS] Wallet created for user_id={user.id}"
-                )
-
-            # ⏱️ CREDIT PAID MINUTES
-            wallet.paid_minutes += minutes_to_add
-
-            logger.info(
-                f"[STARS] Credited {minutes_to_add} paid minutes "
-                f"(stars={stars}) to user_id={user.id}"
-            )
+    # ⚡ One Redis round trip: dedupe + durable enqueue.
+    # Workers resolve the user and credit the wallet in batches.
+    queued = await accept_payment(str(event_id), int(telegram_user_id), int(stars))
+
+    if not queued:
+        logger.info(f"[STARS] Duplicate event {event_id} ignored")
+        return {"status": "ok", "duplicate": True}
 
+    logger.info(
+        f"[STARS] Accepted event {event_id} "
+        f"(stars={stars}) for tg={telegram_user_id}"
+    )
     return {"status": "ok"}
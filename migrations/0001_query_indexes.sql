@@ -0,0 +1,76 @@
+-- migrate: no-transaction
+-- Indexes for the hot query paths.
+-- Built CONCURRENTLY so a live database keeps accepting writes; the
+-- runner executes this file one statement at a time, outside a
+-- transaction. Tables without a model (ledger, admin_audit_logs,
+-- female_verifications) may not exist yet: their statements are
+-- skipped and the migration stays pending (with a warning), so it
+-- is re-run until those indexes exist too.
+-- A build that fails midway leaves an INVALID index that IF NOT
+-- EXISTS would then skip: DROP INDEX CONCURRENTLY it and re-run.
+
+-- ---------------------------------------------------------------
+-- chat_sessions: "current session of user X"
+--   WHERE (male_id = :u OR female_id = :u) AND ended_at IS NULL
+-- Two partial indexes → BitmapOr; they stay small because only
+-- live sessions are in them.
+-- ---------------------------------------------------------------
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chat_sessions_male_active
+    ON chat_sessions (male_id) WHERE ended_at IS NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chat_sessions_female_active
+    ON chat_sessions (female_id) WHERE ended_at IS NULL;
+
+-- Reconciler: all open sessions
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chat_sessions_open
+    ON chat_sessions (id) WHERE ended_at IS NULL;
+
+-- History lookups (recent partners, per-user stats)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chat_sessions_male_started
+    ON chat_sessions (male_id, started_at);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chat_sessions_female_started
+    ON chat_sessions (female_id, started_at);
+
+-- ---------------------------------------------------------------
+-- withdrawals
+-- ---------------------------------------------------------------
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_withdrawals_status_created
+    ON withdrawals (status, created_at);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_withdrawals_pending
+    ON withdrawals (created_at) WHERE status = 'pending';
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_withdrawals_user
+    ON withdrawals (user_id);
+
+-- ---------------------------------------------------------------
+-- users: admin "females waiting approval"
+-- (telegram_id is already UNIQUE; wallets.user_id is the PK)
+-- ---------------------------------------------------------------
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_pending_females
+    ON users (id) WHERE role = 'female' AND is_verified = false;
+
+-- ---------------------------------------------------------------
+-- referrals: unrewarded referral of a user
+-- ---------------------------------------------------------------
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_referrals_referred_unrewarded
+    ON referrals (referred_id) WHERE rewarded = false;
+
+-- ---------------------------------------------------------------
+-- female_verifications: admin queue by status (if the table exists)
+-- ---------------------------------------------------------------
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_female_verifications_status
+    ON female_verifications (status, created_at);
+
+-- ---------------------------------------------------------------
+-- ledger / admin_audit_logs (raw-SQL tables, if they exist)
+-- ---------------------------------------------------------------
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_ledger_user_created
+    ON ledger (user_id, created_at);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_ledger_created
+    ON ledger (created_at);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_admin_audit_logs_created
+    ON admin_audit_logs (created_at);
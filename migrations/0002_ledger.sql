@@ -0,0 +1,57 @@
+-- Append-only ledger + per-user running balances.
+-- The admin panel already read from a hand-made "ledger" table;
+-- create it if missing and add the columns the model needs.
+
+CREATE TABLE IF NOT EXISTS ledger (
+    id BIGSERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    type VARCHAR(20) NOT NULL,
+    amount NUMERIC NOT NULL,
+    ref VARCHAR,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+ALTER TABLE ledger
+    ADD COLUMN IF NOT EXISTS asset VARCHAR(20) NOT NULL DEFAULT 'earnings';
+
+CREATE INDEX IF NOT EXISTS ix_ledger_user_created
+    ON ledger (user_id, created_at);
+
+CREATE INDEX IF NOT EXISTS ix_ledger_created
+    ON ledger (created_at);
+
+CREATE TABLE IF NOT EXISTS ledger_balances (
+    user_id INTEGER NOT NULL,
+    asset VARCHAR(20) NOT NULL,
+    credited NUMERIC NOT NULL DEFAULT 0,
+    debited NUMERIC NOT NULL DEFAULT 0,
+    balance NUMERIC NOT NULL DEFAULT 0,
+    entries INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (user_id, asset)
+);
+
+-- Seed snapshots from any existing history
+INSERT INTO ledger_balances (user_id, asset, credited, debited, balance, entries)
+SELECT
+    user_id,
+    asset,
+    COALESCE(SUM(amount) FILTER (WHERE amount >= 0), 0),
+    COALESCE(-SUM(amount) FILTER (WHERE amount < 0), 0),
+    SUM(amount),
+    COUNT(*)
+FROM ledger
+GROUP BY user_id, asset
+ON CONFLICT (user_id, asset) DO NOTHING;
+
+-- Append-only
+CREATE OR REPLACE FUNCTION ledger_append_only() RETURNS trigger AS $$
+BEGIN
+    RAISE EXCEPTION 'ledger is append-only';
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS ledger_no_update ON ledger;
+CREATE TRIGGER ledger_no_update
+    BEFORE UPDATE OR DELETE ON ledger
+    FOR EACH ROW EXECUTE FUNCTION ledger_append_only();
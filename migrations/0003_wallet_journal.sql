@@ -0,0 +1,15 @@
+-- Write-behind journal for Redis-metered wallet minutes.
+-- One row per applied stream entry; the primary key makes a
+-- redelivered batch a no-op.
+
+CREATE TABLE IF NOT EXISTS wallet_journal (
+    entry_id VARCHAR(32) PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    delta INTEGER NOT NULL,
+    type VARCHAR(20) NOT NULL,
+    ref VARCHAR,
+    applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_wallet_journal_user
+    ON wallet_journal (user_id, applied_at);
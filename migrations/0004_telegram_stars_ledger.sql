@@ -0,0 +1,10 @@
+-- Stars payments, one row per Telegram event; the unique event id
+-- is the durable dedupe behind the Redis seen-keys.
+
+CREATE TABLE IF NOT EXISTS telegram_stars_ledger (
+    id SERIAL PRIMARY KEY,
+    telegram_event_id VARCHAR NOT NULL UNIQUE,
+    telegram_user_id BIGINT NOT NULL,
+    stars INTEGER NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
@@ -0,0 +1,13 @@
+-- Reports feed the matchmaking block sets and suspensions.
+
+CREATE TABLE IF NOT EXISTS user_reports (
+    id SERIAL PRIMARY KEY,
+    reporter_id INTEGER NOT NULL,
+    reported_id INTEGER NOT NULL,
+    reason VARCHAR(255),
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Distinct reporters per reported user (suspension threshold)
+CREATE INDEX IF NOT EXISTS ix_user_reports_reported_reporter
+    ON user_reports (reported_id, reporter_id);
@@ -0,0 +1,4 @@
+-- Language / region pick the user's matchmaking bucket.
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS language VARCHAR(8);
+ALTER TABLE users ADD COLUMN IF NOT EXISTS region VARCHAR(16);
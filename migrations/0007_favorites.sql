@@ -0,0 +1,12 @@
+-- Favorites are mirrored into per-male Redis sets for "chat again".
+
+CREATE TABLE IF NOT EXISTS favorites (
+    id SERIAL PRIMARY KEY,
+    male_id INTEGER NOT NULL,
+    female_id INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+-- One row per pair; also serves the per-male lookup on reload
+CREATE UNIQUE INDEX IF NOT EXISTS uq_favorites_pair
+    ON favorites (male_id, female_id);
@@ -0,0 +1,11 @@
+-- Metered Stars credits: a row is recorded (and committed) before the
+-- Redis counter is credited; credited_at closes that window.
+
+ALTER TABLE telegram_stars_ledger ADD COLUMN IF NOT EXISTS credited_at TIMESTAMPTZ;
+
+-- Every row recorded before this column existed was already credited
+UPDATE telegram_stars_ledger SET credited_at = created_at WHERE credited_at IS NULL;
+
+-- Outstanding credits only; stays tiny
+CREATE INDEX IF NOT EXISTS ix_telegram_stars_ledger_uncredited
+    ON telegram_stars_ledger (telegram_event_id) WHERE credited_at IS NULL;
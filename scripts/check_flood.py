@@ -0,0 +1,71 @@
+"""
+Checks the flood limiter's GCRA script against fakeredis: for every
+configured budget, `burst` back-to-back events pass, the next one is
+denied, and one emission interval later one more is allowed again.
+Exits 1 on any mismatch.
+
+    pip install "fakeredis[lua]"
+    python -m scripts.check_flood
+"""
+import asyncio
+import os
+import sys
+from unittest import mock
+
+try:
+    import fakeredis
+except ImportError:
+    sys.exit('fakeredis is required: pip install "fakeredis[lua]"')
+
+# app.redis_client connects lazily, but refuses to import without a URL
+os.environ.setdefault("REDIS_URL", "redis://check")
+
+import app.redis_client as redis_module
+
+_fake = fakeredis.aioredis.FakeRedis(decode_responses=True)
+redis_module.redis_client = redis_module._redis = _fake
+
+from app.services import flood  # noqa: E402
+
+
+async def _events(user_tg: int, budget: str, count: int, at: float) -> list[bool]:
+    """True per allowed event, all at the same instant."""
+    with mock.patch.object(flood.time, "time", return_value=at):
+        return [await flood.hit(user_tg, budget) is None for _ in range(count)]
+
+
+async def check(budget: str, rate: float, burst: int) -> list[str]:
+    errors = []
+    start = 1_000_000.0
+
+    allowed = await _events(1, budget, burst + 1, start)
+    if allowed != [True] * burst + [False]:
+        errors.append(
+            f"{budget}: burst {burst} → {allowed.count(True)} allowed "
+            f"of {burst + 1} back-to-back"
+        )
+
+    allowed = await _events(1, budget, 2, start + 1 / rate)
+    if allowed != [True, False]:
+        errors.append(f"{budget}: after one interval → {allowed}")
+
+    return errors
+
+
+async def main() -> int:
+    cases = list(flood.FLOOD_LIMITS.items()) + [("single", (1.0, 1))]
+    errors = []
+    for budget, (rate, burst) in cases:
+        await _fake.flushall()
+        with mock.patch.dict(flood.FLOOD_LIMITS, {budget: (rate, burst)}):
+            found = await check(budget, rate, burst)
+        print(f"{'FAIL' if found else 'ok  '} {budget} rate={rate}/s burst={burst}")
+        errors += found
+
+    for error in errors:
+        print(f"  {error}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,119 @@
+"""
+EXPLAINs every hot query and fails (exit 1) if any of them still
+needs a sequential scan on its table.
+
+    python -m scripts.check_query_plans
+
+Sequential scans are disabled for the check (enable_seqscan = off),
+so on a small dev database the planner still reports whether a
+usable index exists instead of preferring a cheap full scan.
+"""
+import asyncio
+import json
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from scripts.migrate import ASYNC_DATABASE_URL
+
+# (name, table, sql) — mirror the queries in app/
+HOT_QUERIES = [
+    (
+        "active session of user (relay / stop_session)",
+        "chat_sessions",
+        """
+        SELECT id FROM chat_sessions
+        WHERE (male_id = 1 OR female_id = 1) AND ended_at IS NULL
+        ORDER BY id DESC
+        """,
+    ),
+    (
+        "open sessions (reconcile)",
+        "chat_sessions",
+        "SELECT id, male_id, female_id, started_at FROM chat_sessions "
+        "WHERE ended_at IS NULL",
+    ),
+    (
+        "pending withdrawals (admin)",
+        "withdrawals",
+        "SELECT id, user_id, amount, status FROM withdrawals "
+        "WHERE status = 'pending'",
+    ),
+    (
+        "females waiting approval (admin)",
+        "users",
+        "SELECT id, telegram_id FROM users "
+        "WHERE role = 'female' AND is_verified = false",
+    ),
+    (
+        "user by telegram_id",
+        "users",
+        "SELECT id FROM users WHERE telegram_id = 1",
+    ),
+    (
+        "unrewarded referral",
+        "referrals",
+        "SELECT id FROM referrals WHERE referred_id = 1 AND rewarded = false",
+    ),
+    (
+        "ledger of user (admin)",
+        "ledger",
+        "SELECT id, type, amount, created_at FROM ledger "
+        "WHERE user_id = 1 ORDER BY created_at DESC LIMIT 500",
+    ),
+    (
+        "latest ledger rows (admin)",
+        "ledger",
+        "SELECT id, type, amount, created_at FROM ledger "
+        "ORDER BY created_at DESC LIMIT 500",
+    ),
+    (
+        "latest audit log (admin)",
+        "admin_audit_logs",
+        "SELECT id, action, created_at FROM admin_audit_logs "
+        "ORDER BY created_at DESC LIMIT 500",
+    ),
+]
+
+
+def seq_scans(plan: dict) -> list[str]:
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found += seq_scans(child)
+    return found
+
+
+async def check() -> int:
+    engine = create_async_engine(ASYNC_DATABASE_URL)
+    failures = 0
+
+    async with engine.connect() as conn:
+        await conn.execute(text("SET enable_seqscan = off"))
+
+        for name, table, sql in HOT_QUERIES:
+            exists = await conn.scalar(
+                text("SELECT to_regclass(:t)"), {"t": table}
+            )
+            if not exists:
+                print(f"⏭  {name}: table {table} missing, skipped")
+                continue
+
+            raw = await conn.scalar(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+            plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+
+            scans = seq_scans(plan)
+            if scans:
+                failures += 1
+                print(f"❌ {name}: Seq Scan on {', '.join(scans)}")
+            else:
+                print(f"✅ {name}")
+
+    await engine.dispose()
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(check()) else 0)
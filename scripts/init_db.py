@@ -9,6 +9,11 @@ from app.models.session import ChatSession
 from app.models.female_stats import FemaleStats
 from app.models.withdrawal import Withdrawal
 from app.models.referral import Referral
+from app.models.ledger import LedgerEntry, LedgerBalance
+from app.models.telegram_stars_ledger import TelegramStarsLedger
+from app.models.report import UserReport
+from app.models.favorite import Favorite
+from scripts.migrate import migrate
 
 # Convert sync DB URL to async
 ASYNC_DATABASE_URL = DATABASE_URL.replace(
@@ -29,6 +34,8 @@ async def init_models():
 
     print("✅ All tables created successfully")
 
+    await migrate(engine)
+
 
 if __name__ == "__main__":
     asyncio.run(init_models())
@@ -0,0 +1,111 @@
+import asyncio
+from pathlib import Path
+
+from asyncpg.exceptions import UndefinedTableError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import DATABASE_URL
+
+# Convert sync DB URL to async
+ASYNC_DATABASE_URL = DATABASE_URL.replace(
+    "postgresql://", "postgresql+asyncpg://"
+)
+
+# migrations/NNNN_name.sql, applied in file-name order, once each
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations"
+
+# First line of files that must run outside a transaction
+# (CREATE INDEX CONCURRENTLY). Such files are run one statement at a
+# time in autocommit mode, so they must be written to be re-runnable
+# (IF NOT EXISTS) and must not use DO blocks.
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+
+
+def _statements(sql: str) -> list[str]:
+    """Drops full-line comments, then splits on ';'."""
+    code = "\n".join(
+        line for line in sql.splitlines()
+        if not line.strip().startswith("--")
+    )
+    return [chunk.strip() for chunk in code.split(";") if chunk.strip()]
+
+
+async def _apply_no_transaction(engine, path: Path) -> bool:
+    """
+    False if any statement was skipped because its table does not
+    exist yet: the version is then left unrecorded, so the file is
+    re-run (idempotently) until every statement has applied.
+    """
+    skipped = 0
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        raw = await conn.get_raw_connection()
+        for statement in _statements(path.read_text()):
+            try:
+                await raw.driver_connection.execute(statement)
+            except UndefinedTableError as e:
+                # Optional raw-SQL tables (see the file's header)
+                print(f"   skipped: {e}")
+                skipped += 1
+
+    if skipped:
+        return False
+
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("INSERT INTO schema_migrations (version) VALUES (:v)"),
+            {"v": path.stem},
+        )
+    return True
+
+
+async def applied_versions(conn) -> set[str]:
+    await conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version TEXT PRIMARY KEY,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """))
+    rows = await conn.execute(text("SELECT version FROM schema_migrations"))
+    return {r[0] for r in rows}
+
+
+async def migrate(engine=None):
+    engine = engine or create_async_engine(ASYNC_DATABASE_URL)
+
+    async with engine.begin() as conn:
+        done = await applied_versions(conn)
+
+    pending = [
+        path for path in sorted(MIGRATIONS_DIR.glob("*.sql"))
+        if path.stem not in done
+    ]
+
+    for path in pending:
+        if path.read_text().startswith(NO_TRANSACTION_MARKER):
+            if await _apply_no_transaction(engine, path):
+                print(f"✅ Applied {path.name} (no transaction)")
+            else:
+                print(
+                    f"⚠️ Partially applied {path.name}: some tables are missing, "
+                    "it will be retried on the next run"
+                )
+            continue
+
+        # One transaction per file: a failing migration leaves no trace
+        async with engine.begin() as conn:
+            raw = await conn.get_raw_connection()
+            await raw.driver_connection.execute(path.read_text())
+            await conn.execute(
+                text("INSERT INTO schema_migrations (version) VALUES (:v)"),
+                {"v": path.stem},
+            )
+        print(f"✅ Applied {path.name}")
+
+    if not pending:
+        print("✅ Schema up to date")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
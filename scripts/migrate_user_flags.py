@@ -0,0 +1,76 @@
+"""
+One-off move from per-user string keys to the flag bitmaps
+(see app/services/user_flags.py).
+
+    python -m scripts.migrate_user_flags
+
+Role and verified bits are rebuilt from the users table; ONLINE
+females are carried over from user:{id}:available. The old
+user:{id}:role / user:{id}:available keys are deleted afterwards.
+Safe to re-run.
+"""
+import asyncio
+from typing import Optional
+
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal
+from app.models.user import User
+from app.redis_client import redis_client
+from app.services.identity import Identity
+from app.services.user_flags import AVAILABLE_KEY, sync_many
+
+BATCH_SIZE = 5000
+
+
+async def backfill_identity_bits() -> int:
+    total = 0
+    last_id = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            users = (await db.scalars(
+                select(User)
+                .where(User.id > last_id)
+                .order_by(User.id)
+                .limit(BATCH_SIZE)
+            )).all()
+            if not users:
+                return total
+
+            await sync_many(
+                Identity(u.id, u.telegram_id, u.role, bool(u.is_verified))
+                for u in users
+            )
+            total += len(users)
+            last_id = users[-1].id
+
+
+async def move_legacy_keys(suffix: str, bitmap: Optional[str] = None) -> int:
+    moved = 0
+    async for key in redis_client.scan_iter(match=f"user:*:{suffix}", count=1000):
+        user_id = key.split(":")[1]
+        if not user_id.isdigit():
+            continue
+
+        if bitmap:
+            if await redis_client.get(key) == "1":
+                await redis_client.setbit(bitmap, int(user_id), 1)
+        await redis_client.delete(key)
+        moved += 1
+
+    return moved
+
+
+async def main():
+    users = await backfill_identity_bits()
+    print(f"✅ Role / verified bits written for {users} users")
+
+    online = await move_legacy_keys("available", AVAILABLE_KEY)
+    print(f"✅ Moved {online} availability keys")
+
+    roles = await move_legacy_keys("role")
+    print(f"✅ Dropped {roles} role keys")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
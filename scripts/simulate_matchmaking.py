@@ -0,0 +1,488 @@
+"""
+Offline discrete-event simulator for matchmaking capacity planning.
+
+    pip install "fakeredis[lua]"
+    python -m scripts.simulate_matchmaking --scale 10 --hours 2
+
+Drives the real Redis logic — services/matchmaking (claims, queues),
+services/presence (online/offline) and services/chat_session
+(activate / end / requeue) — against an in-process fakeredis server
+on a virtual clock. The flow's billing commit is modelled as a fixed
+latency between reserve and confirm (no Postgres), so the claim
+extend/confirm/release protocol runs exactly as in flow.open_session.
+
+Reports male match-wait percentiles, throughput, abandonment, pool
+sizes, female utilization and idle time, and Redis round trips per
+match. Run the same seed on two branches (--json) to compare
+matching algorithms before rolling one out.
+"""
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import os
+import random
+import sys
+from collections import Counter
+from typing import Optional
+
+try:
+    import fakeredis
+except ImportError:
+    sys.exit('fakeredis is required: pip install "fakeredis[lua]"')
+
+# app.redis_client connects lazily, but refuses to import without a URL
+os.environ.setdefault("REDIS_URL", "redis://simulator")
+
+import app.redis_client as redis_module
+
+
+# -------------------------
+# REDIS STAND-IN
+# -------------------------
+class CommandCounter:
+    def __init__(self):
+        self.round_trips = 0
+        self.commands = Counter()
+
+    def snapshot(self) -> tuple[int, Counter]:
+        return self.round_trips, Counter(self.commands)
+
+
+class CountingRedis(fakeredis.aioredis.FakeRedis):
+    """Counts round trips: one per command, one per pipeline execute."""
+
+    counter = CommandCounter()
+
+    async def execute_command(self, *args, **options):
+        self.counter.round_trips += 1
+        self.counter.commands[str(args[0]).upper()] += 1
+        return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        pipe = super().pipeline(transaction, shard_hint)
+        execute = pipe.execute
+        counter = self.counter
+
+        async def counted_execute(raise_on_error: bool = True):
+            counter.round_trips += 1
+            for args, _ in pipe.command_stack:
+                counter.commands[str(args[0]).upper()] += 1
+            return await execute(raise_on_error)
+
+        pipe.execute = counted_execute
+        return pipe
+
+
+_server = fakeredis.FakeServer()
+_fake = CountingRedis(server=_server, decode_responses=True)
+redis_module._redis = _fake
+redis_module.redis_client = _fake
+
+# Simulator bookkeeping goes through an uncounted client
+_probe = fakeredis.aioredis.FakeRedis(server=_server, decode_responses=True)
+
+# Imported only now, so their scripts register on the stand-in
+from app.services import matchmaking, presence  # noqa: E402
+from app.services.chat_session import (  # noqa: E402
+    activate_session,
+    begin_end_session,
+    finish_end,
+)
+from app.services.buckets import (  # noqa: E402
+    BUCKETS_KEY,
+    DEFAULT_BUCKET,
+    USER_BUCKET_HASH,
+)
+from app.services.user_flags import ROLE_KEYS  # noqa: E402
+
+
+class SimClock:
+    """Stands in for the time module inside the simulated services."""
+
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+clock = SimClock()
+matchmaking.time = clock
+presence.time = clock
+
+
+# -------------------------
+# DISTRIBUTIONS
+# -------------------------
+def _sampler(rng: random.Random, kind: str, mean: float, cap: Optional[float] = None):
+    def sample() -> float:
+        if kind == "fixed":
+            value = mean
+        elif kind == "lognormal":
+            # sigma 0.75: long tail without a heavy mass near zero
+            sigma = 0.75
+            value = rng.lognormvariate(
+                _log_mean(mean, sigma), sigma
+            )
+        else:
+            value = rng.expovariate(1 / mean)
+        return min(value, cap) if cap else value
+
+    return sample
+
+
+def _bucket_mix(spec: Optional[str]) -> dict[str, float]:
+    """"en-in:0.6,hi-in:0.4" -> {bucket: weight}; empty -> default bucket."""
+    mix = {}
+    for part in (spec or "").split(","):
+        if part.strip():
+            bucket, _, weight = part.strip().partition(":")
+            mix[bucket] = float(weight or 1)
+    return mix or {DEFAULT_BUCKET: 1.0}
+
+
+def _log_mean(mean: float, sigma: float) -> float:
+    return math.log(mean) - sigma ** 2 / 2
+
+
+def _pct(values: list[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(p * len(values)))], 2)
+
+
+def _summary(values: list[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50": _pct(values, 0.50),
+        "p90": _pct(values, 0.90),
+        "p99": _pct(values, 0.99),
+        "max": round(max(values), 2) if values else None,
+    }
+
+
+# -------------------------
+# SIMULATION
+# -------------------------
+class Simulation:
+    def __init__(self, args):
+        self.args = args
+        rng = random.Random(args.seed)
+        self.rng = rng
+
+        self.male_gap = lambda: rng.expovariate(args.male_rate * args.scale)
+        self.female_gap = lambda: rng.expovariate(args.female_rate * args.scale)
+        self.online_length = _sampler(rng, args.online_dist, args.online_mean)
+        self.session_length = _sampler(
+            rng, args.session_dist, args.session_mean, cap=args.session_cap
+        )
+
+        buckets = _bucket_mix(args.buckets)
+        self.user_bucket: dict[int, str] = {}
+        self.pick_bucket = lambda: rng.choices(
+            list(buckets), weights=list(buckets.values())
+        )[0]
+
+        self._events: list = []
+        self._seq = itertools.count()
+        self._ids = itertools.count(1)
+        self._sids = itertools.count(1)
+
+        self.online: set[int] = set()
+        self.busy: set[int] = set()
+        self.sessions: dict[int, tuple[int, int]] = {}
+
+        self.match_waits: list[float] = []
+        self.female_idle: list[float] = []
+        self.pool_samples: list[tuple[int, int]] = []
+        self.util_samples: list[float] = []
+        self.counters = Counter()
+
+    # ---------- event queue ----------
+    def at(self, delay: float, handler, *payload):
+        heapq.heappush(
+            self._events, (clock.now + delay, next(self._seq), handler, payload)
+        )
+
+    async def run(self) -> dict:
+        end = clock.now + self.args.hours * 3600
+        warmup_until = clock.now + self.args.warmup_minutes * 60
+
+        self.at(self.male_gap(), self.male_arrives)
+        self.at(self.female_gap(), self.female_online)
+        self.at(self.args.tick_seconds, self.tick)
+
+        baseline = None
+        while self._events and self._events[0][0] <= end:
+            when, _, handler, payload = heapq.heappop(self._events)
+            clock.now = when
+
+            if baseline is None and when >= warmup_until:
+                baseline = self._reset_stats()
+
+            await handler(*payload)
+
+        return self._report(baseline)
+
+    def _reset_stats(self):
+        """Drops warm-up samples; returns the counters to diff against."""
+        self.match_waits.clear()
+        self.female_idle.clear()
+        self.pool_samples.clear()
+        self.util_samples.clear()
+        self.counters = Counter()
+        return clock.now, CountingRedis.counter.snapshot()
+
+    # ---------- arrivals ----------
+    async def _new_user(self, role: str) -> tuple[int, str]:
+        """What identity.remember would have published."""
+        uid, bucket = next(self._ids), self.pick_bucket()
+        await _probe.setbit(ROLE_KEYS[role], uid, 1)
+        await _probe.hset(USER_BUCKET_HASH, str(uid), bucket)
+        await _probe.sadd(BUCKETS_KEY, bucket)
+        self.user_bucket[uid] = bucket
+        return uid, bucket
+
+    async def male_arrives(self, uid: Optional[int] = None, bucket: str = DEFAULT_BUCKET):
+        if uid is None:
+            self.at(self.male_gap(), self.male_arrives)
+            uid, bucket = await self._new_user("male")
+
+        self.counters["searches"] += 1
+        await matchmaking.add_user_to_pool(uid, "male", bucket=bucket)
+        await self.dispatch(bucket)
+
+    async def female_online(self):
+        self.at(self.female_gap(), self.female_online)
+        uid, _ = await self._new_user("female")
+
+        self.online.add(uid)
+        await presence.go_online(uid)
+        self.at(self.online_length(), self.female_offline, uid)
+        await self.dispatch()
+
+    async def female_offline(self, uid: int):
+        self.online.discard(uid)
+        await presence.go_offline(uid)
+
+    # ---------- matching ----------
+    async def dispatch(self, bucket: Optional[str] = None):
+        """Same loop shape as flow.dispatch_waiting."""
+        for shard in [bucket] if bucket else await matchmaking.waiting_buckets():
+            for _ in range(self.args.batch):
+                claim = await matchmaking.match_users(shard)
+                if not claim:
+                    break
+
+                self.counters["claims"] += 1
+                if claim.female_pool != matchmaking.pool_key("female", shard):
+                    self.counters["overflow_matches"] += 1
+                self.female_idle.append(clock.now - claim.female_since)
+                self.at(self.args.billing_ms / 1000, self.open_session, claim)
+
+    async def open_session(self, claim):
+        """flow.open_session with the DB commit replaced by latency."""
+        if not await matchmaking.extend_claim(claim):
+            self.counters["claims_lost"] += 1
+            await matchmaking.release_claim(claim)
+            return
+
+        if not await matchmaking.confirm_claim(claim):
+            self.counters["claims_lost"] += 1
+            await matchmaking.release_claim(claim)
+            return
+
+        sid = next(self._sids)
+        length = self.session_length()
+        await activate_session(
+            sid, clock.now, clock.now + length, claim.male_id, claim.female_id
+        )
+
+        self.sessions[sid] = (claim.male_id, claim.female_id)
+        self.busy.add(claim.female_id)
+        self.match_waits.append(clock.now - claim.male_since)
+        self.counters["matches"] += 1
+
+        self.at(length, self.end_session, sid)
+
+    async def end_session(self, sid: int):
+        """lifecycle.stop_session minus the DB finalize."""
+        male_id, female_id = self.sessions.pop(sid)
+
+        if not await begin_end_session(sid, clock.now):
+            return
+        requeued = await finish_end(sid, clock.now)
+
+        self.busy.discard(female_id)
+        self.counters["sessions_ended"] += 1
+
+        if self.rng.random() < self.args.repeat:
+            self.at(
+                self.rng.expovariate(1 / self.args.think_seconds),
+                self.male_arrives,
+                male_id,
+                self.user_bucket.get(male_id, DEFAULT_BUCKET),
+            )
+
+        if requeued:
+            await self.dispatch()
+
+    # ---------- periodic (dispatcher loop) ----------
+    async def tick(self):
+        self.at(self.args.tick_seconds, self.tick)
+
+        expired = await matchmaking.expire_waiting_males(self.args.patience)
+        self.counters["abandoned"] += len(expired)
+
+        await self.dispatch()
+
+        shards = set(self.user_bucket.values()) or {DEFAULT_BUCKET}
+        sizes = await asyncio.gather(*(
+            _probe.zcard(matchmaking.pool_key(role, bucket))
+            for bucket in shards
+            for role in ("male", "female")
+        ))
+        self.pool_samples.append((sum(sizes[0::2]), sum(sizes[1::2])))
+        if self.online:
+            self.util_samples.append(len(self.busy & self.online) / len(self.online))
+
+    # ---------- output ----------
+    def _report(self, baseline) -> dict:
+        started, (trips_before, commands_before) = baseline or (
+            clock.now - self.args.hours * 3600, (0, Counter())
+        )
+        elapsed = max(clock.now - started, 1)
+
+        trips, commands = CountingRedis.counter.snapshot()
+        trips -= trips_before
+        commands -= commands_before
+
+        matches = self.counters["matches"]
+        per_match = (lambda n: round(n / matches, 1)) if matches else (lambda n: None)
+
+        males = [m for m, _ in self.pool_samples]
+        females = [f for _, f in self.pool_samples]
+
+        return {
+            "config": vars(self.args),
+            "simulated_minutes": round(elapsed / 60, 1),
+            "throughput": {
+                "matches": matches,
+                "matches_per_minute": round(matches / elapsed * 60, 2),
+                "searches": self.counters["searches"],
+                "abandoned": self.counters["abandoned"],
+                "claims_lost": self.counters["claims_lost"],
+                "overflow_matches": self.counters["overflow_matches"],
+            },
+            "match_wait_seconds": _summary(self.match_waits),
+            "female_idle_seconds": {
+                **_summary(self.female_idle),
+                "histogram": _histogram(self.female_idle),
+            },
+            "female_utilization": (
+                round(sum(self.util_samples) / len(self.util_samples), 3)
+                if self.util_samples else None
+            ),
+            "pool_size": {
+                "male": {"avg": _avg(males), "max": max(males, default=0)},
+                "female": {"avg": _avg(females), "max": max(females, default=0)},
+            },
+            "redis": {
+                "round_trips": trips,
+                "round_trips_per_match": per_match(trips),
+                "commands_per_match": {
+                    name: per_match(count)
+                    for name, count in commands.most_common(10)
+                },
+            },
+        }
+
+
+def _avg(values: list[int]) -> Optional[float]:
+    return round(sum(values) / len(values), 1) if values else None
+
+
+_HISTOGRAM_EDGES = (5, 15, 30, 60, 120, 300, 600, 1800)
+
+
+def _histogram(values: list[float]) -> dict:
+    buckets = Counter()
+    for value in values:
+        edge = next((e for e in _HISTOGRAM_EDGES if value <= e), None)
+        buckets[f"<={edge}s" if edge else f">{_HISTOGRAM_EDGES[-1]}s"] += 1
+
+    labels = [f"<={e}s" for e in _HISTOGRAM_EDGES] + [f">{_HISTOGRAM_EDGES[-1]}s"]
+    return {label: buckets[label] for label in labels}
+
+
+# -------------------------
+# CLI
+# -------------------------
+def _args(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    dists = ("exp", "lognormal", "fixed")
+
+    p.add_argument("--hours", type=float, default=2.0)
+    p.add_argument("--warmup-minutes", type=float, default=30.0)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--scale", type=float, default=1.0,
+                   help="multiplies both arrival rates")
+
+    p.add_argument("--male-rate", type=float, default=0.2,
+                   help="new male searchers per second")
+    p.add_argument("--repeat", type=float, default=0.3,
+                   help="chance a male searches again after a chat")
+    p.add_argument("--think-seconds", type=float, default=120.0)
+    p.add_argument("--patience", type=float,
+                   default=float(os.getenv("TRUEME_MALE_WAIT_TIMEOUT_SECONDS", "300")))
+
+    p.add_argument("--female-rate", type=float, default=0.1,
+                   help="females going ONLINE per second")
+    p.add_argument("--online-mean", type=float, default=3600.0)
+    p.add_argument("--online-dist", choices=dists, default="exp")
+
+    p.add_argument("--session-mean", type=float, default=600.0)
+    p.add_argument("--session-dist", choices=dists, default="lognormal")
+    p.add_argument("--session-cap", type=float, default=1800.0)
+
+    p.add_argument("--billing-ms", type=float, default=50.0,
+                   help="reserve → confirm latency (DB commit)")
+    p.add_argument("--buckets", default="",
+                   help='language-region mix, e.g. "en-in:0.6,hi-in:0.4"')
+    p.add_argument("--batch", type=int, default=matchmaking_batch_size())
+    p.add_argument("--tick-seconds", type=float, default=5.0)
+    p.add_argument("--json", action="store_true")
+    return p.parse_args(argv)
+
+
+def matchmaking_batch_size() -> int:
+    # Mirrors flow.DISPATCH_BATCH_SIZE without importing the DB layer
+    return int(os.getenv("TRUEME_DISPATCH_BATCH_SIZE", "50"))
+
+
+def _print(report: dict):
+    for section, value in report.items():
+        if section == "config":
+            continue
+        print(f"{section}: {json.dumps(value, indent=2) if isinstance(value, dict) else value}")
+
+
+async def main(argv=None):
+    args = _args(argv)
+    report = await Simulation(args).run()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print(report)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())